@@ -18,7 +18,7 @@ if config.config_file_name is not None:
 # add your model's MetaData object here
 # for 'autogenerate' support
 from app.database import Base
-from app.models import Price  # noqa
+from app.models import Price, BackfillCheckpoint, GapScanWatermark, PriceGap  # noqa
 
 target_metadata = Base.metadata
 
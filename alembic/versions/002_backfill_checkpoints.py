@@ -0,0 +1,33 @@
+"""Backfill checkpoints
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'backfill_checkpoints',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('ticker', sa.String(length=10), nullable=False),
+        sa.Column('window_start', sa.BigInteger(), nullable=False),
+        sa.Column('window_end', sa.BigInteger(), nullable=False),
+        sa.Column('rows_written', sa.Integer(), nullable=False),
+        sa.Column('completed_at', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('ticker', 'window_start', 'window_end', name='uq_backfill_window')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('backfill_checkpoints')
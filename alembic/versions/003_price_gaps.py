@@ -0,0 +1,46 @@
+"""Price gaps and gap scan watermarks
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'gap_scan_watermarks',
+        sa.Column('ticker', sa.String(length=10), nullable=False),
+        sa.Column('scanned_until', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('ticker')
+    )
+    op.create_table(
+        'price_gaps',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('ticker', sa.String(length=10), nullable=False),
+        sa.Column('gap_start', sa.BigInteger(), nullable=False),
+        sa.Column('gap_end', sa.BigInteger(), nullable=False),
+        sa.Column('missing_minutes', sa.Integer(), nullable=False),
+        sa.Column('detected_at', sa.BigInteger(), nullable=False),
+        sa.Column('repaired_at', sa.BigInteger(), nullable=True),
+        sa.Column('filled_minutes', sa.Integer(), nullable=False),
+        sa.Column('repair_attempts', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('ticker', 'gap_start', name='uq_price_gap_start')
+    )
+    op.create_index('idx_price_gaps_open', 'price_gaps', ['ticker', 'repaired_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_price_gaps_open', table_name='price_gaps')
+    op.drop_table('price_gaps')
+    op.drop_table('gap_scan_watermarks')
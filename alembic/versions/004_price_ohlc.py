@@ -0,0 +1,29 @@
+"""Minute OHLC columns for sampled ingestion
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('prices', sa.Column('open', sa.Numeric(precision=20, scale=8), nullable=True))
+    op.add_column('prices', sa.Column('high', sa.Numeric(precision=20, scale=8), nullable=True))
+    op.add_column('prices', sa.Column('low', sa.Numeric(precision=20, scale=8), nullable=True))
+    op.add_column('prices', sa.Column('samples', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('prices', 'samples')
+    op.drop_column('prices', 'low')
+    op.drop_column('prices', 'high')
+    op.drop_column('prices', 'open')
@@ -0,0 +1,23 @@
+"""Source column marking backfilled prices
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('prices', sa.Column('source', sa.String(length=16), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('prices', 'source')
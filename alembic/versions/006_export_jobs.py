@@ -0,0 +1,39 @@
+"""Export jobs table
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'export_jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('tickers', sa.String(length=255), nullable=False),
+        sa.Column('start_timestamp', sa.BigInteger(), nullable=True),
+        sa.Column('end_timestamp', sa.BigInteger(), nullable=True),
+        sa.Column('format', sa.String(length=16), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('rows_total', sa.BigInteger(), nullable=True),
+        sa.Column('rows_written', sa.BigInteger(), nullable=False),
+        sa.Column('file_path', sa.String(length=512), nullable=True),
+        sa.Column('file_size', sa.BigInteger(), nullable=True),
+        sa.Column('error', sa.String(length=1024), nullable=True),
+        sa.Column('created_at', sa.BigInteger(), nullable=False),
+        sa.Column('finished_at', sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('export_jobs')
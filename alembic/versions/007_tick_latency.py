@@ -0,0 +1,37 @@
+"""Tick latency tracing table
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'tick_latency',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('price_id', sa.Integer(), nullable=False),
+        sa.Column('ticker', sa.String(length=10), nullable=False),
+        sa.Column('timestamp', sa.BigInteger(), nullable=False),
+        sa.Column('sent_at_us', sa.BigInteger(), nullable=False),
+        sa.Column('exchange_in_us', sa.BigInteger(), nullable=True),
+        sa.Column('exchange_out_us', sa.BigInteger(), nullable=True),
+        sa.Column('received_at_us', sa.BigInteger(), nullable=False),
+        sa.Column('committed_at_us', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_tick_latency_ticker_timestamp', 'tick_latency', ['ticker', 'timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_tick_latency_ticker_timestamp', table_name='tick_latency')
+    op.drop_table('tick_latency')
@@ -0,0 +1,40 @@
+"""Daily price statistics table
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'daily_price_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('ticker', sa.String(length=10), nullable=False),
+        sa.Column('day', sa.BigInteger(), nullable=False),
+        sa.Column('ticks', sa.Integer(), nullable=False),
+        sa.Column('min_price', sa.Numeric(precision=20, scale=8), nullable=True),
+        sa.Column('max_price', sa.Numeric(precision=20, scale=8), nullable=True),
+        sa.Column('first_price', sa.Numeric(precision=20, scale=8), nullable=True),
+        sa.Column('last_price', sa.Numeric(precision=20, scale=8), nullable=True),
+        sa.Column('first_timestamp', sa.BigInteger(), nullable=True),
+        sa.Column('last_timestamp', sa.BigInteger(), nullable=True),
+        sa.Column('mean_price', sa.Float(), nullable=True),
+        sa.Column('stddev', sa.Float(), nullable=True),
+        sa.Column('updated_at', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('ticker', 'day', name='uq_daily_price_stats_ticker_day')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_price_stats')
@@ -0,0 +1,25 @@
+"""Insert time of prices for the sync settle horizon
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('prices', sa.Column('inserted_at', sa.BigInteger(), nullable=True))
+    op.create_index('idx_prices_inserted_at', 'prices', ['inserted_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_prices_inserted_at', table_name='prices')
+    op.drop_column('prices', 'inserted_at')
@@ -0,0 +1,280 @@
+"""Контроль допуска запросов: лимиты параллельности по классам маршрутов и лимиты клиентов.
+
+Маршруты делятся на классы: cheap (последняя цена, пропуски, дневная статистика,
+задания выгрузки), heavy (выгрузки истории и выровненные ряды) и sync
+(инкрементальная синхронизация с long-poll). У каждого класса свой лимит
+одновременно выполняемых запросов и ограниченная очередь ожидания, поэтому
+тяжелые запросы не занимают весь пул соединений БД и не задерживают
+дешевые, а ожидающие long-poll запросы не занимают слоты дешевых.
+
+Слот занимается на уровне ASGI и освобождается, когда ответ отправлен
+целиком, поэтому потоковые ответы (скачивание выгрузок) держат слот до
+последнего фрагмента тела.
+"""
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+from redis.exceptions import RedisError
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from app.config import settings
+from app.metrics import ADMISSION_IN_FLIGHT, ADMISSION_REJECTIONS
+from app.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CHEAP = "cheap"
+HEAVY = "heavy"
+SYNC = "sync"
+
+# Маршруты дешевого класса; остальные маршруты /api/prices* - тяжелые.
+# Задания выгрузки выполняет воркер Celery, а API только ставит их в очередь
+# и отдает готовые файлы без обращения к prices; дневная статистика читается
+# из daily_price_stats по строке на сутки
+CHEAP_ROUTES = {"/api/prices/last", "/api/prices/gaps", "/api/prices/latency", "/api/prices/stats/daily"}
+CHEAP_PREFIXES = ("/api/prices/exports",)
+# Long-poll запросы большую часть времени ждут без соединения с БД
+SYNC_ROUTES = {"/api/prices/sync"}
+LIMITED_PREFIX = "/api/prices"
+
+
+def route_class(path: str) -> Optional[str]:
+    """
+    Определить класс маршрута по пути запроса.
+    
+    Args:
+        path: Путь запроса
+    
+    Returns:
+        "cheap", "heavy", "sync" или None для маршрутов без ограничений (/, /docs, /metrics)
+    """
+    if path in SYNC_ROUTES:
+        return SYNC
+    if path in CHEAP_ROUTES or path.startswith(CHEAP_PREFIXES):
+        return CHEAP
+    if path == LIMITED_PREFIX or path.startswith(LIMITED_PREFIX + "/"):
+        return HEAVY
+    return None
+
+
+class AdmissionRejected(Exception):
+    """Запрос отклонен контролем допуска."""
+    
+    def __init__(self, reason: str, retry_after: int):
+        """
+        Инициализация.
+        
+        Args:
+            reason: Причина: queue_full, queue_timeout или rate_limited
+            retry_after: Рекомендуемая пауза перед повтором, секунды
+        """
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """Лимит одновременно выполняемых запросов класса с ограниченной очередью ожидания."""
+    
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float):
+        """
+        Инициализация.
+        
+        Args:
+            name: Имя класса маршрутов
+            limit: Максимум одновременно выполняемых запросов
+            queue_size: Максимум ожидающих запросов; сверх него запрос сразу отклоняется
+            queue_timeout: Максимальное ожидание в очереди, секунды
+        """
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+    
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Занять слот на время выполнения запроса.
+        
+        Raises:
+            AdmissionRejected: Если очередь заполнена или ожидание превысило queue_timeout
+        """
+        if self._semaphore.locked():
+            if self.waiting >= self.queue_size:
+                raise AdmissionRejected("queue_full", settings.admission_retry_after)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise AdmissionRejected("queue_timeout", settings.admission_retry_after)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.labels(route_class=self.name).inc()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            ADMISSION_IN_FLIGHT.labels(route_class=self.name).dec()
+            self._semaphore.release()
+
+
+class RateLimiter:
+    """
+    Лимит запросов клиента в минуту по классу маршрутов (фиксированное окно в Redis).
+    
+    При ошибке Redis запрос пропускается (fail open), а Redis не опрашивается
+    следующие failure_cooldown секунд, чтобы не добавлять таймауты к каждому запросу.
+    """
+    
+    def __init__(self, redis, limits: Dict[str, int], window: int = 60, failure_cooldown: float = 5.0):
+        """
+        Инициализация.
+        
+        Args:
+            redis: Асинхронный клиент Redis
+            limits: Класс маршрутов -> запросов на клиента за окно (0 - без лимита)
+            window: Длина окна в секундах
+            failure_cooldown: Пауза в обращениях к Redis после ошибки, секунды
+        """
+        self.redis = redis
+        self.limits = limits
+        self.window = window
+        self.failure_cooldown = failure_cooldown
+        self._disabled_until = 0.0
+    
+    async def check(self, client_id: str, route_class: str, now: float = None) -> Tuple[bool, int]:
+        """
+        Учесть запрос клиента и проверить лимит.
+        
+        Args:
+            client_id: Идентификатор клиента
+            route_class: Класс маршрута
+            now: Текущее время, UNIX timestamp
+        
+        Returns:
+            Пара (разрешен ли запрос, секунд до конца окна)
+        """
+        limit = self.limits.get(route_class, 0)
+        now = time.time() if now is None else now
+        window_start = int(now // self.window) * self.window
+        retry_after = max(int(window_start + self.window - now), 1)
+        if not limit or time.monotonic() < self._disabled_until:
+            return True, retry_after
+        
+        key = f"ratelimit:{route_class}:{client_id}:{window_start}"
+        try:
+            count = await self.redis.incr(key)
+            if count == 1:
+                await self.redis.expire(key, self.window + 1)
+        except (RedisError, OSError) as e:
+            self._disabled_until = time.monotonic() + self.failure_cooldown
+            logger.warning(f"Redis недоступен, лимиты клиентов временно не проверяются: {str(e)}")
+            return True, retry_after
+        return count <= limit, retry_after
+
+
+_limiters: Dict[str, AdmissionLimiter] = {}
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_limiter(name: str) -> AdmissionLimiter:
+    """Получить лимитер класса маршрутов (создается при первом обращении)."""
+    if name not in _limiters:
+        if name == CHEAP:
+            limit, queue_size = settings.admission_cheap_concurrency, settings.admission_cheap_queue
+        elif name == SYNC:
+            limit, queue_size = settings.admission_sync_concurrency, settings.admission_sync_queue
+        else:
+            limit, queue_size = settings.admission_heavy_concurrency, settings.admission_heavy_queue
+        _limiters[name] = AdmissionLimiter(name, limit, queue_size, settings.admission_queue_timeout)
+    return _limiters[name]
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Получить лимитер запросов клиентов (создается при первом обращении)."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(get_redis(), {
+            CHEAP: settings.rate_limit_cheap_per_minute,
+            HEAVY: settings.rate_limit_heavy_per_minute,
+            SYNC: settings.rate_limit_sync_per_minute,
+        })
+    return _rate_limiter
+
+
+def client_id(request) -> str:
+    """
+    Идентификатор клиента для лимитов.
+    
+    За доверенным прокси адрес клиента берется из заголовка
+    RATE_LIMIT_CLIENT_HEADER (первое значение), иначе - адрес соединения.
+    """
+    if settings.rate_limit_client_header:
+        forwarded = request.headers.get(settings.rate_limit_client_header)
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def record_rejection(name: str, reason: str):
+    """Учесть отклоненный запрос в метриках."""
+    ADMISSION_REJECTIONS.labels(route_class=name, reason=reason).inc()
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware контроля допуска для маршрутов /api/prices.
+    
+    Запрос сверх лимита клиента получает 429, запрос, не дождавшийся слота
+    своего класса маршрутов (или не поместившийся в очередь), - 503. Оба
+    ответа содержат Retry-After. Слот удерживается, пока приложение не
+    отправит тело ответа целиком или не прервет отправку.
+    """
+    
+    def __init__(self, app):
+        """
+        Инициализация.
+        
+        Args:
+            app: ASGI приложение
+        """
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        name = route_class(scope["path"]) if scope["type"] == "http" else None
+        if name is None or not settings.admission_enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        allowed, retry_after = await get_rate_limiter().check(client_id(Request(scope)), name)
+        if not allowed:
+            record_rejection(name, "rate_limited")
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Rate limit exceeded"},
+                headers={"Retry-After": str(retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        
+        try:
+            # Приложение возвращается после отправки последнего фрагмента тела
+            async with get_limiter(name).admit():
+                await self.app(scope, receive, send)
+        except AdmissionRejected as e:
+            record_rejection(name, e.reason)
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy, retry later"},
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
@@ -1,19 +1,76 @@
 """API роуты."""
-from fastapi import APIRouter, Depends, Query, HTTPException
+import os
+import re
+import time
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional
-from datetime import datetime
-from app.database import get_db
-from app.services.price_service import PriceService
-from app.schemas import PriceListResponse, PriceResponse, LastPriceResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Iterator, Optional
+from datetime import datetime, timezone
+import numpy as np
+from app.coalescing import SingleFlight
+from app.config import settings
+from app.database import get_db, get_read_db
+from app.models import ExportJob
+from app.timing import TimedRoute
+from app.services import analytics, daily_stats
+from app.services.price_service import PriceService, date_range_to_timestamps
+from app.services.gap_detector import GapDetector
+from app.services import export
+from app.services.latency import latency_summary
+from app.services.recent_store import recent_prices
+from app.tasks import export_prices
+from app.schemas import (
+    PriceListResponse,
+    PriceResponse,
+    PriceSyncResponse,
+    DailyStatsResponse,
+    DailyStatsSummaryResponse,
+    LastPriceResponse,
+    AlignedSeriesResponse,
+    PairStatsResponse,
+    PriceGapResponse,
+    PriceGapListResponse,
+    TickLatencyResponse,
+    ExportJobCreate,
+    ExportJobResponse,
+)
 
-router = APIRouter(prefix="/api/prices", tags=["prices"])
+router = APIRouter(prefix="/api/prices", tags=["prices"], route_class=TimedRoute)
+
+# Одновременные одинаковые запросы выполняют один запрос к БД и одну сериализацию
+all_prices_flight = SingleFlight("all")
+last_price_flight = SingleFlight("last")
+filter_flight = SingleFlight("filter")
+
+
+def json_response(body: bytes) -> Response:
+    """Ответ с заранее сериализованным JSON телом."""
+    return Response(content=body, media_type="application/json")
+
+
+def check_result_size(rows: int):
+    """
+    Отклонить запрос, результат которого больше MAX_RESULT_ROWS.
+    
+    Args:
+        rows: Число строк (точек) результата
+    
+    Raises:
+        HTTPException: 400 с предложением сузить диапазон дат
+    """
+    if rows > settings.max_result_rows:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Result is too large (more than {settings.max_result_rows} rows). Narrow the date range"
+        )
 
 
 @router.get("", response_model=PriceListResponse)
 async def get_all_prices(
     ticker: str = Query(..., description="Тикер валюты (BTC или ETH). Допускаются также BTC_USD/ETH_USD"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Получить все сохраненные данные по указанной валюте.
@@ -34,19 +91,23 @@ async def get_all_prices(
         raise HTTPException(status_code=400, detail="Invalid ticker. Must be BTC or ETH")
 
     ticker_norm = norm[ticker]
-    service = PriceService(db)
-    prices = await service.get_prices_by_ticker(ticker_norm)
     
-    return PriceListResponse(
-        prices=[PriceResponse.model_validate(price) for price in prices],
-        total=len(prices)
-    )
+    async def load() -> bytes:
+        service = PriceService(db)
+        prices = await service.get_prices_by_ticker(ticker_norm, limit=settings.max_result_rows + 1)
+        check_result_size(len(prices))
+        return PriceListResponse(
+            prices=[PriceResponse.model_validate(price) for price in prices],
+            total=len(prices)
+        ).model_dump_json().encode()
+    
+    return json_response(await all_prices_flight.do(ticker_norm, load))
 
 
 @router.get("/last", response_model=LastPriceResponse)
 async def get_last_price(
     ticker: str = Query(..., description="Тикер валюты (BTC или ETH). Допускаются также BTC_USD/ETH_USD"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Получить последнюю цену валюты.
@@ -66,20 +127,26 @@ async def get_last_price(
         raise HTTPException(status_code=400, detail="Invalid ticker. Must be BTC or ETH")
 
     ticker_norm = norm[ticker]
-    service = PriceService(db)
-    price = await service.get_last_price(ticker_norm)
     
-    if price is None:
+    async def load() -> Optional[bytes]:
+        service = PriceService(db)
+        price = await service.get_last_price(ticker_norm)
+        if price is None:
+            return None
+        return LastPriceResponse(
+            ticker=price.ticker,
+            price=price.price,
+            timestamp=price.timestamp
+        ).model_dump_json().encode()
+    
+    body = await last_price_flight.do(ticker_norm, load)
+    if body is None:
         raise HTTPException(
             status_code=404,
             detail=f"No price data found for ticker {ticker}"
         )
     
-    return LastPriceResponse(
-        ticker=price.ticker,
-        price=price.price,
-        timestamp=price.timestamp
-    )
+    return json_response(body)
 
 
 @router.get("/filter", response_model=PriceListResponse)
@@ -87,7 +154,7 @@ async def get_prices_by_date(
     ticker: str = Query(..., description="Тикер валюты (BTC или ETH). Допускаются также BTC_USD/ETH_USD"),
     start_date: Optional[str] = Query(None, description="Начальная дата (DD-MM-YYYY)"),
     end_date: Optional[str] = Query(None, description="Конечная дата (DD-MM-YYYY)"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Получить цену валюты с фильтром по дате.
@@ -131,10 +198,530 @@ async def get_prices_by_date(
                 detail="Invalid end_date format. Use DD-MM-YYYY"
             )
     
+    async def load() -> bytes:
+        service = PriceService(db)
+        prices = await service.get_prices_by_date_range(
+            ticker_norm, start_datetime, end_datetime, limit=settings.max_result_rows + 1
+        )
+        check_result_size(len(prices))
+        return PriceListResponse(
+            prices=[PriceResponse.model_validate(price) for price in prices],
+            total=len(prices)
+        ).model_dump_json().encode()
+    
+    key = (ticker_norm, start_datetime, end_datetime)
+    return json_response(await filter_flight.do(key, load))
+
+
+@router.get("/aligned", response_model=AlignedSeriesResponse)
+async def get_aligned_prices(
+    tickers: str = Query(..., description="Тикеры через запятую, например BTC,ETH. Первый тикер - базовый"),
+    start_date: Optional[str] = Query(None, description="Начальная дата (DD-MM-YYYY)"),
+    end_date: Optional[str] = Query(None, description="Конечная дата (DD-MM-YYYY)"),
+    window: int = Query(60, ge=2, le=10080, description="Окно скользящей корреляции в минутах"),
+    max_gap: int = Query(5, ge=0, le=1440, description="Максимальный пропуск в минутах, заполняемый предыдущим значением"),
+    include_backfill: bool = Query(True, description="Использовать строки исторической догрузки (закрытия свечей perpetual)"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Получить ряды нескольких тикеров, выровненные по общей минутной сетке.
+    
+    Для каждого тикера, кроме базового, считаются отношение и разница цен
+    к базовому тикеру, а также скользящая корреляция минутных лог-доходностей.
+    
+    Args:
+        tickers: Список тикеров через запятую (минимум два)
+        start_date: Начальная дата в формате DD-MM-YYYY (опционально)
+        end_date: Конечная дата в формате DD-MM-YYYY (опционально)
+        window: Размер окна корреляции в минутах
+        max_gap: Максимальный заполняемый пропуск в минутах
+        include_backfill: Использовать строки догрузки наравне с индексной ценой
+        db: Сессия базы данных
+        
+    Returns:
+        Выровненная матрица цен и статистики пар
+    """
+    norm = {
+        'BTC': 'BTC', 'ETH': 'ETH',
+        'BTC_USD': 'BTC', 'ETH_USD': 'ETH'
+    }
+    requested = [t.strip() for t in tickers.split(",") if t.strip()]
+    if any(t not in norm for t in requested):
+        raise HTTPException(status_code=400, detail="Invalid ticker. Must be BTC or ETH")
+    
+    tickers_norm = list(dict.fromkeys(norm[t] for t in requested))
+    if len(tickers_norm) < 2:
+        raise HTTPException(status_code=400, detail="At least two distinct tickers are required")
+    
+    start_datetime = None
+    end_datetime = None
+    
+    if start_date:
+        try:
+            start_datetime = datetime.strptime(start_date, "%d-%m-%Y")
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid start_date format. Use DD-MM-YYYY"
+            )
+    
+    if end_date:
+        try:
+            end_datetime = datetime.strptime(end_date, "%d-%m-%Y")
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid end_date format. Use DD-MM-YYYY"
+            )
+    
+    start_ts, end_ts = date_range_to_timestamps(start_datetime, end_datetime)
+    if start_ts is not None and end_ts is not None:
+        check_result_size((end_ts - start_ts) // 60 * len(tickers_norm))
     service = PriceService(db)
-    prices = await service.get_prices_by_date_range(ticker_norm, start_datetime, end_datetime)
+    series = {}
+    for ticker in tickers_norm:
+        series[ticker] = await service.get_series(
+            ticker, start_ts, end_ts, limit=settings.max_result_rows + 1, include_backfill=include_backfill
+        )
+        check_result_size(len(series[ticker][0]) * len(tickers_norm))
+    
+    observed = [ts for ts, _ in series.values() if ts]
+    if not observed:
+        grid = np.empty(0, dtype=np.int64)
+    else:
+        grid = analytics.build_grid(
+            start_ts if start_ts is not None else min(ts[0] for ts in observed),
+            end_ts if end_ts is not None else max(ts[-1] for ts in observed),
+        )
+    
+    check_result_size(len(grid) * len(tickers_norm))
+    matrix = np.vstack([
+        analytics.align_to_grid(ts, values, grid, max_gap=max_gap)
+        for ts, values in series.values()
+    ])
+    
+    base = matrix[0]
+    base_returns = analytics.log_returns(base)
+    pairs = []
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for ticker, quote in zip(tickers_norm[1:], matrix[1:]):
+            pairs.append(PairStatsResponse(
+                base=tickers_norm[0],
+                quote=ticker,
+                ratio=analytics.to_optional_list(base / quote),
+                spread=analytics.to_optional_list(base - quote),
+                rolling_correlation=analytics.to_optional_list(
+                    analytics.rolling_correlation(base_returns, analytics.log_returns(quote), window)
+                ),
+            ))
+    
+    return AlignedSeriesResponse(
+        tickers=tickers_norm,
+        timestamps=grid.tolist(),
+        values=[analytics.to_optional_list(row) for row in matrix],
+        window=window,
+        pairs=pairs,
+    )
+
+
+@router.get("/gaps", response_model=PriceGapListResponse)
+async def get_price_gaps(
+    ticker: str = Query(..., description="Тикер валюты (BTC или ETH). Допускаются также BTC_USD/ETH_USD"),
+    include_repaired: bool = Query(False, description="Включать уже заполненные пропуски"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Получить найденные пропуски в минутном ряду цен.
+    
+    Пропуски ищет периодическая задача repair_gaps, она же заполняет их.
+    
+    Args:
+        ticker: Тикер валюты (обязательный параметр)
+        include_repaired: Включать уже заполненные пропуски
+        db: Сессия базы данных
+        
+    Returns:
+        Список пропусков и суммарное число пропущенных минут
+    """
+    norm = {
+        'BTC': 'BTC', 'ETH': 'ETH',
+        'BTC_USD': 'BTC', 'ETH_USD': 'ETH'
+    }
+    if ticker not in norm:
+        raise HTTPException(status_code=400, detail="Invalid ticker. Must be BTC or ETH")
+    
+    ticker_norm = norm[ticker]
+    detector = GapDetector(db)
+    gaps = await detector.get_gaps(ticker_norm, include_repaired=include_repaired)
+    
+    return PriceGapListResponse(
+        gaps=[PriceGapResponse.model_validate(gap) for gap in gaps],
+        total=len(gaps),
+        missing_minutes=sum(gap.missing_minutes for gap in gaps if gap.repaired_at is None),
+        scanned_until=await detector.get_watermark(ticker_norm),
+    )
+
+
+@router.get("/latency", response_model=TickLatencyResponse)
+async def get_tick_latency(
+    ticker: str = Query(..., description="Тикер валюты (BTC или ETH). Допускаются также BTC_USD/ETH_USD"),
+    hours: int = Query(24, ge=1, le=168, description="Период в часах до текущего момента"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Получить распределение задержки тиков по этапам пути от биржи до БД.
+    
+    Этапы считаются по отметкам времени Deribit (usIn/usOut) и локальным
+    отметкам отправки запроса, получения ответа и фиксации записи.
+    
+    Args:
+        ticker: Тикер валюты (обязательный параметр)
+        hours: Период в часах
+        db: Сессия базы данных
+        
+    Returns:
+        p50/p95/p99/max каждого этапа в миллисекундах
+    """
+    norm = {
+        'BTC': 'BTC', 'ETH': 'ETH',
+        'BTC_USD': 'BTC', 'ETH_USD': 'ETH'
+    }
+    if ticker not in norm:
+        raise HTTPException(status_code=400, detail="Invalid ticker. Must be BTC or ETH")
+    
+    end_timestamp = int(time.time())
+    summary = await latency_summary(db, norm[ticker], end_timestamp - hours * 3600, end_timestamp)
+    return TickLatencyResponse(**summary)
+
+
+@router.get("/stats/daily", response_model=DailyStatsSummaryResponse)
+async def get_daily_stats(
+    ticker: str = Query(..., description="Тикер валюты (BTC или ETH). Допускаются также BTC_USD/ETH_USD"),
+    start_date: str = Query(..., description="Первые сутки (DD-MM-YYYY, UTC)"),
+    end_date: Optional[str] = Query(None, description="Последние сутки (DD-MM-YYYY, UTC) включительно; по умолчанию сегодня"),
+    include_days: bool = Query(False, description="Включить статистику по каждым суткам"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Получить статистику цен за диапазон суток UTC.
+    
+    Закрытые сутки берутся из таблицы daily_price_stats, текущие - из
+    накопителя, который обновляется каждым записанным тиком, поэтому
+    стоимость запроса растет с числом дней, а не тиков.
+    
+    Args:
+        ticker: Тикер валюты (обязательный параметр)
+        start_date: Первые сутки в формате DD-MM-YYYY
+        end_date: Последние сутки в формате DD-MM-YYYY (опционально)
+        include_days: Включить статистику по каждым суткам
+        db: Сессия базы данных
+        
+    Returns:
+        Число тиков, min/max, среднее, стандартное отклонение, первая и последняя цена
+    """
+    norm = {
+        'BTC': 'BTC', 'ETH': 'ETH',
+        'BTC_USD': 'BTC', 'ETH_USD': 'ETH'
+    }
+    if ticker not in norm:
+        raise HTTPException(status_code=400, detail="Invalid ticker. Must be BTC or ETH")
     
-    return PriceListResponse(
+    ticker_norm = norm[ticker]
+    today = daily_stats.day_start(time.time())
+    
+    try:
+        start_day = int(datetime.strptime(start_date, "%d-%m-%Y").replace(tzinfo=timezone.utc).timestamp())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid start_date format. Use DD-MM-YYYY")
+    end_day = today
+    if end_date:
+        try:
+            end_day = int(datetime.strptime(end_date, "%d-%m-%Y").replace(tzinfo=timezone.utc).timestamp())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid end_date format. Use DD-MM-YYYY")
+    
+    summary = await daily_stats.summarize(
+        db, ticker_norm, start_day, end_day, today, recent_prices.current_day(ticker_norm, today)
+    )
+    daily = None
+    if include_days:
+        daily = [DailyStatsResponse(day=item.day, final=item.final, **item.stats.as_dict()) for item in summary.days]
+    return DailyStatsSummaryResponse(
+        ticker=ticker_norm,
+        start_day=start_day,
+        end_day=min(end_day, today),
+        days=len(summary.days),
+        days_missing=summary.days_missing,
+        daily=daily,
+        **summary.total.as_dict(),
+    )
+
+
+@router.get("/sync", response_model=PriceSyncResponse)
+async def sync_prices(
+    since_id: int = Query(0, ge=0, description="id последней полученной записи (0 - с начала)"),
+    ticker: Optional[str] = Query(None, description="Тикер валюты (BTC или ETH); по умолчанию все"),
+    since_timestamp: Optional[int] = Query(None, ge=0, description="Только записи с timestamp не раньше"),
+    limit: int = Query(1000, ge=1, description="Максимум записей в ответе"),
+    wait: float = Query(0, ge=0, description="Сколько секунд ждать новых записей, если их нет (long-poll)"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Получить записи, добавленные после водяного знака, для зеркалирования таблицы цен.
+    
+    Записи отдаются по возрастанию id пачками до limit строк. Клиент
+    передает next_since_id ответа в следующий запрос; пока has_more равен
+    true, следующую пачку можно запрашивать сразу. С wait > 0 при отсутствии
+    новых записей ответ задерживается до их появления или истечения wait.
+    
+    Args:
+        since_id: Водяной знак - id последней полученной записи
+        ticker: Тикер валюты (опционально)
+        since_timestamp: Начало истории для первой синхронизации (опционально)
+        limit: Размер пачки (не больше SYNC_MAX_BATCH_ROWS)
+        wait: Ожидание новых записей (не больше SYNC_MAX_WAIT_SECONDS)
+        db: Сессия базы данных
+        
+    Returns:
+        Пачка записей и водяной знак для следующего запроса
+    """
+    ticker_norm = None
+    if ticker is not None:
+        norm = {
+            'BTC': 'BTC', 'ETH': 'ETH',
+            'BTC_USD': 'BTC', 'ETH_USD': 'ETH'
+        }
+        if ticker not in norm:
+            raise HTTPException(status_code=400, detail="Invalid ticker. Must be BTC or ETH")
+        ticker_norm = norm[ticker]
+    
+    limit = min(limit, settings.sync_max_batch_rows)
+    service = PriceService(db)
+    prices = await service.wait_for_changes(
+        since_id, ticker_norm, since_timestamp, limit + 1, min(wait, settings.sync_max_wait_seconds)
+    )
+    has_more = len(prices) > limit
+    prices = prices[:limit]
+    return PriceSyncResponse(
         prices=[PriceResponse.model_validate(price) for price in prices],
-        total=len(prices)
+        next_since_id=prices[-1].id if prices else since_id,
+        has_more=has_more,
+    )
+
+
+def export_job_response(job: ExportJob) -> ExportJobResponse:
+    """Состояние задания выгрузки для ответа API."""
+    progress = None
+    if job.status == export.DONE:
+        progress = 1.0
+    elif job.rows_total:
+        progress = round(job.rows_written / job.rows_total, 4)
+    return ExportJobResponse(
+        id=job.id,
+        tickers=job.tickers.split(","),
+        start_timestamp=job.start_timestamp,
+        end_timestamp=job.end_timestamp,
+        format=job.format,
+        status=job.status,
+        rows_total=job.rows_total,
+        rows_written=job.rows_written,
+        progress=progress,
+        file_size=job.file_size,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        download_url=f"{router.prefix}/exports/{job.id}/download" if job.status == export.DONE else None,
+    )
+
+
+@router.post("/exports", response_model=ExportJobResponse, status_code=202)
+async def create_export(
+    export_request: ExportJobCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Создать задание выгрузки цен в файл.
+    
+    Выгрузку выполняет воркер Celery, процесс API только ставит задание в
+    очередь. Состояние задания доступно по GET /exports/{job_id}.
+    
+    Args:
+        export_request: Тикеры, диапазон дат и формат файла
+        db: Сессия базы данных (primary)
+    
+    Returns:
+        Созданное задание в статусе pending
+    """
+    norm = {
+        'BTC': 'BTC', 'ETH': 'ETH',
+        'BTC_USD': 'BTC', 'ETH_USD': 'ETH'
+    }
+    if any(t not in norm for t in export_request.tickers):
+        raise HTTPException(status_code=400, detail="Invalid ticker. Must be BTC or ETH")
+    
+    if export_request.format not in export.available_formats():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format. Must be one of {list(export.available_formats())}"
+        )
+    
+    start_datetime = None
+    end_datetime = None
+    
+    if export_request.start_date:
+        try:
+            start_datetime = datetime.strptime(export_request.start_date, "%d-%m-%Y")
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid start_date format. Use DD-MM-YYYY"
+            )
+    
+    if export_request.end_date:
+        try:
+            end_datetime = datetime.strptime(export_request.end_date, "%d-%m-%Y")
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid end_date format. Use DD-MM-YYYY"
+            )
+    
+    start_ts, end_ts = date_range_to_timestamps(start_datetime, end_datetime)
+    tickers_norm = list(dict.fromkeys(norm[t] for t in export_request.tickers))
+    job = export.new_job(tickers_norm, start_ts, end_ts, export_request.format)
+    db.add(job)
+    await db.commit()
+    
+    try:
+        await run_in_threadpool(export_prices.delay, job.id)
+    except Exception as e:
+        job.status = export.FAILED
+        job.error = f"Failed to enqueue export: {str(e)}"[:1024]
+        await db.commit()
+        raise HTTPException(status_code=503, detail="Export queue is unavailable")
+    
+    return export_job_response(job)
+
+
+async def get_export_job(job_id: str, db: AsyncSession) -> ExportJob:
+    """Задание выгрузки по идентификатору или 404."""
+    job = await db.get(ExportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Export job {job_id} not found")
+    return job
+
+
+@router.get("/exports/{job_id}", response_model=ExportJobResponse)
+async def get_export(
+    job_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Получить состояние задания выгрузки.
+    
+    Args:
+        job_id: Идентификатор задания
+        db: Сессия базы данных (primary: задание обновляет воркер)
+    
+    Returns:
+        Статус, число выгруженных строк и доля выполнения
+    """
+    return export_job_response(await get_export_job(job_id, db))
+
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int) -> Optional[tuple]:
+    """
+    Разобрать заголовок Range с одним диапазоном байт.
+    
+    Args:
+        header: Значение заголовка, например bytes=0-1023, bytes=1024- или bytes=-512
+        size: Размер файла
+    
+    Returns:
+        Пара (start, end) включительно или None, если заголовок не поддерживается
+        (несколько диапазонов или другая единица) и нужно отдать весь файл
+    
+    Raises:
+        HTTPException: 416, если диапазон вне файла
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+def read_file(path: str, start: int, end: int, chunk_size: int = 65536) -> Iterator[bytes]:
+    """Прочитать байты файла [start, end] фрагментами (выполняется в пуле потоков)."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@router.get("/exports/{job_id}/download")
+async def download_export(
+    job_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Скачать файл завершенной выгрузки.
+    
+    Поддерживается заголовок Range с одним диапазоном байт, поэтому
+    прерванную загрузку большого файла можно продолжить.
+    
+    Args:
+        job_id: Идентификатор задания
+        request: Запрос (заголовок Range)
+        db: Сессия базы данных (primary)
+    
+    Returns:
+        Файл целиком (200) или запрошенный диапазон (206)
+    """
+    job = await get_export_job(job_id, db)
+    if job.status != export.DONE or not job.file_path or not os.path.exists(job.file_path):
+        raise HTTPException(status_code=409, detail=f"Export job {job_id} is not finished (status: {job.status})")
+    
+    size = os.path.getsize(job.file_path)
+    writer_class = export.available_formats().get(job.format, export.CsvWriter)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{os.path.basename(job.file_path)}"',
+    }
+    byte_range = parse_range(request.headers["range"], size) if "range" in request.headers else None
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    
+    return StreamingResponse(
+        read_file(job.file_path, start, end),
+        status_code=status_code,
+        media_type=writer_class.media_type,
+        headers=headers,
     )
@@ -1,6 +1,10 @@
 """Конфигурация Celery."""
+import os
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import worker_init, worker_process_shutdown
 from app.config import settings
+from app.metrics import start_metrics_server, mark_process_dead
 
 celery_app = Celery(
     "deribit_price_tracker",
@@ -16,9 +20,14 @@ celery_app.conf.update(
     timezone="UTC",
     enable_utc=True,
     beat_schedule={
-        "fetch-prices-every-minute": {
-            "task": "app.tasks.fetch_prices",
-            "schedule": 60.0,  # каждую минуту (ровно 60 секунд)
+        "repair-gaps": {
+            "task": "app.tasks.repair_gaps",
+            "schedule": settings.gap_repair_interval_seconds,
+        },
+        "finalize-daily-stats": {
+            "task": "app.tasks.finalize_daily_stats",
+            # Вскоре после закрытия суток UTC
+            "schedule": crontab(hour=0, minute=settings.daily_stats_finalize_minute),
         },
     },
     # Настройки для точного выполнения задач
@@ -27,3 +36,24 @@ celery_app.conf.update(
     task_acks_late=True,  # Подтверждать задачу только после выполнения
     worker_max_tasks_per_child=50,  # Перезапускать worker после N задач для стабильности
 )
+
+# При ingestion_scheduler="asyncio" тики пишет процесс app.scheduler,
+# и задача fetch_prices из beat отключается, чтобы не дублировать записи
+if settings.ingestion_scheduler == "beat":
+    celery_app.conf.beat_schedule["fetch-prices-every-minute"] = {
+        "task": "app.tasks.fetch_prices",
+        "schedule": 60.0,  # каждую минуту (ровно 60 секунд)
+    }
+
+
+@worker_init.connect
+def _start_worker_metrics(**kwargs):
+    """Запустить сервер метрик в главном процессе воркера (агрегирует дочерние процессы)."""
+    if settings.celery_metrics_port:
+        start_metrics_server(settings.celery_metrics_port)
+
+
+@worker_process_shutdown.connect
+def _cleanup_worker_metrics(pid=None, **kwargs):
+    """Удалить метрики завершившегося дочернего процесса."""
+    mark_process_dead(pid or os.getpid())
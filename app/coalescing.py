@@ -0,0 +1,74 @@
+"""Объединение одновременных одинаковых запросов (single flight).
+
+При загрузке дашборда десятки одинаковых запросов /last и /filter приходят
+почти одновременно. Первый запрос с данным ключом выполняет запрос к БД и
+сериализацию, остальные ждут его результат, а не выполняют свои запросы.
+Результат не кэшируется: после завершения вызова следующий запрос снова
+идет в БД.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+from app.config import settings
+from app.metrics import record_cache_lookup
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Группа вызовов, в которой одновременно выполняется не больше одного вызова на ключ."""
+    
+    def __init__(self, name: str):
+        """
+        Инициализация.
+        
+        Args:
+            name: Имя группы для метрик (cache="singleflight_<name>")
+        """
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+    
+    @property
+    def in_flight(self) -> int:
+        """Число выполняющихся вызовов."""
+        return len(self._calls)
+    
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполнить func или дождаться уже выполняющегося вызова с тем же ключом.
+        
+        Исключение вызова получают все ожидающие. Если запрос, начавший
+        вызов, отменен (клиент отключился), вызов отменяется, и один из
+        ожидающих выполняет свой func заново.
+        
+        Args:
+            key: Ключ запроса (нормализованные параметры)
+            func: Фабрика корутины вызова
+        
+        Returns:
+            Результат вызова
+        """
+        if not settings.coalesce_enabled:
+            return await func()
+        
+        while True:
+            task = self._calls.get(key)
+            if task is None:
+                record_cache_lookup(f"singleflight_{self.name}", False)
+                task = asyncio.ensure_future(func())
+                self._calls[key] = task
+                task.add_done_callback(lambda done, key=key: self._forget(key, done))
+                return await task
+            
+            record_cache_lookup(f"singleflight_{self.name}", True)
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if task.cancelled() and not asyncio.current_task().cancelling():
+                    # Отменен начавший вызов запрос, а не текущий - выполняем заново
+                    continue
+                raise
+    
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
@@ -0,0 +1,270 @@
+"""Сжатие ответов API (gzip, brotli, zstd) по заголовку Accept-Encoding.
+
+ASGI middleware сжимает тело по мере отправки: каждый фрагмент потокового
+ответа сжимается и сбрасывается клиенту сразу, без накопления всего тела.
+Ответы меньше COMPRESSION_MINIMUM_SIZE (например /last) и уже сжатые
+ответы передаются без изменений.
+
+brotli и zstd доступны, если установлены пакеты brotli и zstandard;
+без них клиенту предлагается gzip.
+"""
+import zlib
+from typing import Callable, Dict, List, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from app.config import settings
+from app.metrics import COMPRESSION_BYTES
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - зависит от окружения
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - зависит от окружения
+    zstandard = None
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/problem+json", "application/x-ndjson")
+
+
+class GzipEncoder:
+    """Потоковый gzip (zlib)."""
+    
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+    
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+    
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    """Потоковый brotli."""
+    
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+    
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+    
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+    
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    """Потоковый zstd."""
+    
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+    
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+    
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_encoders() -> Dict[str, Callable]:
+    """
+    Доступные кодировки в порядке предпочтения сервера.
+    
+    Returns:
+        Имя кодировки (значение Content-Encoding) -> класс потокового кодировщика
+    """
+    encoders = {}
+    if zstandard is not None:
+        encoders["zstd"] = ZstdEncoder
+    if brotli is not None:
+        encoders["br"] = BrotliEncoder
+    encoders["gzip"] = GzipEncoder
+    return encoders
+
+
+def default_level(encoding: str) -> int:
+    """Уровень сжатия кодировки из настроек."""
+    return {
+        "gzip": settings.compression_gzip_level,
+        "br": settings.compression_brotli_quality,
+        "zstd": settings.compression_zstd_level,
+    }[encoding]
+
+
+def negotiate(accept_encoding: str, supported: List[str]) -> Optional[str]:
+    """
+    Выбрать кодировку по заголовку Accept-Encoding.
+    
+    Выбирается кодировка с наибольшим q; при равных q - первая в supported.
+    "*" относится ко всем кодировкам, не перечисленным явно.
+    
+    Args:
+        accept_encoding: Значение заголовка
+        supported: Поддерживаемые кодировки в порядке предпочтения
+    
+    Returns:
+        Имя кодировки или None, если подходящей нет
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    
+    best, best_q = None, 0.0
+    for name in supported:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionMiddleware:
+    """ASGI middleware потокового сжатия ответов."""
+    
+    def __init__(self, app, minimum_size: int = None, encoders: Dict[str, Callable] = None):
+        """
+        Инициализация.
+        
+        Args:
+            app: ASGI приложение
+            minimum_size: Минимальный размер тела для сжатия (по умолчанию из настроек)
+            encoders: Кодировки в порядке предпочтения (по умолчанию все доступные)
+        """
+        self.app = app
+        self.minimum_size = settings.compression_minimum_size if minimum_size is None else minimum_size
+        self.encoders = available_encoders() if encoders is None else encoders
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.compression_enabled:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), list(self.encoders))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingResponder(self.app, encoding, self.encoders[encoding], self.minimum_size)
+        await responder(scope, receive, send)
+
+
+class _CompressingResponder:
+    """Сжатие одного ответа."""
+    
+    def __init__(self, app, encoding: str, encoder_class: Callable, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.encoder_class = encoder_class
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start_message = None
+        self.encoder = None
+        self.passthrough = False
+        self.flush_chunks = True
+        self.bytes_in = 0
+        self.bytes_out = 0
+    
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        try:
+            await self.app(scope, receive, self.send_wrapper)
+        finally:
+            if self.encoder is not None:
+                COMPRESSION_BYTES.labels(encoding=self.encoding, direction="in").inc(self.bytes_in)
+                COMPRESSION_BYTES.labels(encoding=self.encoding, direction="out").inc(self.bytes_out)
+    
+    def _compressible(self, headers: Headers) -> bool:
+        """Можно ли сжимать ответ с такими заголовками."""
+        if "content-encoding" in headers or "content-range" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+    
+    async def send_wrapper(self, message):
+        if self.passthrough:
+            await self.send(message)
+            return
+        
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            content_length = headers.get("content-length")
+            if message["status"] < 200 or message["status"] in (204, 206, 304):
+                self.passthrough = True
+            elif not self._compressible(headers):
+                self.passthrough = True
+            elif content_length is not None and int(content_length) < self.minimum_size:
+                self.passthrough = True
+            else:
+                # Тело без Content-Length - настоящий поток: каждый фрагмент сбрасывается
+                # клиенту сразу; тело известной длины сжимается без промежуточных сбросов
+                self.flush_chunks = content_length is None
+                # Решение о сжатии потока откладывается до первого фрагмента тела
+                return
+            await self.send(message)
+            return
+        
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        
+        if self.encoder is None:
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            
+            self.encoder = self.encoder_class(default_level(self.encoding))
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                # Длина сжатого тела заранее неизвестна: chunked transfer encoding
+                if "content-length" in headers:
+                    del headers["content-length"]
+            else:
+                chunk = self._encode(body, more_body)
+                headers["Content-Length"] = str(len(chunk))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": chunk})
+                return
+            await self.send(self.start_message)
+        
+        chunk = self._encode(body, more_body)
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+    
+    def _encode(self, body: bytes, more_body: bool) -> bytes:
+        """Сжать фрагмент тела."""
+        self.bytes_in += len(body)
+        if not more_body:
+            chunk = self.encoder.compress(body) + self.encoder.finish()
+        elif self.flush_chunks:
+            chunk = self.encoder.compress(body) + self.encoder.flush()
+        else:
+            chunk = self.encoder.compress(body)
+        self.bytes_out += len(chunk)
+        return chunk
@@ -12,18 +12,171 @@ class Settings(BaseSettings):
     postgres_host: str = "localhost"
     postgres_port: int = 5432
     
+    # Пул соединений primary (запись и чтение без реплик)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # Кэш подготовленных выражений asyncpg на соединение (0 - отключить, нужно для pgbouncer)
+    db_statement_cache_size: int = 256
+    # Прогрев при запуске API: число заранее открываемых соединений на primary и
+    # каждой реплике (не больше размера пула) и ограничение времени прогрева
+    db_warmup_connections: int = 5
+    db_warmup_timeout: float = 30.0
+    
+    # Реплики для чтения истории из API (JSON список URL postgresql://...).
+    # Реплика, отстающая больше db_replica_max_lag_seconds или недоступная,
+    # пропускается, и чтение идет с primary.
+    db_replica_urls: list[str] = []
+    db_replica_pool_size: int = 10
+    db_replica_max_overflow: int = 10
+    db_replica_max_lag_seconds: float = 30.0
+    db_replica_check_interval: float = 5.0
+    
     redis_host: str = "localhost"
     redis_port: int = 6379
+    redis_socket_timeout: float = 0.1
+    
+    # Контроль допуска API: лимиты одновременных запросов и очереди ожидания
+    # для дешевых (/last, /gaps), тяжелых (история, /aligned) и long-poll (/sync) маршрутов
+    admission_enabled: bool = True
+    admission_cheap_concurrency: int = 64
+    admission_cheap_queue: int = 256
+    admission_heavy_concurrency: int = 4
+    admission_heavy_queue: int = 16
+    admission_sync_concurrency: int = 256
+    admission_sync_queue: int = 64
+    admission_queue_timeout: float = 2.0
+    admission_retry_after: int = 1
+    # Лимиты запросов клиента в минуту (Redis, 0 - без лимита); заголовок с адресом
+    # клиента задается только за доверенным прокси, например X-Forwarded-For
+    rate_limit_cheap_per_minute: int = 1200
+    rate_limit_heavy_per_minute: int = 60
+    rate_limit_sync_per_minute: int = 600
+    rate_limit_client_header: str = ""
+    # Максимум строк в ответе истории и точек в выровненных рядах
+    max_result_rows: int = 100000
+    # Объединение одновременных одинаковых запросов чтения цен
+    coalesce_enabled: bool = True
+    # Окно последних цен в памяти API, обновляемое уведомлениями о записи через Redis
+    recent_store_enabled: bool = True
+    recent_window_hours: int = 25
+    recent_store_capacity: int = 200000
+    recent_store_resync_seconds: int = 300
+    # Окно тикера без уведомлений дольше этого (около трех интервалов получения цен)
+    # считается отставшим, и запросы идут в БД до следующего уведомления или перезагрузки
+    recent_store_max_staleness_seconds: int = 180
+    # Инкрементальная синхронизация /sync: максимум строк в пачке, максимум ожидания
+    # long-poll и интервал проверки БД, если уведомления о записи недоступны
+    sync_max_batch_rows: int = 5000
+    sync_max_wait_seconds: float = 30.0
+    sync_poll_interval_seconds: float = 2.0
+    # Строки моложе этого не отдаются /sync: транзакция записи с меньшим id может
+    # зафиксироваться позже строки с большим id (0 - отдавать сразу)
+    sync_settle_seconds: int = 5
+    # Сжатие ответов по Accept-Encoding (brotli и zstd - при установленных пакетах)
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
     
     celery_broker_url: str = "redis://localhost:6379/0"
     celery_result_backend: str = "redis://localhost:6379/0"
     
     deribit_api_url: str = "https://www.deribit.com/api/v2"
     
+    # Отказоустойчивость клиента Deribit
+    deribit_request_timeout: float = 2.0
+    deribit_retry_attempts: int = 3
+    deribit_retry_base_delay: float = 0.1
+    deribit_retry_max_delay: float = 1.0
+    deribit_retry_budget: float = 5.0
+    deribit_circuit_failure_threshold: int = 5
+    deribit_circuit_reset_timeout: float = 30.0
+    deribit_hedge_enabled: bool = False
+    deribit_hedge_min_samples: int = 20
+    deribit_hedge_percentile: float = 95.0
+    
+    # Отслеживаемые тикеры (валюты индексов Deribit)
+    tracked_tickers: list[str] = ["BTC", "ETH"]
+    
+    # Источник тиков: "beat" - задача fetch_prices по расписанию Celery beat,
+    # "asyncio" - отдельный процесс app.scheduler с выравниванием по часам
+    ingestion_scheduler: str = "beat"
+    scheduler_interval_seconds: int = 60
+    # Режим процесса app.scheduler: "tick" - одна цена на слот,
+    # "sampled" - замеры каждые sampling_interval_seconds с записью минутной OHLC строки
+    ingestion_mode: str = "tick"
+    sampling_interval_seconds: int = 5
+    # Координация нескольких процессов app.scheduler через Redis: "none" - один процесс,
+    # "leader" - тики пишет держатель аренды лидера, остальные в резерве,
+    # "sharded" - тикеры делятся между живыми процессами консистентным хешированием.
+    # Аренда и запись о членстве истекают через ingestion_lease_seconds без продления;
+    # при любом режиме, кроме "none", fetch_prices занимает минуту тикера в Redis
+    ingestion_coordination: str = "none"
+    ingestion_node_id: str = ""
+    ingestion_lease_seconds: float = 15.0
+    
+    # Трассировка задержки тиков: отметки времени запроса к Deribit (usIn/usOut),
+    # получения ответа и фиксации записи сохраняются в таблицу tick_latency
+    latency_tracing_enabled: bool = True
+    
+    # Порты HTTP серверов метрик Prometheus для процессов без API (0 - не запускать)
+    scheduler_metrics_port: int = 9810
+    celery_metrics_port: int = 9808
+    
+    # Лог медленных SQL запросов (0 - отключить); EXPLAIN ANALYZE выполняет
+    # SELECT повторно, поэтому включается отдельно
+    slow_query_threshold_ms: float = 500.0
+    slow_query_explain: bool = False
+    
+    # Профилирование запросов по X-Profile (пустой токен - отключено)
+    profiling_token: str = ""
+    profiling_dir: str = "/tmp/profiles"
+    
+    # Историческая догрузка (backfill).
+    # У Deribit нет минутной истории индекса, поэтому история берется из свечей
+    # инструмента, имя которого строится по шаблону от валюты.
+    backfill_instrument_template: str = "{currency}-PERPETUAL"
+    backfill_resolution: str = "1"
+    backfill_window_seconds: int = 43200
+    backfill_concurrency: int = 4
+    backfill_max_retries: int = 5
+    backfill_rate_limit_backoff: float = 1.0
+    
+    # Выгрузка цен в файлы заданиями Celery: каталог, общий для API и воркера,
+    # размер пачки строк и уровень gzip для CSV
+    export_dir: str = "exports"
+    export_chunk_rows: int = 50000
+    export_gzip_level: int = 6
+    
+    # Поиск и заполнение пропусков в ряду цен; порог не меньше полутора
+    # штатных интервалов между записями (series_interval_seconds)
+    gap_threshold_seconds: int = 90
+    gap_repair_max_attempts: int = 3
+    gap_repair_interval_seconds: float = 600.0
+    
+    # Дневная статистика цен: минута после полуночи UTC, в которую
+    # finalize_daily_stats сохраняет закрытые сутки, и сколько последних
+    # закрытых суток она пересчитывает (сводка считает их по сырым ценам,
+    # пока строки в daily_price_stats нет)
+    daily_stats_finalize_minute: int = 5
+    daily_stats_lookback_days: int = 2
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
 
+    @property
+    def series_interval_seconds(self) -> int:
+        """Штатный интервал между соседними записями ряда цен тикера."""
+        if self.ingestion_scheduler == "asyncio" and self.ingestion_mode != "sampled":
+            return self.scheduler_interval_seconds
+        # fetch_prices пишет тик раз в минуту, режим семплирования - минутные свечи
+        return 60
+    
     @property
     def database_url(self) -> str:
         """Получить URL подключения к базе данных."""
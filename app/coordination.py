@@ -0,0 +1,431 @@
+"""Координация нескольких процессов получения цен через Redis.
+
+Режимы (INGESTION_COORDINATION):
+
+- none: один процесс, Redis не используется
+- leader: тики пишет только держатель аренды лидера, остальные процессы
+  в резерве и забирают аренду, когда она истекает без продления
+- sharded: каждый живой процесс пишет свою часть тикеров; тикеры делятся
+  консистентным хешированием, поэтому при появлении или потере процесса
+  переезжает только часть тикеров
+
+Аренда и запись о членстве продлеваются в фоне каждые треть
+INGESTION_LEASE_SECONDS. Процесс, который дольше срока аренды не смог
+обновить состояние в Redis, перестает писать тики: к этому моменту его
+аренда или запись о членстве могла истечь, и тикеры уже пишет другой процесс.
+
+Дополнительно каждый тикер слота перед записью занимается ключом
+SET NX (claim): пока процессы расходятся во мнении о владельце (смена
+лидера, перебалансировка), один и тот же слот не будет записан дважды.
+При недоступности Redis claim разрешает запись.
+"""
+import os
+import time
+import bisect
+import socket
+import asyncio
+import hashlib
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+from redis.exceptions import RedisError
+from app.config import settings
+from app.metrics import INGESTION_COORDINATION_EVENTS
+from app.redis_client import create_redis
+
+logger = logging.getLogger(__name__)
+
+NONE = "none"
+LEADER = "leader"
+SHARDED = "sharded"
+MODES = (NONE, LEADER, SHARDED)
+
+LEADER_KEY = "ingestion:leader"
+MEMBERS_KEY = "ingestion:members"
+CLAIM_PREFIX = "ingestion:claim"
+# Срок ключа claim: дольше любого интервала получения цен
+CLAIM_TTL_SECONDS = 600
+
+# Продлить аренду, только если ее держит этот процесс
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+# Снять аренду, только если ее держит этот процесс
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def node_id() -> str:
+    """Идентификатор процесса: INGESTION_NODE_ID или имя хоста и pid."""
+    return settings.ingestion_node_id or f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class HashRing:
+    """Кольцо консистентного хеширования с виртуальными узлами."""
+    
+    def __init__(self, nodes: Iterable[str], replicas: int = 64):
+        """
+        Инициализация.
+        
+        Args:
+            nodes: Узлы кольца
+            replicas: Число виртуальных точек на узел (выравнивает доли узлов)
+        """
+        self.nodes = sorted(set(nodes))
+        self._points = sorted(
+            (self._hash(f"{node}#{replica}"), node)
+            for node in self.nodes
+            for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in self._points]
+    
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+    
+    def owner(self, key: str) -> Optional[str]:
+        """
+        Узел, владеющий ключом: первая точка кольца по часовой стрелке от хеша ключа.
+        
+        Args:
+            key: Ключ (тикер)
+        
+        Returns:
+            Узел или None для пустого кольца
+        """
+        if not self._points:
+            return None
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._points)
+        return self._points[index][1]
+    
+    def partition(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Разбить ключи по узлам.
+        
+        Args:
+            keys: Ключи
+        
+        Returns:
+            Узел -> его ключи (у каждого узла кольца есть запись, возможно пустая)
+        """
+        parts = {node: [] for node in self.nodes}
+        for key in keys:
+            owner = self.owner(key)
+            if owner is not None:
+                parts[owner].append(key)
+        return parts
+
+
+class LeaderLease:
+    """Аренда лидера на ключе Redis с ограниченным сроком."""
+    
+    def __init__(self, redis, node: str, ttl: float, key: str = LEADER_KEY):
+        """
+        Инициализация.
+        
+        Args:
+            redis: Асинхронный клиент Redis
+            node: Идентификатор процесса
+            ttl: Срок аренды без продления, секунды
+            key: Ключ аренды
+        """
+        self.redis = redis
+        self.node = node
+        self.ttl_ms = int(ttl * 1000)
+        self.key = key
+    
+    async def acquire(self) -> bool:
+        """
+        Взять свободную аренду или продлить свою.
+        
+        Returns:
+            True, если аренда принадлежит этому процессу
+        """
+        if await self.redis.set(self.key, self.node, nx=True, px=self.ttl_ms):
+            return True
+        return bool(await self.redis.eval(RENEW_SCRIPT, 1, self.key, self.node, self.ttl_ms))
+    
+    async def release(self) -> bool:
+        """
+        Освободить аренду, если она принадлежит этому процессу.
+        
+        Returns:
+            True, если аренда была снята
+        """
+        return bool(await self.redis.eval(RELEASE_SCRIPT, 1, self.key, self.node))
+
+
+class Membership:
+    """Список живых процессов: sorted set с временем последнего продления."""
+    
+    def __init__(self, redis, node: str, ttl: float, key: str = MEMBERS_KEY):
+        """
+        Инициализация.
+        
+        Args:
+            redis: Асинхронный клиент Redis
+            node: Идентификатор процесса
+            ttl: Процесс без продления дольше ttl секунд считается выбывшим
+            key: Ключ списка
+        """
+        self.redis = redis
+        self.node = node
+        self.ttl = ttl
+        self.key = key
+    
+    async def heartbeat(self) -> List[str]:
+        """
+        Продлить запись этого процесса и удалить выбывшие.
+        
+        Время берется с сервера Redis, поэтому расхождение часов узлов
+        не влияет на определение выбывших процессов.
+        
+        Returns:
+            Отсортированный список живых процессов
+        """
+        seconds, microseconds = await self.redis.time()
+        now = seconds + microseconds / 1_000_000
+        await self.redis.zadd(self.key, {self.node: now})
+        await self.redis.zremrangebyscore(self.key, "-inf", now - self.ttl)
+        return sorted(_decode(member) for member in await self.redis.zrange(self.key, 0, -1))
+    
+    async def leave(self):
+        """Удалить запись этого процесса."""
+        await self.redis.zrem(self.key, self.node)
+
+
+async def claim(redis, ticker: str, timestamp: int, node: str) -> bool:
+    """
+    Занять запись тикера за момент времени.
+    
+    Args:
+        redis: Асинхронный клиент Redis
+        ticker: Тикер
+        timestamp: Время слота (или минуты) записи
+        node: Идентификатор процесса
+    
+    Returns:
+        True, если запись еще не занята другим процессом
+    """
+    return bool(await redis.set(f"{CLAIM_PREFIX}:{ticker}:{timestamp}", node, nx=True, ex=CLAIM_TTL_SECONDS))
+
+
+async def release_claim(redis, ticker: str, timestamp: int, node: str) -> bool:
+    """
+    Освободить запись тикера, если ее занял этот процесс.
+    
+    Args:
+        redis: Асинхронный клиент Redis
+        ticker: Тикер
+        timestamp: Время слота (или минуты) записи
+        node: Идентификатор процесса
+    
+    Returns:
+        True, если запись была освобождена
+    """
+    return bool(await redis.eval(RELEASE_SCRIPT, 1, f"{CLAIM_PREFIX}:{ticker}:{timestamp}", node))
+
+
+async def claim_tick(ticker: str, timestamp: int) -> bool:
+    """
+    Занять запись тикера отдельным клиентом Redis (задачи Celery).
+    
+    Args:
+        ticker: Тикер
+        timestamp: Время слота записи
+    
+    Returns:
+        True, если запись не занята или Redis недоступен
+    """
+    try:
+        # Отдельный клиент: задачи Celery создают event loop на каждый запуск
+        async with create_redis() as redis:
+            claimed = await claim(redis, ticker, timestamp, node_id())
+    except (RedisError, OSError) as e:
+        logger.warning(f"Не удалось занять запись {ticker}@{timestamp} в Redis, запись без проверки: {str(e)}")
+        return True
+    if not claimed:
+        INGESTION_COORDINATION_EVENTS.labels(event="claim_conflict").inc()
+    return claimed
+
+
+async def release_tick(ticker: str, timestamp: int):
+    """
+    Освободить запись тикера после неудачной записи (задачи Celery).
+    
+    Иначе слот до истечения CLAIM_TTL_SECONDS не может записать другой процесс.
+    
+    Args:
+        ticker: Тикер
+        timestamp: Время слота записи
+    """
+    try:
+        async with create_redis() as redis:
+            await release_claim(redis, ticker, timestamp, node_id())
+    except (RedisError, OSError) as e:
+        logger.warning(f"Не удалось освободить запись {ticker}@{timestamp} в Redis: {str(e)}")
+
+
+class IngestionCoordinator:
+    """Распределение тикеров между процессами получения цен."""
+    
+    def __init__(
+        self,
+        redis,
+        mode: str = None,
+        node: str = None,
+        ttl: float = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Инициализация.
+        
+        Args:
+            redis: Асинхронный клиент Redis
+            mode: "none", "leader" или "sharded" (по умолчанию из настроек)
+            node: Идентификатор процесса (по умолчанию node_id())
+            ttl: Срок аренды и записи о членстве, секунды
+            clock: Монотонные часы для проверки свежести состояния
+        """
+        self.mode = mode or settings.ingestion_coordination
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown ingestion coordination mode: {self.mode}")
+        self.redis = redis
+        self.node = node or node_id()
+        self.ttl = ttl or settings.ingestion_lease_seconds
+        self.clock = clock
+        self.lease = LeaderLease(redis, self.node, self.ttl)
+        self.membership = Membership(redis, self.node, self.ttl)
+        self.leader = False
+        self.ring = HashRing([self.node])
+        self._refreshed_at: Optional[float] = None
+    
+    async def refresh(self) -> bool:
+        """
+        Продлить аренду лидера или запись о членстве и обновить распределение.
+        
+        Returns:
+            True, если состояние обновлено
+        """
+        if self.mode == NONE:
+            return True
+        started = self.clock()
+        try:
+            if self.mode == LEADER:
+                leader = await self.lease.acquire()
+                if leader != self.leader:
+                    INGESTION_COORDINATION_EVENTS.labels(event="leader_acquired" if leader else "leader_lost").inc()
+                    logger.info(f"Процесс {self.node} {'стал лидером' if leader else 'больше не лидер'}")
+                self.leader = leader
+            else:
+                nodes = await self.membership.heartbeat()
+                if nodes != self.ring.nodes:
+                    INGESTION_COORDINATION_EVENTS.labels(event="rebalanced").inc()
+                    self.ring = HashRing(nodes)
+                    logger.info(f"Состав процессов изменился: {nodes}, тикеры процесса {self.node}: "
+                                f"{self.ring.partition(settings.tracked_tickers).get(self.node, [])}")
+        except (RedisError, OSError) as e:
+            INGESTION_COORDINATION_EVENTS.labels(event="redis_error").inc()
+            logger.warning(f"Не удалось обновить координацию в Redis: {str(e)}")
+            return False
+        # Отсчет от начала запроса: аренда в Redis продлена не раньше этого момента
+        self._refreshed_at = started
+        return True
+    
+    def fresh(self) -> bool:
+        """Состояние обновлялось в пределах срока аренды."""
+        if self.mode == NONE:
+            return True
+        return self._refreshed_at is not None and self.clock() - self._refreshed_at < self.ttl
+    
+    def assigned(self, tickers: Sequence[str]) -> List[str]:
+        """
+        Тикеры, которые этот процесс должен записывать.
+        
+        Args:
+            tickers: Все отслеживаемые тикеры
+        
+        Returns:
+            Тикеры процесса; пустой список, если состояние устарело
+        """
+        if self.mode == NONE:
+            return list(tickers)
+        if not self.fresh():
+            logger.warning(f"Координация не обновлялась дольше {self.ttl} с, процесс {self.node} не пишет тики")
+            return []
+        if self.mode == LEADER:
+            return list(tickers) if self.leader else []
+        return [ticker for ticker in tickers if self.ring.owner(ticker) == self.node]
+    
+    async def claim(self, ticker: str, timestamp: int) -> bool:
+        """
+        Занять запись тикера за слот.
+        
+        Args:
+            ticker: Тикер
+            timestamp: Время слота (или минуты) записи
+        
+        Returns:
+            True, если запись не занята другим процессом или Redis недоступен
+        """
+        if self.mode == NONE:
+            return True
+        try:
+            claimed = await claim(self.redis, ticker, timestamp, self.node)
+        except (RedisError, OSError) as e:
+            logger.warning(f"Не удалось занять запись {ticker}@{timestamp} в Redis, запись без проверки: {str(e)}")
+            return True
+        if not claimed:
+            INGESTION_COORDINATION_EVENTS.labels(event="claim_conflict").inc()
+            logger.info(f"Запись {ticker}@{timestamp} уже занята другим процессом")
+        return claimed
+    
+    async def release(self, ticker: str, timestamp: int):
+        """
+        Освободить запись тикера за слот после неудачной записи.
+        
+        Args:
+            ticker: Тикер
+            timestamp: Время слота (или минуты) записи
+        """
+        if self.mode == NONE:
+            return
+        try:
+            await release_claim(self.redis, ticker, timestamp, self.node)
+        except (RedisError, OSError) as e:
+            logger.warning(f"Не удалось освободить запись {ticker}@{timestamp} в Redis: {str(e)}")
+    
+    async def run(self, stop: asyncio.Event):
+        """
+        Продлевать состояние каждые треть срока аренды до установки события stop.
+        
+        Args:
+            stop: Событие остановки
+        """
+        while not stop.is_set():
+            await self.refresh()
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.ttl / 3)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def close(self):
+        """Освободить аренду и запись о членстве, чтобы другие процессы забрали тикеры сразу."""
+        try:
+            if self.mode == LEADER:
+                await self.lease.release()
+            elif self.mode == SHARDED:
+                await self.membership.leave()
+        except (RedisError, OSError) as e:
+            logger.warning(f"Не удалось освободить координацию в Redis: {str(e)}")
+        self.leader = False
@@ -1,17 +1,139 @@
 """Подключение к базе данных."""
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from app import timing
 from app.config import settings
+from app.metrics import DB_POOL_CHECKOUT_WAIT
+
+logger = logging.getLogger(__name__)
+
+# Ограничение длины параметров в логе медленных запросов
+MAX_LOGGED_PARAMETERS = 1000
 
 # Используем asyncpg для асинхронной работы с PostgreSQL
 database_url = settings.database_url.replace("postgresql://", "postgresql+asyncpg://")
 
+
+
+def engine_options(pool_size: int, max_overflow: int) -> dict:
+    """
+    Параметры create_async_engine для PostgreSQL: пул и кэш подготовленных выражений asyncpg.
+    
+    Args:
+        pool_size: Постоянный размер пула
+        max_overflow: Число дополнительных соединений сверх pool_size
+    
+    Returns:
+        Именованные аргументы для create_async_engine
+    """
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        # Кэш prepared statements адаптера SQLAlchemy на соединение; 0 - для pgbouncer в режиме transaction
+        "connect_args": {"prepared_statement_cache_size": settings.db_statement_cache_size},
+    }
+
+
 engine = create_async_engine(
     database_url,
     echo=False,
     future=True,
+    **engine_options(settings.db_pool_size, settings.db_max_overflow),
 )
 
+
+def _format_parameters(parameters, executemany: bool) -> str:
+    """Параметры запроса для лога: для executemany - число наборов и первый набор."""
+    if executemany and parameters:
+        text = f"{len(parameters)} наборов, первый: {parameters[0]!r}"
+    else:
+        text = repr(parameters)
+    if len(text) > MAX_LOGGED_PARAMETERS:
+        text = text[:MAX_LOGGED_PARAMETERS] + "..."
+    return text
+
+
+def _explain_analyze(conn, statement: str, parameters) -> str:
+    """
+    Получить план выполнения запроса через EXPLAIN ANALYZE.
+    
+    Запрос выполняется повторно отдельным курсором того же соединения,
+    поэтому вызывается только для SELECT.
+    
+    Returns:
+        Текст плана
+    """
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("EXPLAIN ANALYZE " + statement, parameters)
+        return "\n".join(row[0] for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Начало хранится в контексте выполнения, а не в conn.info: при ошибке
+    # запроса after_cursor_execute не вызывается, и контекст просто отбрасывается
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    timing.record("db", elapsed)
+    
+    threshold = settings.slow_query_threshold_ms
+    if threshold <= 0 or elapsed * 1000 < threshold:
+        return
+    
+    logger.warning(
+        f"Медленный запрос ({elapsed * 1000:.1f} мс): {statement} "
+        f"| параметры: {_format_parameters(parameters, executemany)}"
+    )
+    if (
+        settings.slow_query_explain
+        and not executemany
+        and conn.dialect.name == "postgresql"
+        and statement.lstrip().upper().startswith("SELECT")
+    ):
+        try:
+            logger.warning(f"План медленного запроса:\n{_explain_analyze(conn, statement, parameters)}")
+        except Exception as e:
+            logger.error(f"Не удалось получить EXPLAIN ANALYZE: {str(e)}")
+
+
+def install_query_timing(async_engine: AsyncEngine):
+    """
+    Подключить замер времени каждого SQL запроса к engine.
+    
+    Время запросов учитывается в фазе db заголовка Server-Timing, запросы
+    дольше SLOW_QUERY_THRESHOLD_MS пишутся в лог с параметрами, а при
+    SLOW_QUERY_EXPLAIN - и с планом выполнения (только PostgreSQL).
+    
+    Args:
+        async_engine: Асинхронный engine
+    """
+    sync_engine = async_engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+install_query_timing(engine)
+
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
@@ -22,11 +144,234 @@ AsyncSessionLocal = async_sessionmaker(
 
 Base = declarative_base()
 
+# Отставание реплики в секундах: 0, если реплика проиграла все полученные WAL записи.
+# Сравнение только со временем последней транзакции дало бы ложное отставание
+# при отсутствии записей на primary.
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+@dataclass
+class Replica:
+    """Реплика для чтения и результат последней проверки ее состояния."""
+    name: str
+    engine: AsyncEngine
+    session_factory: async_sessionmaker
+    healthy: bool = True
+    lag: Optional[float] = None
+    checked_at: Optional[float] = None
+
+
+async def probe_replica_lag(replica: Replica) -> float:
+    """
+    Получить отставание реплики от primary.
+    
+    Args:
+        replica: Реплика
+    
+    Returns:
+        Отставание в секундах (0 для СУБД без репликации PostgreSQL)
+    """
+    async with replica.engine.connect() as conn:
+        if conn.dialect.name != "postgresql":
+            return 0.0
+        return float(await conn.scalar(REPLICA_LAG_QUERY))
+
+
+class ReplicaRouter:
+    """Выбор реплики для чтения: по кругу среди доступных реплик с допустимым отставанием."""
+    
+    def __init__(
+        self,
+        replicas: List[Replica],
+        max_lag: float = 30.0,
+        check_interval: float = 5.0,
+        probe: Callable[[Replica], Awaitable[float]] = probe_replica_lag,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Инициализация.
+        
+        Args:
+            replicas: Реплики
+            max_lag: Максимальное допустимое отставание реплики, секунды
+            check_interval: Как долго доверять результату проверки реплики, секунды
+            probe: Функция проверки отставания (ошибка означает недоступность)
+            clock: Источник монотонного времени
+        """
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.probe = probe
+        self.clock = clock
+        self._next = 0
+    
+    async def _check(self, replica: Replica):
+        """Перепроверить реплику, если результат прошлой проверки устарел."""
+        now = self.clock()
+        if replica.checked_at is not None and now - replica.checked_at < self.check_interval:
+            return
+        replica.checked_at = now
+        try:
+            replica.lag = await self.probe(replica)
+        except Exception as e:
+            if replica.healthy:
+                logger.warning(f"Реплика {replica.name} недоступна: {str(e)}")
+            replica.healthy = False
+            return
+        healthy = replica.lag <= self.max_lag
+        if replica.healthy and not healthy:
+            logger.warning(f"Реплика {replica.name} отстает на {replica.lag:.1f} с, чтение идет с primary")
+        replica.healthy = healthy
+    
+    async def choose(self) -> Optional[Replica]:
+        """
+        Выбрать реплику для чтения.
+        
+        Returns:
+            Реплика или None, если подходящих нет и читать нужно с primary
+        """
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(self._next + offset) % len(self.replicas)]
+            await self._check(replica)
+            if replica.healthy:
+                self._next = (self._next + offset + 1) % len(self.replicas)
+                return replica
+        return None
+    
+    def mark_failed(self, replica: Replica):
+        """Пометить реплику недоступной до следующей проверки."""
+        replica.healthy = False
+        replica.checked_at = self.clock()
+
+
+def _create_replica(index: int, url: str) -> Replica:
+    """Создать engine и фабрику сессий реплики."""
+    replica_engine = create_async_engine(
+        url.replace("postgresql://", "postgresql+asyncpg://"),
+        echo=False,
+        future=True,
+        **engine_options(settings.db_replica_pool_size, settings.db_replica_max_overflow),
+    )
+    install_query_timing(replica_engine)
+    factory = async_sessionmaker(
+        replica_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+    return Replica(name=f"replica{index}", engine=replica_engine, session_factory=factory)
+
+
+replica_router = ReplicaRouter(
+    [_create_replica(i, url) for i, url in enumerate(settings.db_replica_urls)],
+    max_lag=settings.db_replica_max_lag_seconds,
+    check_interval=settings.db_replica_check_interval,
+)
+
+
+async def _checkout(session: AsyncSession, role: str):
+    """Взять соединение сразу, чтобы измерить ожидание пула."""
+    started = time.perf_counter()
+    await session.connection()
+    waited = time.perf_counter() - started
+    DB_POOL_CHECKOUT_WAIT.labels(role=role).observe(waited)
+    timing.record("pool", waited)
+
 
 async def get_db() -> AsyncSession:
-    """Получить сессию базы данных."""
+    """Получить сессию базы данных (primary, для записи и чтения)."""
     async with AsyncSessionLocal() as session:
         try:
+            await _checkout(session, "primary")
             yield session
         finally:
             await session.close()
+
+
+async def get_read_db() -> AsyncSession:
+    """
+    Получить сессию для чтения.
+    
+    Сессия открывается на реплике из DB_REPLICA_URLS, если она доступна и
+    отстает не больше DB_REPLICA_MAX_LAG_SECONDS, иначе - на primary.
+    """
+    session = None
+    replica = await replica_router.choose()
+    if replica is not None:
+        session = replica.session_factory()
+        try:
+            await _checkout(session, "replica")
+        except (OSError, SQLAlchemyError) as e:
+            logger.warning(f"Не удалось подключиться к реплике {replica.name}, чтение идет с primary: {str(e)}")
+            replica_router.mark_failed(replica)
+            await session.close()
+            session = None
+    
+    if session is None:
+        session = AsyncSessionLocal()
+        try:
+            await _checkout(session, "primary")
+        except BaseException:
+            await session.close()
+            raise
+    
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+async def warm_up(
+    session_factory,
+    connections: int,
+    queries: Callable[[AsyncSession], Awaitable[None]],
+    timeout: float = 30.0,
+) -> int:
+    """
+    Заранее открыть соединения пула и выполнить на каждом горячие запросы.
+    
+    Соединения удерживаются одновременно, поэтому каждый запрос готовится
+    (prepare) на каждом открытом соединении, и первые запросы после запуска
+    не платят за установку соединения и подготовку выражений.
+    
+    Args:
+        session_factory: Фабрика сессий прогреваемого engine
+        connections: Число соединений
+        queries: Корутина с горячими запросами для сессии
+        timeout: Ограничение времени прогрева, секунды
+    
+    Returns:
+        Число прогретых соединений
+    """
+    if connections <= 0:
+        return 0
+    all_open = asyncio.Event()
+    opened = 0
+    
+    async def warm_one():
+        nonlocal opened
+        async with session_factory() as session:
+            await session.connection()
+            opened += 1
+            if opened == connections:
+                all_open.set()
+            # Держим соединение, пока не откроются остальные, иначе пул вернет это же
+            await all_open.wait()
+            await queries(session)
+    
+    await asyncio.wait_for(asyncio.gather(*(warm_one() for _ in range(connections))), timeout)
+    return opened
+
+
+async def dispose_engines():
+    """Закрыть пулы primary и реплик."""
+    await engine.dispose()
+    for replica in replica_router.replicas:
+        await replica.engine.dispose()
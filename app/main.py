@@ -1,16 +1,159 @@
 """Главный файл FastAPI приложения."""
-from fastapi import FastAPI
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from app import admission, database, profiling, timing
 from app.api.routes import router
+from app.compression import CompressionMiddleware
+from app.config import settings
+from app.metrics import HTTP_REQUEST_DURATION, HTTP_RESPONSE_SIZE, render_metrics
+from app.redis_client import close_redis
+from app.services.price_service import PriceService
+from app.services.recent_store import recent_prices
+
+logger = logging.getLogger(__name__)
+
+
+async def _hot_queries(session: AsyncSession):
+    """Запросы, которые API выполняет чаще всего: готовятся на каждом прогреваемом соединении."""
+    service = PriceService(session)
+    now = int(time.time())
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    for ticker in settings.tracked_tickers:
+        await service.get_last_price(ticker)
+        await service.get_series(ticker, now - 3600, now)
+        # Форма запроса /filter с обеими датами; выборка за одни сутки
+        await service.get_prices_by_date_range(ticker, today, today)
+
+
+async def warm_up_database():
+    """Прогреть пулы primary и реплик перед приемом запросов."""
+    targets = [("primary", database.AsyncSessionLocal, settings.db_pool_size)]
+    targets += [
+        (replica.name, replica.session_factory, settings.db_replica_pool_size)
+        for replica in database.replica_router.replicas
+    ]
+    for name, session_factory, pool_size in targets:
+        started = time.perf_counter()
+        try:
+            opened = await database.warm_up(
+                session_factory,
+                min(settings.db_warmup_connections, pool_size),
+                _hot_queries,
+                timeout=settings.db_warmup_timeout,
+            )
+        except Exception as e:
+            # Недоступная при запуске база не должна мешать старту: пул наполнится по запросам
+            logger.warning(f"Прогрев пула {name} не удался: {str(e)}")
+            continue
+        logger.info(f"Пул {name} прогрет: соединений {opened} за {(time.perf_counter() - started) * 1000:.0f} мс")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Прогрев пулов БД и окна последних цен при запуске, закрытие соединений при остановке."""
+    await warm_up_database()
+    follower = None
+    if settings.recent_store_enabled:
+        follower = asyncio.create_task(recent_prices.follow(database.AsyncSessionLocal, settings.tracked_tickers))
+    yield
+    if follower is not None:
+        follower.cancel()
+        await asyncio.gather(follower, return_exceptions=True)
+    await database.dispose_engines()
+    await close_redis()
+
 
 app = FastAPI(
     title="Deribit Price Tracker API",
     description="API для получения исторических данных о ценах криптовалют с биржи Deribit",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.include_router(router)
 
 
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """Измерить длительность обработки и размер ответа по шаблону маршрута."""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    # Шаблон пути вместо фактического, чтобы не плодить метки
+    path = route.path if route is not None else "unmatched"
+    HTTP_REQUEST_DURATION.labels(
+        method=request.method, route=path, status=str(response.status_code)
+    ).observe(time.perf_counter() - started)
+    content_length = response.headers.get("content-length")
+    if content_length is not None:
+        HTTP_RESPONSE_SIZE.labels(method=request.method, route=path).observe(int(content_length))
+    return response
+
+
+@app.middleware("http")
+async def server_timing_middleware(request: Request, call_next):
+    """Добавить заголовок Server-Timing с разбивкой запроса на фазы db / hydrate / serialize."""
+    timings = timing.start_request()
+    response = await call_next(request)
+    response.headers["Server-Timing"] = timings.header()
+    return response
+
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    """
+    Профилировать запрос под cProfile по заголовку X-Profile или параметру profile.
+    
+    Требуется заголовок X-Admin-Token, равный PROFILING_TOKEN. Вместо ответа
+    обработчика возвращается профиль: "text" - сводка pstats, "pstats" - файл
+    профиля. Профиль также сохраняется в PROFILING_DIR.
+    """
+    mode = request.headers.get("x-profile") or request.query_params.get("profile")
+    if not mode:
+        return await call_next(request)
+    if not profiling.is_authorized(request.headers.get("x-admin-token")):
+        return JSONResponse(status_code=403, content={"detail": "Profiling requires a valid admin token"})
+    if mode not in profiling.PROFILE_FORMATS:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": f"Invalid profile format. Must be one of: {', '.join(profiling.PROFILE_FORMATS)}"},
+        )
+    
+    try:
+        with profiling.profiled() as profiler:
+            response = await call_next(request)
+            # Тело читается под профайлером: сериализация может быть ленивой
+            async for _ in response.body_iterator:
+                pass
+    except profiling.ProfilerBusyError:
+        return JSONResponse(status_code=409, content={"detail": "Another request is being profiled"})
+    
+    path = profiling.save_profile(profiler, f"{request.method}-{request.url.path}")
+    headers = {"X-Profile-File": path, "X-Profiled-Status": str(response.status_code)}
+    if mode == "pstats":
+        with open(path, "rb") as f:
+            content = f.read()
+        headers["Content-Disposition"] = f'attachment; filename="{os.path.basename(path)}"'
+        return Response(content=content, media_type="application/octet-stream", headers=headers)
+    return Response(content=profiling.format_stats(profiler), media_type="text/plain", headers=headers)
+
+
+# Контроль допуска - ASGI middleware: слот держится до конца потокового тела
+app.add_middleware(admission.AdmissionMiddleware)
+
+# add_middleware добавляет слой снаружи уже добавленных, поэтому сжатие
+# подключается после всех middleware выше: метрики и профилирование видят
+# несжатое тело с Content-Length
+app.add_middleware(CompressionMiddleware)
+
+
 @app.get("/")
 async def root():
     """Корневой endpoint."""
@@ -18,3 +161,10 @@ async def root():
         "message": "Deribit Price Tracker API",
         "docs": "/docs"
     }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в формате Prometheus."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,168 @@
+"""Метрики Prometheus.
+
+Для нескольких процессов (uvicorn --workers N, prefork воркеры Celery) нужно
+задать переменную окружения PROMETHEUS_MULTIPROC_DIR с пустым каталогом,
+общим для процессов одного сервиса, до запуска процессов.
+"""
+import os
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+DERIBIT_REQUEST_DURATION = Histogram(
+    "deribit_request_duration_seconds",
+    "Задержка одной попытки запроса к Deribit",
+    ["method"],
+    buckets=LATENCY_BUCKETS,
+)
+DERIBIT_REQUEST_ERRORS = Counter(
+    "deribit_request_errors_total",
+    "Ошибки запросов к Deribit по коду",
+    ["method", "code"],
+)
+DERIBIT_RESILIENCE_EVENTS = Counter(
+    "deribit_resilience_events_total",
+    "События слоя отказоустойчивости клиента Deribit (повторы, таймауты, circuit breaker, hedging)",
+    ["event"],
+)
+
+DB_WRITE_DURATION = Histogram(
+    "db_write_duration_seconds",
+    "Длительность записи цен в БД, включая commit",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Ожидание соединения из пула БД",
+    ["role"],
+    buckets=LATENCY_BUCKETS,
+)
+
+TICK_DURATION = Histogram(
+    "ingestion_tick_duration_seconds",
+    "Время от начала тика (слота) до фиксации цены в БД",
+    ["ticker"],
+    buckets=LATENCY_BUCKETS,
+)
+SCHEDULER_LAG = Histogram(
+    "scheduler_lag_seconds",
+    "Задержка запуска слота планировщика относительно границы интервала",
+    buckets=LATENCY_BUCKETS,
+)
+INGESTION_STAGE_DURATION = Histogram(
+    "ingestion_stage_duration_seconds",
+    "Этапы пути тика: запрос до Deribit, обработка на бирже, ответ, запись в БД, возраст цены при записи",
+    ["ticker", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+INGESTION_COORDINATION_EVENTS = Counter(
+    "ingestion_coordination_events_total",
+    "События координации процессов получения цен: смена лидера, перебалансировка, занятые слоты, ошибки Redis",
+    ["event"],
+)
+SCHEDULER_SKIPPED_SLOTS = Counter(
+    "scheduler_skipped_slots_total",
+    "Пропущенные слоты планировщика",
+    ["reason"],
+)
+PRICE_GAPS_OPEN_MINUTES = Gauge(
+    "price_gaps_open_minutes",
+    "Незаполненные пропущенные минуты по тикеру",
+    ["ticker"],
+    multiprocess_mode="livemax",
+)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Длительность обработки HTTP запроса",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Размер тела HTTP ответа",
+    ["method", "route"],
+    buckets=SIZE_BUCKETS,
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight_requests",
+    "Выполняющиеся запросы по классу маршрутов",
+    ["route_class"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Запросы, отклоненные контролем допуска",
+    ["route_class", "reason"],
+)
+
+COMPRESSION_BYTES = Counter(
+    "http_compression_bytes_total",
+    "Байты тел ответов до (in) и после (out) сжатия",
+    ["encoding", "direction"],
+)
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Обращения к кэшам по результату (hit/miss)",
+    ["cache", "result"],
+)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """
+    Учесть обращение к кэшу.
+
+    Args:
+        cache: Имя кэша
+        hit: Было ли значение найдено
+    """
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def _registry() -> CollectorRegistry:
+    """Реестр для выдачи: агрегированный по процессам в multiprocess режиме."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics() -> tuple:
+    """
+    Сформировать ответ для /metrics.
+
+    Returns:
+        Пара (тело в текстовом формате Prometheus, content type)
+    """
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int):
+    """
+    Запустить отдельный HTTP сервер метрик (для Celery и планировщика).
+
+    Args:
+        port: Порт сервера
+    """
+    start_http_server(port, registry=_registry())
+
+
+def mark_process_dead(pid: int):
+    """Удалить live-gauge файлы завершившегося процесса в multiprocess режиме."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
@@ -1,7 +1,11 @@
 """Модели базы данных."""
-from sqlalchemy import Column, String, Numeric, Integer, BigInteger, Index
+import time
+from sqlalchemy import Column, String, Numeric, Integer, BigInteger, Float, Index, UniqueConstraint
 from app.database import Base
 
+# Значение Price.source для строк исторической догрузки (закрытия свечей perpetual)
+BACKFILL_SOURCE = "backfill"
+
 
 class Price(Base):
     """Модель для хранения цен валют."""
@@ -12,7 +16,138 @@ class Price(Base):
     ticker = Column(String(10), nullable=False, index=True)
     price = Column(Numeric(20, 8), nullable=False)
     timestamp = Column(BigInteger, nullable=False, index=True)
+    # Заполняются только в режиме семплирования: price - цена закрытия минуты
+    open = Column(Numeric(20, 8), nullable=True)
+    high = Column(Numeric(20, 8), nullable=True)
+    low = Column(Numeric(20, 8), nullable=True)
+    samples = Column(Integer, nullable=True)
+    # Происхождение строки: NULL - индексная цена Deribit, BACKFILL_SOURCE - догрузка
+    source = Column(String(16), nullable=True)
+    # Время вставки строки (UNIX timestamp процесса записи): /sync отдает только
+    # строки старше SYNC_SETTLE_SECONDS. NULL - строка записана до появления колонки
+    inserted_at = Column(BigInteger, nullable=True, default=lambda: int(time.time()))
     
     __table_args__ = (
         Index('idx_ticker_timestamp', 'ticker', 'timestamp'),
+        Index('idx_prices_inserted_at', 'inserted_at'),
+    )
+
+
+class TickLatency(Base):
+    """Модель для хранения отметок времени прохождения тика (трассировка задержки)."""
+    
+    __tablename__ = "tick_latency"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    price_id = Column(Integer, nullable=False)
+    ticker = Column(String(10), nullable=False)
+    timestamp = Column(BigInteger, nullable=False)
+    # UNIX time в микросекундах: отправка запроса, получение запроса и отправка
+    # ответа сервером Deribit (usIn/usOut), получение ответа, фиксация записи цены
+    sent_at_us = Column(BigInteger, nullable=False)
+    exchange_in_us = Column(BigInteger, nullable=True)
+    exchange_out_us = Column(BigInteger, nullable=True)
+    received_at_us = Column(BigInteger, nullable=False)
+    committed_at_us = Column(BigInteger, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_tick_latency_ticker_timestamp', 'ticker', 'timestamp'),
     )
+
+
+class BackfillCheckpoint(Base):
+    """Модель для хранения завершенных окон исторической догрузки."""
+    
+    __tablename__ = "backfill_checkpoints"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    window_start = Column(BigInteger, nullable=False)
+    window_end = Column(BigInteger, nullable=False)
+    rows_written = Column(Integer, nullable=False, default=0)
+    completed_at = Column(BigInteger, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint('ticker', 'window_start', 'window_end', name='uq_backfill_window'),
+    )
+
+
+class DailyPriceStats(Base):
+    """Модель для хранения статистики цен тикера за закрытые сутки UTC."""
+    
+    __tablename__ = "daily_price_stats"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    # Начало суток UTC, UNIX timestamp
+    day = Column(BigInteger, nullable=False)
+    ticks = Column(Integer, nullable=False)
+    # Пустые для суток без тиков
+    min_price = Column(Numeric(20, 8), nullable=True)
+    max_price = Column(Numeric(20, 8), nullable=True)
+    first_price = Column(Numeric(20, 8), nullable=True)
+    last_price = Column(Numeric(20, 8), nullable=True)
+    first_timestamp = Column(BigInteger, nullable=True)
+    last_timestamp = Column(BigInteger, nullable=True)
+    # Среднее и стандартное отклонение генеральной совокупности тиков суток
+    mean_price = Column(Float, nullable=True)
+    stddev = Column(Float, nullable=True)
+    updated_at = Column(BigInteger, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint('ticker', 'day', name='uq_daily_price_stats_ticker_day'),
+    )
+
+
+class GapScanWatermark(Base):
+    """Модель для хранения позиции, до которой ряд тикера уже проверен на пропуски."""
+    
+    __tablename__ = "gap_scan_watermarks"
+    
+    ticker = Column(String(10), primary_key=True)
+    scanned_until = Column(BigInteger, nullable=False)
+    updated_at = Column(BigInteger, nullable=False)
+
+
+class PriceGap(Base):
+    """Модель для хранения найденных пропусков в минутном ряду цен."""
+    
+    __tablename__ = "price_gaps"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    # Timestamps тиков, ограничивающих пропуск с обеих сторон
+    gap_start = Column(BigInteger, nullable=False)
+    gap_end = Column(BigInteger, nullable=False)
+    missing_minutes = Column(Integer, nullable=False)
+    detected_at = Column(BigInteger, nullable=False)
+    repaired_at = Column(BigInteger, nullable=True)
+    filled_minutes = Column(Integer, nullable=False, default=0)
+    repair_attempts = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint('ticker', 'gap_start', name='uq_price_gap_start'),
+        Index('idx_price_gaps_open', 'ticker', 'repaired_at'),
+    )
+
+
+class ExportJob(Base):
+    """Модель для хранения заданий выгрузки цен в файл."""
+    
+    __tablename__ = "export_jobs"
+    
+    id = Column(String(32), primary_key=True)
+    # Тикеры через запятую
+    tickers = Column(String(255), nullable=False)
+    start_timestamp = Column(BigInteger, nullable=True)
+    end_timestamp = Column(BigInteger, nullable=True)
+    format = Column(String(16), nullable=False)
+    # pending, running, done или failed
+    status = Column(String(16), nullable=False, default="pending")
+    rows_total = Column(BigInteger, nullable=True)
+    rows_written = Column(BigInteger, nullable=False, default=0)
+    file_path = Column(String(512), nullable=True)
+    file_size = Column(BigInteger, nullable=True)
+    error = Column(String(1024), nullable=True)
+    created_at = Column(BigInteger, nullable=False)
+    finished_at = Column(BigInteger, nullable=True)
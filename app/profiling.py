@@ -0,0 +1,104 @@
+"""Профилирование отдельных запросов и запусков задач через cProfile.
+
+cProfile профилирует весь поток, поэтому во время профилирования запроса
+в профиль попадают и конкурентные корутины того же процесса. Одновременно
+выполняется не больше одного профилирования на процесс.
+"""
+import io
+import os
+import hmac
+import time
+import pstats
+import cProfile
+import logging
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FORMATS = ("text", "pstats")
+
+_active = False
+
+
+class ProfilerBusyError(Exception):
+    """Профилирование уже выполняется в этом процессе."""
+    pass
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    """
+    Проверить токен администратора для профилирования.
+    
+    Args:
+        token: Переданный токен
+    
+    Returns:
+        True, если профилирование включено (PROFILING_TOKEN задан) и токен совпадает
+    """
+    if not settings.profiling_token or not token:
+        return False
+    return hmac.compare_digest(token.encode(), settings.profiling_token.encode())
+
+
+@contextmanager
+def profiled() -> Iterator[cProfile.Profile]:
+    """
+    Выполнить блок под cProfile.
+    
+    Yields:
+        Профайлер, остановленный после выхода из блока
+    
+    Raises:
+        ProfilerBusyError: Если профилирование уже идет
+    """
+    global _active
+    if _active:
+        raise ProfilerBusyError("Profiling is already in progress")
+    _active = True
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        _active = False
+
+
+def save_profile(profiler: cProfile.Profile, name: str) -> str:
+    """
+    Сохранить профиль в формате pstats в каталог PROFILING_DIR.
+    
+    Файл открывается через python -m pstats, snakeviz или speedscope
+    (после конвертации).
+    
+    Args:
+        profiler: Остановленный профайлер
+        name: Имя профилируемой операции
+    
+    Returns:
+        Путь к файлу профиля
+    """
+    os.makedirs(settings.profiling_dir, exist_ok=True)
+    safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name).strip("_")
+    path = os.path.join(settings.profiling_dir, f"{int(time.time() * 1000)}-{safe_name}.prof")
+    profiler.dump_stats(path)
+    return path
+
+
+def format_stats(profiler: cProfile.Profile, limit: int = 40, sort: str = "cumulative") -> str:
+    """
+    Получить текстовую сводку профиля.
+    
+    Args:
+        profiler: Остановленный профайлер
+        limit: Число строк с самыми дорогими функциями
+        sort: Ключ сортировки pstats
+    
+    Returns:
+        Текст в формате pstats.print_stats
+    """
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
@@ -0,0 +1,40 @@
+"""Общий асинхронный клиент Redis для API."""
+from typing import Optional
+from redis.asyncio import Redis
+from app.config import settings
+
+_client: Optional[Redis] = None
+
+
+def create_redis(socket_timeout: Optional[float] = None) -> Redis:
+    """
+    Создать новый клиент Redis в текущем event loop.
+    
+    Короткие таймауты: Redis используется для вспомогательных функций
+    (лимиты, уведомления), и его недоступность не должна задерживать запросы.
+    
+    Args:
+        socket_timeout: Таймаут чтения; по умолчанию REDIS_SOCKET_TIMEOUT
+    """
+    return Redis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        socket_timeout=settings.redis_socket_timeout if socket_timeout is None else socket_timeout,
+        socket_connect_timeout=settings.redis_socket_timeout,
+    )
+
+
+def get_redis() -> Redis:
+    """Получить общий клиент Redis процесса API (создается при первом обращении)."""
+    global _client
+    if _client is None:
+        _client = create_redis()
+    return _client
+
+
+async def close_redis():
+    """Закрыть клиент Redis, если он был создан."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
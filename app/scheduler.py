@@ -0,0 +1,338 @@
+"""Долгоживущий asyncio планировщик получения цен с выравниванием по часам.
+
+Запуск: python -m app.scheduler
+Альтернатива задаче fetch_prices из Celery beat (см. INGESTION_SCHEDULER).
+"""
+import time
+import signal
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, Sequence
+from app.config import settings
+from app.coordination import NONE, IngestionCoordinator
+from app.database import AsyncSessionLocal
+from app.redis_client import create_redis
+from app.metrics import (
+    DB_WRITE_DURATION,
+    SCHEDULER_LAG,
+    SCHEDULER_SKIPPED_SLOTS,
+    TICK_DURATION,
+    start_metrics_server,
+)
+from app.schemas import PriceCreate
+from app.services.aggregator import MinuteAggregator
+from app.services.deribit_client import DeribitClient
+from app.services.latency import record_tick_latencies
+from app.services.price_service import PriceService
+from app.services.recent_store import publish_prices
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SchedulerStats:
+    """Статистика работы планировщика."""
+    ticks: int = 0
+    overruns: int = 0
+    missed_slots: int = 0
+    last_lag: float = 0.0
+    max_lag: float = 0.0
+
+
+class AlignedScheduler:
+    """Планировщик, срабатывающий точно на границах интервала по настенным часам."""
+    
+    def __init__(
+        self,
+        interval: float,
+        callback: Callable[[float], Awaitable[None]],
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Инициализация планировщика.
+        
+        Args:
+            interval: Интервал в секундах; слоты выровнены по кратным интервалу моментам
+            callback: Корутина, вызываемая с временем слота
+            clock: Источник настенного времени
+        """
+        if interval <= 0:
+            raise ValueError("Scheduler interval must be positive")
+        self.interval = interval
+        self.callback = callback
+        self.clock = clock
+        self.stats = SchedulerStats()
+        self._current: Optional[asyncio.Task] = None
+    
+    def next_slot(self, now: float) -> float:
+        """
+        Получить ближайшую границу интервала строго после момента now.
+        
+        Args:
+            now: Текущее время, UNIX timestamp
+        
+        Returns:
+            Время следующего слота
+        """
+        return (now // self.interval + 1) * self.interval
+    
+    async def _sleep_until(self, slot: float):
+        """Спать до наступления слота, перепроверяя настенные часы после пробуждения."""
+        while True:
+            delay = slot - self.clock()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+    
+    async def _fire(self, slot: float):
+        """Выполнить callback для слота, не давая исключению остановить планировщик."""
+        try:
+            await self.callback(slot)
+        except Exception as e:
+            logger.error(f"Ошибка обработки слота {slot}: {str(e)}", exc_info=True)
+    
+    async def run(self, stop: asyncio.Event):
+        """
+        Запустить цикл планировщика до установки события stop.
+        
+        Если обработка предыдущего слота еще не завершена, новый слот
+        пропускается и учитывается как overrun. Слоты, пропущенные из-за
+        задержки самого цикла, учитываются как missed_slots.
+        
+        Args:
+            stop: Событие остановки
+        """
+        slot = self.next_slot(self.clock())
+        while not stop.is_set():
+            sleeper = asyncio.ensure_future(self._sleep_until(slot))
+            stopper = asyncio.ensure_future(stop.wait())
+            await asyncio.wait({sleeper, stopper}, return_when=asyncio.FIRST_COMPLETED)
+            sleeper.cancel()
+            stopper.cancel()
+            if stop.is_set():
+                break
+            
+            now = self.clock()
+            lag = now - slot
+            self.stats.last_lag = lag
+            self.stats.max_lag = max(self.stats.max_lag, lag)
+            SCHEDULER_LAG.observe(lag)
+            
+            if self._current is not None and not self._current.done():
+                self.stats.overruns += 1
+                SCHEDULER_SKIPPED_SLOTS.labels(reason="overrun").inc()
+                logger.warning(f"Слот {slot} пропущен: обработка предыдущего слота еще не завершена")
+            else:
+                self.stats.ticks += 1
+                self._current = asyncio.create_task(self._fire(slot))
+                if lag > self.interval / 10:
+                    logger.warning(f"Задержка запуска слота {slot}: {lag * 1000:.1f} мс")
+            
+            following = self.next_slot(now)
+            missed = int(round((following - slot) / self.interval)) - 1
+            if missed > 0:
+                self.stats.missed_slots += missed
+                SCHEDULER_SKIPPED_SLOTS.labels(reason="loop_delay").inc(missed)
+                logger.warning(f"Пропущено слотов из-за задержки цикла: {missed}")
+            slot = following
+        
+        if self._current is not None and not self._current.done():
+            await self._current
+
+
+async def ingest_slot(
+    client: DeribitClient,
+    session_factory,
+    slot: float,
+    tickers: Sequence[str],
+    coordinator: Optional[IngestionCoordinator] = None,
+) -> int:
+    """
+    Получить цены всех тикеров и сохранить их с временем слота.
+    
+    Args:
+        client: Клиент Deribit с общей сессией
+        session_factory: Фабрика сессий БД
+        slot: Время слота; используется как timestamp записей
+        tickers: Тикеры для получения
+        coordinator: Координация процессов; тикеры, слот которых занят другим процессом, пропускаются
+    
+    Returns:
+        Количество сохраненных цен
+    """
+    timestamp = int(slot)
+    results = await asyncio.gather(
+        *(client.get_index_price_quote(ticker) for ticker in tickers),
+        return_exceptions=True,
+    )
+    
+    quotes = {}
+    for ticker, result in zip(tickers, results):
+        if isinstance(result, Exception):
+            logger.error(f"Ошибка при получении цены для {ticker}: {str(result)}")
+            continue
+        quotes[ticker] = result
+    if quotes and coordinator is not None:
+        # Слот занимается после успешного запроса: тикер, цену которого не
+        # удалось получить, может записать другой процесс
+        claimed = await asyncio.gather(*(coordinator.claim(ticker, timestamp) for ticker in quotes))
+        quotes = {ticker: quote for (ticker, quote), ok in zip(quotes.items(), claimed) if ok}
+    prices = [PriceCreate(ticker=ticker, price=quote.price, timestamp=timestamp) for ticker, quote in quotes.items()]
+    
+    if prices:
+        async with session_factory() as session:
+            try:
+                with DB_WRITE_DURATION.labels(operation="create_prices").time():
+                    saved = await PriceService(session).create_prices(prices)
+            except Exception:
+                # Запись не удалась: слот может записать другой процесс
+                if coordinator is not None:
+                    await asyncio.gather(*(coordinator.release(price.ticker, timestamp) for price in prices))
+                raise
+            committed_at = time.time()
+            await record_tick_latencies(session, saved, quotes, committed_at)
+        await publish_prices(saved)
+        for price in prices:
+            TICK_DURATION.labels(ticker=price.ticker).observe(committed_at - slot)
+        logger.info(f"Сохранено цен за слот {timestamp}: {len(prices)} из {len(tickers)}")
+    return len(prices)
+
+
+async def sample_slot(
+    client: DeribitClient,
+    aggregator: MinuteAggregator,
+    session_factory,
+    slot: float,
+    tickers: Sequence[str],
+    coordinator: Optional[IngestionCoordinator] = None,
+):
+    """
+    Сделать замер цен всех тикеров и записать закрывшиеся минутные свечи.
+    
+    Args:
+        client: Клиент Deribit с общей сессией
+        aggregator: Накопитель минутных свечей
+        session_factory: Фабрика сессий БД
+        slot: Время слота; используется как время замера
+        tickers: Тикеры для замера
+        coordinator: Координация процессов; свечи, минута которых занята другим процессом, не пишутся
+    """
+    results = await asyncio.gather(
+        *(client.get_index_price(ticker) for ticker in tickers),
+        return_exceptions=True,
+    )
+    
+    closed = []
+    for ticker, result in zip(tickers, results):
+        if isinstance(result, Exception):
+            logger.error(f"Ошибка при получении цены для {ticker}: {str(result)}")
+            continue
+        closed.extend(aggregator.add(ticker, slot, result))
+    closed.extend(aggregator.close_until(slot))
+    if closed and coordinator is not None:
+        # После смены владельца тикера незакрытую свечу той же минуты
+        # могут закрыть оба процесса; записывает тот, кто занял минуту первым
+        claimed = await asyncio.gather(*(coordinator.claim(bar.ticker, bar.minute) for bar in closed))
+        closed = [bar for bar, ok in zip(closed, claimed) if ok]
+    
+    if closed:
+        async with session_factory() as session:
+            try:
+                with DB_WRITE_DURATION.labels(operation="create_prices").time():
+                    saved = await PriceService(session).create_prices([bar.to_price_create() for bar in closed])
+            except Exception:
+                if coordinator is not None:
+                    await asyncio.gather(*(coordinator.release(bar.ticker, bar.minute) for bar in closed))
+                raise
+        await publish_prices(saved)
+        logger.info(
+            "Сохранены минутные свечи: "
+            + ", ".join(f"{bar.ticker}@{bar.minute} ({bar.samples} замеров)" for bar in closed)
+        )
+
+
+async def run_scheduler(
+    stop: asyncio.Event,
+    interval: int = None,
+    tickers: Sequence[str] = None,
+    mode: str = None,
+):
+    """
+    Запустить получение цен по расписанию до установки события stop.
+    
+    Args:
+        stop: Событие остановки
+        interval: Интервал в секундах (по умолчанию из настроек для режима)
+        tickers: Тикеры (по умолчанию из настроек)
+        mode: "tick" или "sampled" (по умолчанию из настроек)
+    """
+    mode = mode or settings.ingestion_mode
+    if mode == "sampled":
+        interval = interval or settings.sampling_interval_seconds
+    else:
+        interval = interval or settings.scheduler_interval_seconds
+    tickers = list(tickers or settings.tracked_tickers)
+    aggregator = MinuteAggregator()
+    
+    coordinator = None
+    if settings.ingestion_coordination != NONE:
+        # Таймаут дольше, чем у API: задержка Redis здесь не задерживает запросы клиентов
+        coordinator = IngestionCoordinator(create_redis(socket_timeout=settings.ingestion_lease_seconds / 6))
+        await coordinator.refresh()
+        refresher = asyncio.create_task(coordinator.run(stop))
+    
+    async with DeribitClient() as client:
+        async def callback(slot: float):
+            assigned = tickers if coordinator is None else coordinator.assigned(tickers)
+            if mode == "sampled":
+                await sample_slot(client, aggregator, AsyncSessionLocal, slot, assigned, coordinator)
+            elif assigned:
+                await ingest_slot(client, AsyncSessionLocal, slot, assigned, coordinator)
+        
+        scheduler = AlignedScheduler(interval, callback)
+        logger.info(
+            f"Планировщик запущен: режим {mode}, интервал {interval} с, тикеры {tickers}, "
+            f"координация {settings.ingestion_coordination}"
+        )
+        try:
+            await scheduler.run(stop)
+        finally:
+            if coordinator is not None:
+                refresher.cancel()
+                await asyncio.gather(refresher, return_exceptions=True)
+                await coordinator.close()
+                await coordinator.redis.aclose()
+        if aggregator.pending():
+            # Незакрытая минута не записывается: после перезапуска в ту же минуту
+            # появилась бы вторая строка. Пропуск заполнит задача repair_gaps.
+            logger.info(f"Отброшено незакрытых минутных свечей: {len(aggregator.pending())}")
+        logger.info(
+            f"Планировщик остановлен: слотов {scheduler.stats.ticks}, overrun {scheduler.stats.overruns}, "
+            f"пропущено {scheduler.stats.missed_slots}, макс. задержка {scheduler.stats.max_lag * 1000:.1f} мс"
+        )
+
+
+def main():
+    """Точка входа процесса планировщика."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    if settings.ingestion_scheduler != "asyncio":
+        logger.warning(
+            "INGESTION_SCHEDULER не равен 'asyncio': Celery beat тоже запускает fetch_prices, записи будут дублироваться"
+        )
+    
+    if settings.scheduler_metrics_port:
+        start_metrics_server(settings.scheduler_metrics_port)
+    
+    async def runner():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await run_scheduler(stop)
+    
+    asyncio.run(runner())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 """Pydantic схемы для валидации данных."""
 from pydantic import BaseModel, Field, field_validator
 from decimal import Decimal
+from typing import Optional
+from app.config import settings
 
 
 class PriceCreate(BaseModel):
@@ -8,17 +10,23 @@ class PriceCreate(BaseModel):
     ticker: str = Field(..., description="Тикер валюты (BTC или ETH). Допускаются также BTC_USD/ETH_USD - будут нормализованы")
     price: Decimal = Field(..., description="Цена валюты")
     timestamp: int = Field(..., description="UNIX timestamp")
+    open: Optional[Decimal] = Field(None, description="Цена открытия минуты (режим семплирования)")
+    high: Optional[Decimal] = Field(None, description="Максимум за минуту (режим семплирования)")
+    low: Optional[Decimal] = Field(None, description="Минимум за минуту (режим семплирования)")
+    samples: Optional[int] = Field(None, description="Число замеров за минуту (режим семплирования)")
     
     @field_validator('ticker')
     @classmethod
     def validate_ticker(cls, v: str) -> str:
-        """Валидация и нормализация тикера: возвращает 'BTC' или 'ETH'."""
+        """Валидация и нормализация тикера: 'BTC', 'ETH' или тикер из TRACKED_TICKERS."""
         allowed = {
             'BTC': 'BTC',
             'ETH': 'ETH',
             'BTC_USD': 'BTC',
             'ETH_USD': 'ETH'
         }
+        for tracked in settings.tracked_tickers:
+            allowed.setdefault(tracked, tracked)
         if v not in allowed:
             raise ValueError(f"Ticker must be one of {list(allowed.keys())}")
         return allowed[v]
@@ -30,6 +38,11 @@ class PriceResponse(BaseModel):
     ticker: str
     price: Decimal
     timestamp: int
+    open: Optional[Decimal] = None
+    high: Optional[Decimal] = None
+    low: Optional[Decimal] = None
+    samples: Optional[int] = None
+    source: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -41,8 +54,139 @@ class PriceListResponse(BaseModel):
     total: int
 
 
+class PriceSyncResponse(BaseModel):
+    """Схема пачки записей после водяного знака."""
+    prices: list[PriceResponse]
+    next_since_id: int = Field(..., description="Водяной знак для следующего запроса")
+    has_more: bool = Field(..., description="После пачки есть еще записи")
+
+
 class LastPriceResponse(BaseModel):
     """Схема для последней цены."""
     ticker: str
     price: Decimal
     timestamp: int
+
+
+class PairStatsResponse(BaseModel):
+    """Схема статистики пары тикеров на общей сетке."""
+    base: str = Field(..., description="Базовый тикер (числитель отношения)")
+    quote: str = Field(..., description="Котируемый тикер (знаменатель отношения)")
+    ratio: list[Optional[float]] = Field(..., description="Отношение base / quote")
+    spread: list[Optional[float]] = Field(..., description="Разница base - quote")
+    rolling_correlation: list[Optional[float]] = Field(
+        ..., description="Скользящая корреляция минутных лог-доходностей"
+    )
+
+
+class AlignedSeriesResponse(BaseModel):
+    """Схема рядов нескольких тикеров, выровненных по минутной сетке."""
+    tickers: list[str]
+    timestamps: list[int] = Field(..., description="Начала минутных интервалов сетки (UNIX timestamp)")
+    values: list[list[Optional[float]]] = Field(
+        ..., description="Матрица цен: строка на тикер в порядке tickers, столбец на точку сетки"
+    )
+    window: int = Field(..., description="Размер окна скользящей корреляции (минут)")
+    pairs: list[PairStatsResponse]
+
+
+class PriceGapResponse(BaseModel):
+    """Схема пропуска в минутном ряду цен."""
+    ticker: str
+    gap_start: int = Field(..., description="Timestamp последнего тика перед пропуском")
+    gap_end: int = Field(..., description="Timestamp первого тика после пропуска")
+    missing_minutes: int
+    detected_at: int
+    repaired_at: Optional[int] = None
+    filled_minutes: int
+    repair_attempts: int
+    
+    class Config:
+        from_attributes = True
+
+
+class PriceGapListResponse(BaseModel):
+    """Схема списка пропусков."""
+    gaps: list[PriceGapResponse]
+    total: int
+    missing_minutes: int = Field(..., description="Суммарное число пропущенных минут")
+    scanned_until: Optional[int] = Field(None, description="Timestamp, до которого ряд проверен")
+
+
+class LatencyStageResponse(BaseModel):
+    """Схема распределения длительности этапа пути тика."""
+    stage: str = Field(..., description="request, exchange, response, round_trip, write или staleness")
+    count: int
+    p50_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+    max_ms: Optional[float] = None
+
+
+class TickLatencyResponse(BaseModel):
+    """Схема распределения задержки тиков тикера за период."""
+    ticker: str
+    start_timestamp: int
+    end_timestamp: int
+    ticks: int = Field(..., description="Число тиков с трассировкой")
+    stages: list[LatencyStageResponse]
+
+
+class DailyStatsResponse(BaseModel):
+    """Схема статистики цен тикера за сутки UTC."""
+    day: int = Field(..., description="Начало суток UTC, UNIX timestamp")
+    final: bool = Field(..., description="Сутки закрыты и сохранены в daily_price_stats")
+    ticks: int
+    min: Optional[Decimal] = None
+    max: Optional[Decimal] = None
+    mean: Optional[float] = None
+    stddev: Optional[float] = Field(None, description="Стандартное отклонение генеральной совокупности")
+    first: Optional[Decimal] = None
+    first_timestamp: Optional[int] = None
+    last: Optional[Decimal] = None
+    last_timestamp: Optional[int] = None
+
+
+class DailyStatsSummaryResponse(BaseModel):
+    """Схема сводной статистики цен тикера за диапазон суток."""
+    ticker: str
+    start_day: int = Field(..., description="Начало первых суток UTC")
+    end_day: int = Field(..., description="Начало последних суток UTC")
+    days: int = Field(..., description="Число суток в сводке")
+    days_missing: int = Field(..., description="Закрытые сутки без сохраненной статистики")
+    ticks: int
+    min: Optional[Decimal] = None
+    max: Optional[Decimal] = None
+    mean: Optional[float] = None
+    stddev: Optional[float] = Field(None, description="Стандартное отклонение генеральной совокупности")
+    first: Optional[Decimal] = None
+    first_timestamp: Optional[int] = None
+    last: Optional[Decimal] = None
+    last_timestamp: Optional[int] = None
+    daily: Optional[list[DailyStatsResponse]] = Field(None, description="Статистика по суткам (include_days=true)")
+
+
+class ExportJobCreate(BaseModel):
+    """Схема создания задания выгрузки."""
+    tickers: list[str] = Field(..., min_length=1, description="Тикеры (BTC, ETH, BTC_USD, ETH_USD)")
+    start_date: Optional[str] = Field(None, description="Начальная дата (DD-MM-YYYY)")
+    end_date: Optional[str] = Field(None, description="Конечная дата (DD-MM-YYYY) включительно")
+    format: str = Field("csv", description="Формат файла: csv (gzip) или parquet")
+
+
+class ExportJobResponse(BaseModel):
+    """Схема состояния задания выгрузки."""
+    id: str
+    tickers: list[str]
+    start_timestamp: Optional[int] = None
+    end_timestamp: Optional[int] = None
+    format: str
+    status: str = Field(..., description="pending, running, done или failed")
+    rows_total: Optional[int] = Field(None, description="Число строк в диапазоне (после начала выгрузки)")
+    rows_written: int
+    progress: Optional[float] = Field(None, description="Доля выгруженных строк от 0 до 1")
+    file_size: Optional[int] = None
+    error: Optional[str] = None
+    created_at: int
+    finished_at: Optional[int] = None
+    download_url: Optional[str] = Field(None, description="Ссылка на файл после завершения")
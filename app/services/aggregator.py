@@ -0,0 +1,108 @@
+"""Агрегация частых замеров цены в минутные OHLC строки."""
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, List
+from app.schemas import PriceCreate
+
+
+@dataclass
+class MinuteBar:
+    """Минутная свеча по замерам одного тикера."""
+    ticker: str
+    minute: int
+    open: Decimal
+    high: Decimal
+    low: Decimal
+    close: Decimal
+    samples: int = 1
+    
+    def add(self, price: Decimal):
+        """Учесть очередной замер в свече."""
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        self.close = price
+        self.samples += 1
+    
+    def to_price_create(self) -> PriceCreate:
+        """Преобразовать свечу в данные для записи: price - цена закрытия."""
+        return PriceCreate(
+            ticker=self.ticker,
+            price=self.close,
+            timestamp=self.minute,
+            open=self.open,
+            high=self.high,
+            low=self.low,
+            samples=self.samples,
+        )
+
+
+class MinuteAggregator:
+    """Накопитель минутных свечей в памяти по каждому тикеру."""
+    
+    def __init__(self, period: int = 60):
+        """
+        Инициализация накопителя.
+        
+        Args:
+            period: Длина свечи в секундах
+        """
+        self.period = period
+        self._bars: Dict[str, MinuteBar] = {}
+        # Последняя закрытая минута тикера: опоздавшие замеры в нее не попадают
+        self._closed: Dict[str, int] = {}
+    
+    def add(self, ticker: str, timestamp: float, price: Decimal) -> List[MinuteBar]:
+        """
+        Учесть замер цены.
+        
+        Args:
+            ticker: Тикер валюты
+            timestamp: Время замера, UNIX timestamp
+            price: Цена
+        
+        Returns:
+            Свечи, закрытые этим замером (предыдущая минута тикера), если есть
+        """
+        minute = int(timestamp // self.period) * self.period
+        if minute <= self._closed.get(ticker, minute - 1):
+            # Опоздавший замер уже закрытой минуты
+            return []
+        
+        bar = self._bars.get(ticker)
+        if bar is not None and bar.minute == minute:
+            bar.add(price)
+            return []
+        
+        self._bars[ticker] = MinuteBar(
+            ticker=ticker, minute=minute, open=price, high=price, low=price, close=price
+        )
+        if bar is None:
+            return []
+        self._closed[ticker] = bar.minute
+        return [bar]
+    
+    def close_until(self, timestamp: float) -> List[MinuteBar]:
+        """
+        Закрыть свечи всех тикеров, минута которых закончилась до момента timestamp.
+        
+        Нужно, чтобы свеча записывалась вовремя, даже если следующий замер тикера
+        не удался.
+        
+        Args:
+            timestamp: Текущее время, UNIX timestamp
+        
+        Returns:
+            Закрытые свечи
+        """
+        current_minute = int(timestamp // self.period) * self.period
+        closed = [bar for bar in self._bars.values() if bar.minute < current_minute]
+        for bar in closed:
+            del self._bars[bar.ticker]
+            self._closed[bar.ticker] = bar.minute
+        return closed
+    
+    def pending(self) -> List[MinuteBar]:
+        """Незакрытые свечи текущей минуты."""
+        return list(self._bars.values())
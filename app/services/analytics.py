@@ -0,0 +1,147 @@
+"""Векторные вычисления над рядами цен (NumPy)."""
+from typing import List, Optional, Sequence
+import numpy as np
+
+
+MINUTE = 60
+
+
+def build_grid(start_timestamp: int, end_timestamp: int, step: int = MINUTE) -> np.ndarray:
+    """
+    Построить равномерную временную сетку, выровненную по границам шага.
+    
+    Args:
+        start_timestamp: Начало диапазона, UNIX timestamp
+        end_timestamp: Конец диапазона включительно, UNIX timestamp
+        step: Шаг сетки в секундах
+    
+    Returns:
+        Массив int64 с началами интервалов сетки
+    """
+    first = (start_timestamp // step) * step
+    last = (end_timestamp // step) * step
+    if last < first:
+        return np.empty(0, dtype=np.int64)
+    return np.arange(first, last + step, step, dtype=np.int64)
+
+
+def align_to_grid(
+    timestamps: Sequence[int],
+    values: Sequence[float],
+    grid: np.ndarray,
+    max_gap: int = 5,
+    step: int = MINUTE
+) -> np.ndarray:
+    """
+    Выровнять ряд по сетке с forward-fill для небольших пропусков.
+    
+    Значение в узле сетки - последнее наблюдение до конца соответствующего
+    интервала. Если последнее наблюдение старше max_gap интервалов,
+    узел остается пустым (NaN).
+    
+    Args:
+        timestamps: Отсортированные по возрастанию UNIX timestamps наблюдений
+        values: Значения наблюдений
+        grid: Сетка из build_grid
+        max_gap: Максимальное число интервалов, заполняемых предыдущим значением
+        step: Шаг сетки в секундах
+    
+    Returns:
+        Массив float64 длины len(grid)
+    """
+    ts = np.asarray(timestamps, dtype=np.int64)
+    vals = np.asarray(values, dtype=np.float64)
+    aligned = np.full(grid.shape, np.nan)
+    if ts.size == 0 or grid.size == 0:
+        return aligned
+    
+    # Индекс последнего наблюдения, попадающего в интервал [g, g + step) или раньше
+    idx = np.searchsorted(ts, grid + step, side="left") - 1
+    has_prev = idx >= 0
+    src = idx[has_prev]
+    # Возраст наблюдения в интервалах сетки
+    age = (grid[has_prev] - (ts[src] // step) * step) // step
+    fresh = age <= max_gap
+    
+    target = np.flatnonzero(has_prev)[fresh]
+    aligned[target] = vals[src[fresh]]
+    return aligned
+
+
+def log_returns(series: np.ndarray) -> np.ndarray:
+    """
+    Посчитать логарифмические доходности ряда.
+    
+    Args:
+        series: Ряд цен (может содержать NaN)
+    
+    Returns:
+        Массив той же длины; первый элемент и элементы рядом с NaN - NaN
+    """
+    returns = np.full(series.shape, np.nan)
+    if series.size > 1:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns[1:] = np.diff(np.log(series))
+    return returns
+
+
+def rolling_correlation(x: np.ndarray, y: np.ndarray, window: int) -> np.ndarray:
+    """
+    Скользящая корреляция Пирсона через кумулятивные суммы, без цикла по окнам.
+    
+    Окно, содержащее хотя бы один NaN в любом из рядов, дает NaN.
+    
+    Args:
+        x: Первый ряд
+        y: Второй ряд той же длины
+        window: Размер окна (число точек)
+    
+    Returns:
+        Массив длины len(x); первые window - 1 элементов - NaN
+    """
+    n = x.shape[0]
+    result = np.full(n, np.nan)
+    if window < 2 or n < window:
+        return result
+    
+    valid = ~(np.isnan(x) | np.isnan(y))
+    # Центрируем ряды, чтобы кумулятивные суммы квадратов не теряли точность
+    xc = np.where(valid, x - np.nanmean(np.where(valid, x, np.nan)), 0.0)
+    yc = np.where(valid, y - np.nanmean(np.where(valid, y, np.nan)), 0.0)
+    
+    def window_sums(a: np.ndarray) -> np.ndarray:
+        c = np.concatenate(([0.0], np.cumsum(a)))
+        return c[window:] - c[:-window]
+    
+    count = window_sums(valid.astype(np.float64))
+    sx = window_sums(xc)
+    sy = window_sums(yc)
+    sxx = window_sums(xc * xc)
+    syy = window_sums(yc * yc)
+    sxy = window_sums(xc * yc)
+    
+    cov = window * sxy - sx * sy
+    var_x = window * sxx - sx * sx
+    var_y = window * syy - sy * sy
+    denom = np.sqrt(np.clip(var_x, 0.0, None) * np.clip(var_y, 0.0, None))
+    
+    full = (count == window) & (denom > 0)
+    corr = np.full(count.shape, np.nan)
+    corr[full] = np.clip(cov[full] / denom[full], -1.0, 1.0)
+    result[window - 1:] = corr
+    return result
+
+
+def to_optional_list(values: np.ndarray) -> List[Optional[float]]:
+    """
+    Преобразовать массив в список для JSON, заменив NaN на None.
+    
+    Args:
+        values: Массив float64
+    
+    Returns:
+        Список float/None
+    """
+    out = values.astype(object)
+    out[np.isnan(values)] = None
+    return out.tolist()
@@ -0,0 +1,222 @@
+"""Историческая догрузка цен с биржи Deribit."""
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, List, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.metrics import DB_WRITE_DURATION
+from app.models import BackfillCheckpoint
+from app.services.deribit_client import DeribitClient, DeribitRateLimitError
+from app.services.daily_stats import refresh_days
+from app.services.price_service import PriceService
+from app.services.recent_store import publish_reload
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BackfillResult:
+    """Итог догрузки по одному тикеру."""
+    ticker: str
+    windows_total: int = 0
+    windows_skipped: int = 0
+    windows_done: int = 0
+    rows_written: int = 0
+    rate_limited: int = 0
+    failed_windows: List[Tuple[int, int]] = field(default_factory=list)
+
+
+def split_windows(start_timestamp: int, end_timestamp: int, window_seconds: int) -> List[Tuple[int, int]]:
+    """
+    Разбить диапазон на окна фиксированной длины.
+    
+    Границы окон выровнены по window_seconds, чтобы повторный запуск с теми же
+    настройками попадал в те же чекпоинты.
+    
+    Args:
+        start_timestamp: Начало диапазона, UNIX timestamp
+        end_timestamp: Конец диапазона (не включительно), UNIX timestamp
+        window_seconds: Длина окна в секундах
+    
+    Returns:
+        Список полуинтервалов [window_start, window_end)
+    """
+    windows = []
+    current = (start_timestamp // window_seconds) * window_seconds
+    while current < end_timestamp:
+        windows.append((current, current + window_seconds))
+        current += window_seconds
+    return windows
+
+
+class Backfiller:
+    """Загрузчик истории окнами с ограниченной параллельностью и чекпоинтами."""
+    
+    def __init__(
+        self,
+        client: DeribitClient,
+        session_factory: Callable[[], AsyncSession],
+        window_seconds: int = None,
+        concurrency: int = None,
+        max_retries: int = None,
+        rate_limit_backoff: float = None,
+        instrument_template: str = None,
+        resolution: str = None,
+    ):
+        """
+        Инициализация загрузчика.
+        
+        Args:
+            client: Клиент Deribit
+            session_factory: Фабрика сессий БД (async_sessionmaker)
+            window_seconds: Длина окна запроса в секундах
+            concurrency: Максимальное число одновременных запросов к Deribit
+            max_retries: Число повторов окна при превышении лимита запросов
+            rate_limit_backoff: Базовая пауза после ответа о превышении лимита, секунды
+            instrument_template: Шаблон имени инструмента, например {currency}-PERPETUAL
+            resolution: Разрешение свечей Deribit
+        """
+        self.client = client
+        self.session_factory = session_factory
+        self.window_seconds = window_seconds or settings.backfill_window_seconds
+        self.concurrency = concurrency or settings.backfill_concurrency
+        self.max_retries = max_retries if max_retries is not None else settings.backfill_max_retries
+        self.rate_limit_backoff = (
+            rate_limit_backoff if rate_limit_backoff is not None else settings.backfill_rate_limit_backoff
+        )
+        self.instrument_template = instrument_template or settings.backfill_instrument_template
+        self.resolution = resolution or settings.backfill_resolution
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        # Общая для всех окон пауза после ответа о превышении лимита
+        self._resume_at = 0.0
+    
+    async def _completed_windows(self, ticker: str) -> Set[Tuple[int, int]]:
+        """Получить окна тикера, уже загруженные предыдущими запусками."""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(BackfillCheckpoint.window_start, BackfillCheckpoint.window_end)
+                .where(BackfillCheckpoint.ticker == ticker)
+            )
+            return {(row[0], row[1]) for row in result.all()}
+    
+    async def _wait_for_rate_limit(self):
+        """Дождаться окончания общей паузы после превышения лимита."""
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    
+    async def _fetch_window(self, ticker: str, window: Tuple[int, int], result: BackfillResult):
+        """Загрузить одно окно с повторами при превышении лимита запросов."""
+        window_start, window_end = window
+        instrument = self.instrument_template.format(currency=ticker)
+        attempt = 0
+        while True:
+            await self._wait_for_rate_limit()
+            try:
+                candles = await self.client.get_chart_data(
+                    instrument, window_start, window_end - 1, self.resolution
+                )
+                return [(ts, price) for ts, price in candles if window_start <= ts < window_end]
+            except DeribitRateLimitError:
+                result.rate_limited += 1
+                if attempt >= self.max_retries:
+                    raise
+                pause = self.rate_limit_backoff * (2 ** attempt)
+                self._resume_at = max(self._resume_at, time.monotonic() + pause)
+                logger.warning(f"Превышен лимит запросов Deribit при догрузке {ticker}, пауза {pause:.1f} с")
+                attempt += 1
+    
+    async def _process_window(self, ticker: str, window: Tuple[int, int], result: BackfillResult):
+        """Загрузить окно и записать его вместе с чекпоинтом в одной транзакции."""
+        async with self._semaphore:
+            try:
+                points = await self._fetch_window(ticker, window, result)
+                now = int(time.time())
+                async with self.session_factory() as session:
+                    with DB_WRITE_DURATION.labels(operation="bulk_insert").time():
+                        written = await PriceService(session).bulk_insert_prices(ticker, points, commit=False)
+                    # Окно, захватывающее текущий момент, еще не закрыто - не сохраняем чекпоинт
+                    if window[1] <= now:
+                        session.add(BackfillCheckpoint(
+                            ticker=ticker,
+                            window_start=window[0],
+                            window_end=window[1],
+                            rows_written=written,
+                            completed_at=now,
+                        ))
+                    with DB_WRITE_DURATION.labels(operation="bulk_insert_commit").time():
+                        await session.commit()
+                if written:
+                    await publish_reload(ticker, window[0], window[1])
+                result.windows_done += 1
+                result.rows_written += written
+            except Exception as e:
+                result.failed_windows.append(window)
+                logger.error(f"Ошибка догрузки {ticker} за окно {window}: {str(e)}", exc_info=True)
+    
+    async def run(self, ticker: str, start_timestamp: int, end_timestamp: int, resume: bool = True) -> BackfillResult:
+        """
+        Догрузить историю тикера за диапазон.
+        
+        Args:
+            ticker: Тикер валюты (BTC или ETH)
+            start_timestamp: Начало диапазона, UNIX timestamp
+            end_timestamp: Конец диапазона (не включительно), UNIX timestamp
+            resume: Пропускать окна, сохраненные в чекпоинтах
+        
+        Returns:
+            Итог догрузки
+        """
+        result = BackfillResult(ticker=ticker)
+        windows = split_windows(start_timestamp, end_timestamp, self.window_seconds)
+        result.windows_total = len(windows)
+        
+        if resume:
+            completed = await self._completed_windows(ticker)
+            pending = [w for w in windows if w not in completed]
+            result.windows_skipped = len(windows) - len(pending)
+        else:
+            pending = windows
+        
+        logger.info(
+            f"Догрузка {ticker}: окон {len(windows)}, уже загружено {result.windows_skipped}, "
+            f"параллельность {self.concurrency}"
+        )
+        await asyncio.gather(*(self._process_window(ticker, w, result) for w in pending))
+        if result.rows_written:
+            # Закрытые сутки с новыми строками пересчитываются после всех окон
+            await refresh_days(self.session_factory, ticker, start_timestamp, end_timestamp)
+        logger.info(
+            f"Догрузка {ticker} завершена: записано {result.rows_written} строк, "
+            f"окон с ошибкой {len(result.failed_windows)}"
+        )
+        return result
+    
+    async def run_range(self, ticker: str, start_timestamp: int, end_timestamp: int) -> BackfillResult:
+        """
+        Догрузить произвольный диапазон без выравнивания по окнам и без чекпоинтов.
+        
+        Используется для заполнения коротких пропусков, для которых окно целиком не нужно.
+        
+        Args:
+            ticker: Тикер валюты
+            start_timestamp: Начало диапазона, UNIX timestamp
+            end_timestamp: Конец диапазона (не включительно), UNIX timestamp
+            
+        Returns:
+            Итог догрузки
+        """
+        result = BackfillResult(ticker=ticker, windows_total=1)
+        async with self._semaphore:
+            points = await self._fetch_window(ticker, (start_timestamp, end_timestamp), result)
+        async with self.session_factory() as session:
+            with DB_WRITE_DURATION.labels(operation="bulk_insert").time():
+                result.rows_written = await PriceService(session).bulk_insert_prices(ticker, points)
+        if result.rows_written:
+            await publish_reload(ticker, start_timestamp, end_timestamp)
+            await refresh_days(self.session_factory, ticker, start_timestamp, end_timestamp)
+        result.windows_done = 1
+        return result
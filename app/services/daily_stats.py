@@ -0,0 +1,379 @@
+"""Дневная статистика цен.
+
+Для закрытых суток UTC число тиков, минимум, максимум, среднее, стандартное
+отклонение, первая и последняя цена тикера хранятся в таблице
+daily_price_stats. Строки пишет задача finalize_daily_stats вскоре после
+закрытия суток; догрузка пересчитывает закрытые сутки, в которые записала
+строки.
+
+Текущие сутки считает накопитель CurrentDayStats в процессе API: окно
+последних цен передает ему каждую цену из уведомлений о записи. Сводка
+за диапазон объединяет статистики суток, не читая сырые цены, поэтому ее
+стоимость пропорциональна числу дней, а не тиков.
+
+Строки догрузки (source = BACKFILL_SOURCE) учитываются наравне с тиками
+индекса и в строках суток, и в накопителе: для истории, загруженной до
+начала работы сервиса, и для заполненных пропусков других цен за эти минуты
+нет, а без них статистика таких суток была бы пустой или неполной. Догрузка
+в текущие сутки приходит в накопитель перезагрузкой окна из БД.
+"""
+import math
+import time
+import logging
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models import DailyPriceStats, Price
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+
+def day_start(timestamp: int) -> int:
+    """Начало суток UTC, в которые попадает timestamp."""
+    return int(timestamp) - int(timestamp) % DAY
+
+
+@dataclass
+class RunningStats:
+    """
+    Статистика ряда цен, накапливаемая за один проход.
+    
+    Среднее и сумма квадратов отклонений m2 обновляются по алгоритму
+    Уэлфорда; статистики частей ряда объединяются merge (формула Чана),
+    поэтому сводка за годы строится из строк суток без потери точности.
+    """
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min: Optional[Decimal] = None
+    max: Optional[Decimal] = None
+    first: Optional[Decimal] = None
+    first_timestamp: Optional[int] = None
+    last: Optional[Decimal] = None
+    last_timestamp: Optional[int] = None
+    
+    @property
+    def stddev(self) -> Optional[float]:
+        """Стандартное отклонение генеральной совокупности (None без тиков)."""
+        if not self.count:
+            return None
+        return math.sqrt(max(self.m2, 0.0) / self.count)
+    
+    def _bounds(
+        self, low: Decimal, high: Decimal, first_timestamp: int, first: Decimal, last_timestamp: int, last: Decimal
+    ):
+        """Учесть минимум, максимум, первую и последнюю цену части ряда."""
+        if self.min is None or low < self.min:
+            self.min = low
+        if self.max is None or high > self.max:
+            self.max = high
+        if self.first_timestamp is None or first_timestamp < self.first_timestamp:
+            self.first, self.first_timestamp = first, first_timestamp
+        if self.last_timestamp is None or last_timestamp >= self.last_timestamp:
+            self.last, self.last_timestamp = last, last_timestamp
+    
+    def add(self, timestamp: int, price):
+        """
+        Учесть цену.
+        
+        Args:
+            timestamp: UNIX timestamp цены
+            price: Цена (Decimal из БД или строка из уведомления)
+        """
+        value = Decimal(price)
+        x = float(value)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self._bounds(value, value, int(timestamp), value, int(timestamp), value)
+    
+    def merge(self, other: "RunningStats"):
+        """Добавить статистику другой части ряда."""
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self._bounds(other.min, other.max, other.first_timestamp, other.first, other.last_timestamp, other.last)
+    
+    @classmethod
+    def from_row(cls, row: DailyPriceStats) -> "RunningStats":
+        """Статистика из строки daily_price_stats."""
+        if not row.ticks:
+            return cls()
+        return cls(
+            count=row.ticks,
+            mean=row.mean_price,
+            m2=row.stddev * row.stddev * row.ticks,
+            min=row.min_price,
+            max=row.max_price,
+            first=row.first_price,
+            first_timestamp=row.first_timestamp,
+            last=row.last_price,
+            last_timestamp=row.last_timestamp,
+        )
+    
+    def as_dict(self) -> dict:
+        """Поля статистики для ответа API."""
+        return {
+            "ticks": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean if self.count else None,
+            "stddev": self.stddev,
+            "first": self.first,
+            "first_timestamp": self.first_timestamp,
+            "last": self.last,
+            "last_timestamp": self.last_timestamp,
+        }
+
+
+class CurrentDayStats:
+    """
+    Накопители статистики текущих суток UTC по тикерам.
+    
+    Заполняются из БД вместе с окном последних цен и обновляются каждой
+    ценой из уведомлений. Накопитель помнит id учтенных цен текущих суток
+    (не больше числа тиков тикера за сутки) и пропускает их повторы: так
+    уведомления о записях, уже прочитанных из БД при загрузке, не
+    учитываются дважды, а уведомления, пришедшие не по порядку id, не
+    теряются. Первая цена новых суток начинает новый накопитель; прошедшие
+    сутки сохраняет задача finalize_daily_stats.
+    """
+    
+    def __init__(self, clock=time.time):
+        """
+        Инициализация.
+        
+        Args:
+            clock: Источник времени
+        """
+        self.clock = clock
+        self._days: Dict[str, int] = {}
+        self._stats: Dict[str, RunningStats] = {}
+        self._ids: Dict[str, Set[int]] = {}
+    
+    def load(self, ticker: str, rows: Iterable[Sequence], since: int):
+        """
+        Заменить накопитель тикера ценами текущих суток из БД.
+        
+        Args:
+            ticker: Тикер
+            rows: Записи (timestamp, id, price, ...) с timestamp >= since в порядке времени
+            since: Начало загруженного диапазона; если оно позже начала суток,
+                накопитель не заполняется и сводка считает сутки по БД
+        """
+        day = day_start(self.clock())
+        if since > day:
+            self._days.pop(ticker, None)
+            return
+        stats = RunningStats()
+        ids = set()
+        for timestamp, id, price, *_ in rows:
+            if day <= timestamp < day + DAY:
+                stats.add(timestamp, price)
+                ids.add(id)
+        self._days[ticker] = day
+        self._stats[ticker] = stats
+        self._ids[ticker] = ids
+    
+    def add(self, prices: Iterable[dict]):
+        """
+        Учесть записанные цены из уведомления.
+        
+        Args:
+            prices: Словари с полями id, ticker, price, timestamp
+        """
+        for price in prices:
+            ticker = price["ticker"]
+            day = self._days.get(ticker)
+            if day is None:
+                continue
+            price_day = day_start(price["timestamp"])
+            if price_day > day:
+                self._days[ticker] = day = price_day
+                self._stats[ticker] = RunningStats()
+                self._ids[ticker] = set()
+            if price_day == day and price["id"] not in self._ids[ticker]:
+                self._ids[ticker].add(price["id"])
+                self._stats[ticker].add(price["timestamp"], price["price"])
+    
+    def get(self, ticker: str, day: int) -> Optional[RunningStats]:
+        """
+        Статистика тикера за сутки day.
+        
+        Returns:
+            Копия накопителя; пустая статистика, если тиков в сутках еще не
+            было; None, если накопитель не загружен или ведет другие сутки
+        """
+        current = self._days.get(ticker)
+        if current is None or current > day:
+            return None
+        if current < day:
+            return RunningStats()
+        return RunningStats(**vars(self._stats[ticker]))
+
+
+async def compute_day(session: AsyncSession, ticker: str, day: int) -> RunningStats:
+    """
+    Посчитать статистику суток по сырым ценам, включая строки догрузки.
+    
+    Args:
+        session: Сессия БД
+        ticker: Тикер
+        day: Начало суток UTC
+    
+    Returns:
+        Статистика суток
+    """
+    result = await session.execute(
+        select(Price.timestamp, Price.price)
+        .where(Price.ticker == ticker, Price.timestamp >= day, Price.timestamp < day + DAY)
+        .order_by(Price.timestamp.asc(), Price.id.asc())
+    )
+    stats = RunningStats()
+    for timestamp, price in result.all():
+        stats.add(timestamp, price)
+    return stats
+
+
+async def save_day(session: AsyncSession, ticker: str, day: int, stats: RunningStats):
+    """
+    Сохранить статистику суток (INSERT ... ON CONFLICT DO UPDATE).
+    
+    Args:
+        session: Сессия БД (транзакцию фиксирует вызывающий)
+        ticker: Тикер
+        day: Начало суток UTC
+        stats: Статистика суток
+    """
+    values = {
+        "ticker": ticker,
+        "day": day,
+        "ticks": stats.count,
+        "min_price": stats.min,
+        "max_price": stats.max,
+        "first_price": stats.first,
+        "last_price": stats.last,
+        "first_timestamp": stats.first_timestamp,
+        "last_timestamp": stats.last_timestamp,
+        "mean_price": stats.mean if stats.count else None,
+        "stddev": stats.stddev,
+        "updated_at": int(time.time()),
+    }
+    conn = await session.connection()
+    dialect = postgresql if conn.dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(DailyPriceStats).values(**values)
+    await session.execute(statement.on_conflict_do_update(
+        index_elements=["ticker", "day"],
+        set_={key: statement.excluded[key] for key in values if key not in ("ticker", "day")},
+    ))
+
+
+async def refresh_days(session_factory, ticker: str, start_timestamp: int, end_timestamp: int) -> int:
+    """
+    Пересчитать по сырым ценам закрытые сутки, пересекающие диапазон.
+    
+    Текущие сутки пропускаются: их считает накопитель API.
+    
+    Args:
+        session_factory: Фабрика сессий primary
+        ticker: Тикер
+        start_timestamp: Начало диапазона, UNIX timestamp
+        end_timestamp: Конец диапазона (не включительно), UNIX timestamp
+    
+    Returns:
+        Число сохраненных суток
+    """
+    last_day = min(day_start(end_timestamp - 1), day_start(time.time()) - DAY)
+    days = 0
+    async with session_factory() as session:
+        for day in range(day_start(start_timestamp), last_day + 1, DAY):
+            await save_day(session, ticker, day, await compute_day(session, ticker, day))
+            await session.commit()
+            days += 1
+    if days:
+        logger.info(f"Дневная статистика {ticker}: пересчитано суток {days}")
+    return days
+
+
+@dataclass
+class DayStats:
+    """Статистика суток в сводке."""
+    day: int
+    stats: RunningStats
+    # Строка из daily_price_stats; False - сутки посчитаны на лету
+    final: bool
+
+
+@dataclass
+class DailySummary:
+    """Сводка статистики тикера за диапазон суток."""
+    total: RunningStats
+    days: List[DayStats] = field(default_factory=list)
+    # Закрытые сутки без строки в daily_price_stats вне последних DAILY_STATS_LOOKBACK_DAYS
+    days_missing: int = 0
+
+
+async def summarize(
+    session: AsyncSession,
+    ticker: str,
+    start_day: int,
+    end_day: int,
+    today: int,
+    current: Optional[RunningStats] = None,
+) -> DailySummary:
+    """
+    Собрать сводку тикера за сутки [start_day, end_day].
+    
+    Закрытые сутки читаются из daily_price_stats. Последние
+    DAILY_STATS_LOOKBACK_DAYS закрытых суток без строки (задача еще не
+    отработала) и текущие сутки без накопителя считаются по сырым ценам;
+    более старые сутки без строки пропускаются и учитываются в days_missing.
+    
+    Args:
+        session: Сессия БД
+        ticker: Тикер
+        start_day: Начало первых суток UTC
+        end_day: Начало последних суток UTC включительно
+        today: Начало текущих суток UTC
+        current: Статистика текущих суток из накопителя (None - по БД)
+    
+    Returns:
+        Сводка с разбивкой по суткам
+    """
+    end_day = min(end_day, today)
+    closed_end = min(end_day, today - DAY)
+    result = await session.execute(
+        select(DailyPriceStats)
+        .where(DailyPriceStats.ticker == ticker, DailyPriceStats.day >= start_day, DailyPriceStats.day <= closed_end)
+        .order_by(DailyPriceStats.day.asc())
+    )
+    days = {row.day: DayStats(row.day, RunningStats.from_row(row), True) for row in result.scalars()}
+    
+    recent_from = max(start_day, today - settings.daily_stats_lookback_days * DAY)
+    for day in range(recent_from, closed_end + 1, DAY):
+        if day not in days:
+            days[day] = DayStats(day, await compute_day(session, ticker, day), False)
+    if start_day <= today <= end_day:
+        if current is None:
+            current = await compute_day(session, ticker, today)
+        days[today] = DayStats(today, current, False)
+    
+    summary = DailySummary(total=RunningStats(), days=[days[day] for day in sorted(days)])
+    for item in summary.days:
+        summary.total.merge(item.stats)
+    older_end = min(closed_end, recent_from - DAY)
+    if older_end >= start_day:
+        older_rows = sum(1 for day in days if day <= older_end)
+        summary.days_missing = (older_end - start_day) // DAY + 1 - older_rows
+    return summary
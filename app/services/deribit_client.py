@@ -1,29 +1,153 @@
 """Клиент для работы с API Deribit."""
+import time
+import asyncio
 import aiohttp
-from typing import Optional
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 from decimal import Decimal
 from app.config import settings
+from app.metrics import DERIBIT_REQUEST_DURATION, DERIBIT_REQUEST_ERRORS, DERIBIT_RESILIENCE_EVENTS
+from app.services.resilience import (
+    CircuitBreaker,
+    LatencyTracker,
+    ResilienceState,
+    ResilienceStats,
+    RetryPolicy,
+)
+
+# Код ошибки Deribit "too_many_requests"
+RATE_LIMIT_ERROR_CODE = 10028
 
 
 class DeribitClientError(Exception):
     """Исключение для ошибок клиента Deribit."""
+    # Имеет ли смысл повторять запрос после этой ошибки
+    retryable = False
+    
+    def __init__(self, message: str = "", code: str = "error"):
+        """
+        Инициализация исключения.
+        
+        Args:
+            message: Текст ошибки
+            code: Код ошибки для метрик (HTTP статус, код Deribit, timeout, network)
+        """
+        super().__init__(message)
+        self.code = code
+
+
+class DeribitRateLimitError(DeribitClientError):
+    """Исключение при превышении лимита запросов к Deribit."""
+    # Не повторяется внутри клиента: паузу после лимита выдерживает вызывающий код
+    pass
+
+
+class DeribitTransientError(DeribitClientError):
+    """Исключение для временных ошибок: сеть, HTTP 5xx."""
+    retryable = True
+
+
+class DeribitTimeoutError(DeribitTransientError):
+    """Исключение при превышении времени ожидания ответа."""
+    pass
+
+
+class DeribitCircuitOpenError(DeribitClientError):
+    """Исключение при отклонении запроса разомкнутым circuit breaker."""
     pass
 
 
+@dataclass
+class RpcResponse:
+    """Ответ JSON-RPC с отметками времени запроса."""
+    result: dict
+    # Локальное время отправки запроса и получения ответа, UNIX time в секундах
+    sent_at: float
+    received_at: float
+    # Время получения запроса и отправки ответа сервером Deribit (usIn/usOut), микросекунды
+    us_in: Optional[int] = None
+    us_out: Optional[int] = None
+
+
+@dataclass
+class IndexPriceQuote:
+    """Индексная цена с отметками времени прохождения запроса."""
+    price: Decimal
+    sent_at: float
+    received_at: float
+    us_in: Optional[int] = None
+    us_out: Optional[int] = None
+
+
+# Состояние отказоустойчивости общее для всех клиентов процесса с одним base_url,
+# чтобы circuit breaker и оценка задержек переживали создание нового клиента
+_resilience_states: Dict[str, ResilienceState] = {}
+
+
+def get_resilience_state(base_url: str) -> ResilienceState:
+    """
+    Получить общее состояние отказоустойчивости для base_url.
+    
+    Args:
+        base_url: Базовый URL API Deribit
+        
+    Returns:
+        Состояние circuit breaker, трекера задержек и счетчиков
+    """
+    state = _resilience_states.get(base_url)
+    if state is None:
+        state = ResilienceState(
+            breaker=CircuitBreaker(
+                failure_threshold=settings.deribit_circuit_failure_threshold,
+                reset_timeout=settings.deribit_circuit_reset_timeout,
+            ),
+            latency=LatencyTracker(),
+            stats=ResilienceStats(),
+        )
+        _resilience_states[base_url] = state
+    return state
+
+
 class DeribitClient:
     """Клиент для получения данных с биржи Deribit."""
     
-    def __init__(self, base_url: str = None, session: Optional[aiohttp.ClientSession] = None):
+    def __init__(
+        self,
+        base_url: str = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        request_timeout: float = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        resilience: Optional[ResilienceState] = None,
+        hedge: bool = None,
+    ):
         """
         Инициализация клиента.
         
         Args:
             base_url: Базовый URL API Deribit
             session: Опциональная сессия aiohttp для переиспользования
+            request_timeout: Таймаут одной попытки запроса, секунды
+            retry_policy: Политика повторов (по умолчанию из настроек)
+            resilience: Состояние circuit breaker и счетчиков (по умолчанию общее для base_url)
+            hedge: Отправлять дублирующий запрос, если ответ дольше p95 задержки
         """
         self.base_url = base_url or settings.deribit_api_url
         self._session = session
         self._own_session = session is None
+        self.request_timeout = request_timeout or settings.deribit_request_timeout
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=settings.deribit_retry_attempts,
+            base_delay=settings.deribit_retry_base_delay,
+            max_delay=settings.deribit_retry_max_delay,
+            budget=settings.deribit_retry_budget,
+        )
+        self.resilience = resilience or get_resilience_state(self.base_url)
+        self.hedge = settings.deribit_hedge_enabled if hedge is None else hedge
+    
+    @property
+    def stats(self) -> ResilienceStats:
+        """Счетчики повторов, таймаутов, circuit breaker и hedged запросов."""
+        return self.resilience.stats
     
     async def _get_session(self) -> aiohttp.ClientSession:
         """Получить или создать сессию aiohttp."""
@@ -37,38 +161,49 @@ class DeribitClient:
             await self._session.close()
             self._session = None
     
-    async def get_index_price(self, currency: str) -> Decimal:
+    async def _call_once(self, method: str, params: dict, timeout: float) -> RpcResponse:
         """
-        Получить индексную цену валюты.
+        Выполнить одну попытку вызова публичного метода API Deribit.
         
         Args:
-            currency: Валюта (BTC или ETH)
+            method: Имя метода, например public/get_index_price
+            params: Параметры запроса
+            timeout: Таймаут попытки, секунды
             
         Returns:
-            Индексная цена валюты
+            Содержимое поля result ответа JSON-RPC с отметками времени
             
         Raises:
-            DeribitClientError: При ошибке получения данных
+            DeribitRateLimitError: При превышении лимита запросов
+            DeribitTimeoutError: При превышении таймаута
+            DeribitTransientError: При сетевой ошибке или HTTP 5xx
+            DeribitClientError: При прочих ошибках получения данных
         """
         session = await self._get_session()
-        # Используем правильный формат URL согласно документации Deribit API v2
-        # Согласно ответу get_instruments, price_index имеет формат: "btc_usd" или "eth_usd"
-        # URL: https://www.deribit.com/api/v2/public/get_index_price?index_name=btc_usd
-        url = f"{self.base_url}/public/get_index_price"
-        # Преобразуем валюту в формат index_name: валюта в нижнем регистре + "_usd"
-        # Например: BTC -> btc_usd, ETH -> eth_usd
-        index_name = f"{currency.lower()}_usd"
-        params = {"index_name": index_name}
+        url = f"{self.base_url}/{method}"
+        sent_at = time.time()
         
         try:
-            async with session.get(url, params=params) as response:
+            async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status == 429:
+                    raise DeribitRateLimitError("Rate limit exceeded: HTTP 429", code="http_429")
+                
+                if response.status >= 500:
+                    error_text = await response.text()
+                    raise DeribitTransientError(
+                        f"Failed to call {method}: HTTP {response.status}, {error_text}",
+                        code=f"http_{response.status}"
+                    )
+                
                 if response.status != 200:
                     error_text = await response.text()
                     raise DeribitClientError(
-                        f"Failed to get index price: HTTP {response.status}, {error_text}"
+                        f"Failed to call {method}: HTTP {response.status}, {error_text}",
+                        code=f"http_{response.status}"
                     )
                 
                 data = await response.json()
+                received_at = time.time()
                 
                 # Проверяем формат ответа Deribit API v2 (может быть JSON-RPC или обычный JSON)
                 # Deribit API v2 возвращает ответ в формате JSON-RPC 2.0
@@ -80,8 +215,14 @@ class DeribitClient:
                     else:
                         error_msg = str(error_info)
                         error_code = "unknown"
+                    if error_code == RATE_LIMIT_ERROR_CODE:
+                        raise DeribitRateLimitError(
+                            f"Deribit API error (code {error_code}): {error_msg}",
+                            code=str(error_code)
+                        )
                     raise DeribitClientError(
-                        f"Deribit API error (code {error_code}): {error_msg}"
+                        f"Deribit API error (code {error_code}): {error_msg}",
+                        code=str(error_code)
                     )
                 
                 # Проверяем наличие результата
@@ -90,24 +231,253 @@ class DeribitClient:
                         f"Invalid response format from Deribit API: {data}"
                     )
                 
-                result = data["result"]
-                
-                # Проверяем наличие index_price в результате
-                if "index_price" not in result:
-                    raise DeribitClientError(
-                        f"Index price not found in response: {result}"
-                    )
-                
-                index_price = result["index_price"]
-                return Decimal(str(index_price))
+                return RpcResponse(
+                    result=data["result"],
+                    sent_at=sent_at,
+                    received_at=received_at,
+                    us_in=data.get("usIn"),
+                    us_out=data.get("usOut"),
+                )
                 
+        except asyncio.TimeoutError as e:
+            raise DeribitTimeoutError(f"Timeout after {timeout:.2f}s calling {method}", code="timeout") from e
         except aiohttp.ClientError as e:
-            raise DeribitClientError(f"Network error: {str(e)}") from e
+            raise DeribitTransientError(f"Network error: {str(e)}", code="network") from e
         except Exception as e:
             if isinstance(e, DeribitClientError):
                 raise
             raise DeribitClientError(f"Unexpected error: {str(e)}") from e
     
+    async def _timed_call(self, method: str, params: dict, timeout: float) -> RpcResponse:
+        """Выполнить попытку, учесть ее задержку и код ошибки в метриках."""
+        started = time.monotonic()
+        try:
+            result = await self._call_once(method, params, timeout)
+        except DeribitClientError as e:
+            DERIBIT_REQUEST_ERRORS.labels(method=method, code=e.code).inc()
+            raise
+        finally:
+            DERIBIT_REQUEST_DURATION.labels(method=method).observe(time.monotonic() - started)
+        self.resilience.latency.record(time.monotonic() - started)
+        return result
+    
+    def _event(self, name: str):
+        """Учесть событие отказоустойчивости в счетчиках клиента и в метриках."""
+        setattr(self.stats, name, getattr(self.stats, name) + 1)
+        DERIBIT_RESILIENCE_EVENTS.labels(event=name).inc()
+    
+    async def _attempt(self, method: str, params: dict, timeout: float) -> RpcResponse:
+        """
+        Выполнить попытку, при необходимости с hedged запросом.
+        
+        Если ответ не пришел за p95 наблюдаемой задержки, отправляется второй
+        такой же запрос; используется первый успешный ответ.
+        """
+        hedge_after = None
+        if self.hedge and len(self.resilience.latency) >= settings.deribit_hedge_min_samples:
+            hedge_after = self.resilience.latency.percentile(settings.deribit_hedge_percentile)
+        if hedge_after is None or hedge_after >= timeout:
+            return await self._timed_call(method, params, timeout)
+        
+        primary = asyncio.ensure_future(self._timed_call(method, params, timeout))
+        pending = {primary}
+        error = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            if done:
+                return primary.result()
+            
+            self._event("hedges_launched")
+            hedged = asyncio.ensure_future(self._timed_call(method, params, timeout - hedge_after))
+            pending = {primary, hedged}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedged:
+                            self._event("hedges_won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Проигравший запрос отменяется и дожидается завершения, чтобы задача
+            # не осталась висеть в event loop
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def _request(self, method: str, params: dict) -> RpcResponse:
+        """
+        Выполнить публичный метод API Deribit с повторами и circuit breaker.
+        
+        Временные ошибки (сеть, таймаут, HTTP 5xx) повторяются с экспоненциальной
+        задержкой и jitter, пока не исчерпаны попытки или бюджет времени. Серия
+        таких ошибок размыкает circuit breaker, и дальнейшие вызовы сразу
+        отклоняются до пробного запроса.
+        
+        Args:
+            method: Имя метода, например public/get_index_price
+            params: Параметры запроса
+            
+        Returns:
+            Содержимое поля result ответа JSON-RPC с отметками времени успешной попытки
+            
+        Raises:
+            DeribitCircuitOpenError: Если circuit breaker разомкнут
+            DeribitClientError: При ошибке получения данных
+        """
+        breaker = self.resilience.breaker
+        policy = self.retry_policy
+        self._event("calls")
+        deadline = time.monotonic() + policy.budget
+        attempt = 0
+        
+        while True:
+            if not breaker.allow():
+                self._event("circuit_rejections")
+                raise DeribitCircuitOpenError(
+                    f"Circuit open for {self.base_url}, skipping {method}", code="circuit_open"
+                )
+            
+            timeout = min(self.request_timeout, max(deadline - time.monotonic(), 0.001))
+            self._event("attempts")
+            try:
+                result = await self._attempt(method, params, timeout)
+            except DeribitClientError as e:
+                if not e.retryable:
+                    # Deribit ответил, значит сервис доступен
+                    breaker.record_success()
+                    raise
+                self._event("failures")
+                if isinstance(e, DeribitTimeoutError):
+                    self._event("timeouts")
+                if breaker.record_failure():
+                    self._event("circuit_opened")
+                
+                attempt += 1
+                if attempt >= policy.max_attempts:
+                    raise
+                delay = policy.backoff(attempt - 1)
+                if time.monotonic() + delay >= deadline:
+                    self._event("budget_exhausted")
+                    raise
+                self._event("retries")
+                await asyncio.sleep(delay)
+                continue
+            
+            breaker.record_success()
+            self._event("successes")
+            return result
+    
+    async def _call(self, method: str, params: dict) -> dict:
+        """
+        Выполнить публичный метод API Deribit (см. _request).
+        
+        Returns:
+            Содержимое поля result ответа JSON-RPC
+        """
+        return (await self._request(method, params)).result
+    
+    async def get_index_price(self, currency: str) -> Decimal:
+        """
+        Получить индексную цену валюты.
+        
+        Args:
+            currency: Валюта (BTC или ETH)
+            
+        Returns:
+            Индексная цена валюты
+            
+        Raises:
+            DeribitClientError: При ошибке получения данных
+        """
+        return (await self.get_index_price_quote(currency)).price
+    
+    async def get_index_price_quote(self, currency: str) -> IndexPriceQuote:
+        """
+        Получить индексную цену валюты с отметками времени запроса.
+        
+        Кроме цены возвращаются локальные моменты отправки запроса и получения
+        ответа и время сервера Deribit (usIn/usOut) для трассировки задержки тика.
+        
+        Args:
+            currency: Валюта (BTC или ETH)
+            
+        Returns:
+            Индексная цена и отметки времени
+            
+        Raises:
+            DeribitClientError: При ошибке получения данных
+        """
+        # Используем правильный формат URL согласно документации Deribit API v2
+        # Согласно ответу get_instruments, price_index имеет формат: "btc_usd" или "eth_usd"
+        # URL: https://www.deribit.com/api/v2/public/get_index_price?index_name=btc_usd
+        # Преобразуем валюту в формат index_name: валюта в нижнем регистре + "_usd"
+        # Например: BTC -> btc_usd, ETH -> eth_usd
+        index_name = f"{currency.lower()}_usd"
+        response = await self._request("public/get_index_price", {"index_name": index_name})
+        result = response.result
+        
+        # Проверяем наличие index_price в результате
+        if "index_price" not in result:
+            raise DeribitClientError(
+                f"Index price not found in response: {result}"
+            )
+        
+        index_price = result["index_price"]
+        return IndexPriceQuote(
+            price=Decimal(str(index_price)),
+            sent_at=response.sent_at,
+            received_at=response.received_at,
+            us_in=response.us_in,
+            us_out=response.us_out,
+        )
+    
+    async def get_chart_data(
+        self,
+        instrument_name: str,
+        start_timestamp: int,
+        end_timestamp: int,
+        resolution: str = "1"
+    ) -> List[Tuple[int, Decimal]]:
+        """
+        Получить исторические свечи инструмента (public/get_tradingview_chart_data).
+        
+        Args:
+            instrument_name: Имя инструмента, например BTC-PERPETUAL
+            start_timestamp: Начало диапазона, UNIX timestamp в секундах
+            end_timestamp: Конец диапазона включительно, UNIX timestamp в секундах
+            resolution: Разрешение свечей в терминах Deribit ("1" - минута)
+            
+        Returns:
+            Список пар (timestamp начала свечи в секундах, цена закрытия)
+            
+        Raises:
+            DeribitRateLimitError: При превышении лимита запросов
+            DeribitClientError: При ошибке получения данных
+        """
+        result = await self._call(
+            "public/get_tradingview_chart_data",
+            {
+                "instrument_name": instrument_name,
+                "start_timestamp": start_timestamp * 1000,
+                "end_timestamp": end_timestamp * 1000,
+                "resolution": resolution,
+            },
+        )
+        
+        if result.get("status") == "no_data":
+            return []
+        if "ticks" not in result or "close" not in result:
+            raise DeribitClientError(
+                f"Chart data not found in response: {result}"
+            )
+        
+        return [
+            (int(tick) // 1000, Decimal(str(close)))
+            for tick, close in zip(result["ticks"], result["close"])
+        ]
+    
     async def __aenter__(self):
         """Поддержка async context manager."""
         await self._get_session()
@@ -0,0 +1,262 @@
+"""Выгрузка цен за большие диапазоны в сжатые файлы.
+
+Задание выгрузки создает API, а выполняет задача Celery export_prices:
+строки читаются из prices пачками по EXPORT_CHUNK_ROWS с keyset пагинацией
+по индексу (ticker, timestamp) и сразу дописываются в файл, поэтому память
+воркера не зависит от размера диапазона. После каждой пачки в задании
+обновляется число выгруженных строк.
+
+CSV пишется в gzip. Parquet доступен, если установлен пакет pyarrow.
+"""
+import os
+import csv
+import gzip
+import time
+import uuid
+import logging
+from typing import Callable, List, Optional, Sequence
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models import ExportJob, Price
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - зависит от окружения
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+COLUMNS = ["ticker", "timestamp", "price", "open", "high", "low", "samples", "source"]
+
+
+class CsvWriter:
+    """CSV в gzip."""
+    
+    extension = ".csv.gz"
+    media_type = "application/gzip"
+    
+    def __init__(self, path: str):
+        self._file = gzip.open(path, "wt", compresslevel=settings.export_gzip_level, newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+    
+    def write(self, rows: Sequence[Sequence]):
+        self._writer.writerows(rows)
+    
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """Parquet со сжатием zstd (пакет pyarrow)."""
+    
+    extension = ".parquet"
+    media_type = "application/vnd.apache.parquet"
+    
+    def __init__(self, path: str):
+        self._schema = pyarrow.schema([
+            ("ticker", pyarrow.string()),
+            ("timestamp", pyarrow.int64()),
+            ("price", pyarrow.decimal128(20, 8)),
+            ("open", pyarrow.decimal128(20, 8)),
+            ("high", pyarrow.decimal128(20, 8)),
+            ("low", pyarrow.decimal128(20, 8)),
+            ("samples", pyarrow.int32()),
+            ("source", pyarrow.string()),
+        ])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema, compression="zstd")
+    
+    def write(self, rows: Sequence[Sequence]):
+        columns = list(zip(*rows))
+        self._writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(columns, self._schema)],
+            schema=self._schema,
+        ))
+    
+    def close(self):
+        self._writer.close()
+
+
+def available_formats() -> dict:
+    """
+    Доступные форматы выгрузки.
+    
+    Returns:
+        Имя формата -> класс записи файла
+    """
+    formats = {"csv": CsvWriter}
+    if pyarrow is not None:
+        formats["parquet"] = ParquetWriter
+    return formats
+
+
+def new_job(
+    tickers: Sequence[str],
+    start_timestamp: Optional[int],
+    end_timestamp: Optional[int],
+    format: str,
+) -> ExportJob:
+    """
+    Создать запись задания выгрузки (без сохранения).
+    
+    Args:
+        tickers: Тикеры
+        start_timestamp: Начало диапазона (опционально)
+        end_timestamp: Конец диапазона включительно (опционально)
+        format: Формат файла из available_formats()
+    
+    Returns:
+        Задание в статусе pending
+    """
+    return ExportJob(
+        id=uuid.uuid4().hex,
+        tickers=",".join(tickers),
+        start_timestamp=start_timestamp,
+        end_timestamp=end_timestamp,
+        format=format,
+        status=PENDING,
+        rows_written=0,
+        created_at=int(time.time()),
+    )
+
+
+class Exporter:
+    """Выполнение заданий выгрузки пачками."""
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        directory: str = None,
+        chunk_rows: int = None,
+    ):
+        """
+        Инициализация.
+        
+        Args:
+            session_factory: Фабрика сессий БД (async_sessionmaker)
+            directory: Каталог файлов выгрузки
+            chunk_rows: Число строк в пачке
+        """
+        self.session_factory = session_factory
+        self.directory = directory or settings.export_dir
+        self.chunk_rows = chunk_rows or settings.export_chunk_rows
+    
+    def _range(self, query, job: ExportJob, ticker: str):
+        """Условия тикера и диапазона задания."""
+        query = query.where(Price.ticker == ticker)
+        if job.start_timestamp is not None:
+            query = query.where(Price.timestamp >= job.start_timestamp)
+        if job.end_timestamp is not None:
+            query = query.where(Price.timestamp <= job.end_timestamp)
+        return query
+    
+    async def _chunk(self, session: AsyncSession, job: ExportJob, ticker: str, after) -> List[tuple]:
+        """Следующая пачка строк тикера после позиции (timestamp, id)."""
+        query = self._range(
+            select(
+                Price.ticker, Price.timestamp, Price.price, Price.open, Price.high, Price.low,
+                Price.samples, Price.source, Price.id,
+            ),
+            job,
+            ticker,
+        )
+        if after is not None:
+            last_timestamp, last_id = after
+            query = query.where(or_(
+                Price.timestamp > last_timestamp,
+                and_(Price.timestamp == last_timestamp, Price.id > last_id),
+            ))
+        result = await session.execute(
+            query.order_by(Price.timestamp.asc(), Price.id.asc()).limit(self.chunk_rows)
+        )
+        return result.all()
+    
+    async def run(self, job_id: str) -> ExportJob:
+        """
+        Выполнить задание: выгрузить строки в файл и отметить результат.
+        
+        Файл пишется под временным именем и переименовывается после
+        завершения, поэтому скачать можно только полностью записанный файл.
+        
+        Args:
+            job_id: Идентификатор задания
+        
+        Returns:
+            Задание в статусе done или failed
+        """
+        async with self.session_factory() as session:
+            job = await session.get(ExportJob, job_id)
+            if job is None:
+                raise ValueError(f"Задание выгрузки {job_id} не найдено")
+            if job.status == DONE:
+                return job
+            
+            writer_class = available_formats().get(job.format)
+            if writer_class is None:
+                return await self._fail(session, job, f"Формат {job.format} недоступен")
+            
+            tickers = job.tickers.split(",")
+            job.status = RUNNING
+            job.rows_written = 0
+            job.rows_total = 0
+            for ticker in tickers:
+                job.rows_total += await session.scalar(self._range(select(func.count(Price.id)), job, ticker))
+            await session.commit()
+            
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, job.id + writer_class.extension)
+            partial = path + ".part"
+            started = time.perf_counter()
+            try:
+                writer = writer_class(partial)
+                try:
+                    for ticker in tickers:
+                        after = None
+                        while True:
+                            rows = await self._chunk(session, job, ticker, after)
+                            if not rows:
+                                break
+                            writer.write([row[:-1] for row in rows])
+                            after = (rows[-1].timestamp, rows[-1].id)
+                            job.rows_written += len(rows)
+                            await session.commit()
+                            if len(rows) < self.chunk_rows:
+                                break
+                finally:
+                    writer.close()
+                os.replace(partial, path)
+            except Exception as e:
+                logger.error(f"Ошибка выгрузки {job_id}: {str(e)}", exc_info=True)
+                if os.path.exists(partial):
+                    os.remove(partial)
+                # После ошибки БД транзакция сессии прервана: без отката
+                # commit в _fail не пройдет и задание останется в статусе running
+                await session.rollback()
+                await session.refresh(job)
+                return await self._fail(session, job, str(e))
+            
+            job.status = DONE
+            job.file_path = path
+            job.file_size = os.path.getsize(path)
+            job.finished_at = int(time.time())
+            await session.commit()
+            logger.info(
+                f"Выгрузка {job.id} завершена: {job.rows_written} строк, {job.file_size} байт "
+                f"за {time.perf_counter() - started:.1f} с"
+            )
+            return job
+    
+    async def _fail(self, session: AsyncSession, job: ExportJob, error: str) -> ExportJob:
+        """Отметить задание как неудачное."""
+        job.status = FAILED
+        job.error = error[:1024]
+        job.finished_at = int(time.time())
+        await session.commit()
+        return job
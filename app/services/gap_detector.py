@@ -0,0 +1,146 @@
+"""Поиск пропусков в ряду цен."""
+import time
+from typing import List, Optional
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models import Price, PriceGap, GapScanWatermark
+
+
+class GapDetector:
+    """Инкрементальный поиск пропусков через оконную функцию LEAD."""
+    
+    def __init__(self, db: AsyncSession, threshold_seconds: int = None, interval_seconds: int = None):
+        """
+        Инициализация детектора.
+        
+        Args:
+            db: Сессия базы данных
+            threshold_seconds: Минимальный интервал между соседними тиками, считающийся пропуском
+                (по умолчанию GAP_THRESHOLD_SECONDS, но не меньше полутора штатных интервалов)
+            interval_seconds: Штатный интервал между тиками (по умолчанию по режиму получения цен)
+        """
+        self.db = db
+        self.interval_seconds = interval_seconds or settings.series_interval_seconds
+        self.threshold_seconds = threshold_seconds or max(
+            settings.gap_threshold_seconds, self.interval_seconds * 3 // 2
+        )
+    
+    async def get_watermark(self, ticker: str) -> Optional[int]:
+        """
+        Получить timestamp, до которого ряд тикера уже проверен.
+        
+        Args:
+            ticker: Тикер валюты
+        
+        Returns:
+            Timestamp последнего проверенного тика или None
+        """
+        watermark = await self.db.get(GapScanWatermark, ticker)
+        return watermark.scanned_until if watermark else None
+    
+    async def scan(self, ticker: str) -> List[PriceGap]:
+        """
+        Найти новые пропуски тикера начиная с сохраненного watermark.
+        
+        Сканируются только тики с timestamp >= watermark (по индексу
+        ticker + timestamp), после чего watermark сдвигается на последний тик.
+        Последний тик включается в следующий проход, чтобы пропуск сразу после
+        него не потерялся.
+        
+        Args:
+            ticker: Тикер валюты
+        
+        Returns:
+            Список новых пропусков
+        """
+        watermark = await self.get_watermark(ticker)
+        
+        conditions = [Price.ticker == ticker]
+        if watermark is not None:
+            conditions.append(Price.timestamp >= watermark)
+        
+        latest = await self.db.scalar(select(func.max(Price.timestamp)).where(*conditions))
+        if latest is None:
+            return []
+        
+        next_timestamp = func.lead(Price.timestamp).over(order_by=Price.timestamp).label("next_timestamp")
+        ordered = select(Price.timestamp.label("timestamp"), next_timestamp).where(*conditions).subquery()
+        result = await self.db.execute(
+            select(ordered.c.timestamp, ordered.c.next_timestamp)
+            .where(ordered.c.next_timestamp - ordered.c.timestamp > self.threshold_seconds)
+            .order_by(ordered.c.timestamp)
+        )
+        bounds = result.all()
+        
+        known = set()
+        if bounds:
+            existing = await self.db.execute(
+                select(PriceGap.gap_start).where(
+                    PriceGap.ticker == ticker,
+                    PriceGap.gap_start >= bounds[0][0],
+                    PriceGap.gap_start <= bounds[-1][0],
+                )
+            )
+            known = set(existing.scalars())
+        
+        now = int(time.time())
+        gaps = []
+        for gap_start, gap_end in bounds:
+            if gap_start in known:
+                continue
+            gap = PriceGap(
+                ticker=ticker,
+                gap_start=gap_start,
+                gap_end=gap_end,
+                missing_minutes=max(round((gap_end - gap_start) / self.interval_seconds) - 1, 1),
+                detected_at=now,
+                filled_minutes=0,
+                repair_attempts=0,
+            )
+            self.db.add(gap)
+            gaps.append(gap)
+        
+        await self.db.merge(GapScanWatermark(ticker=ticker, scanned_until=latest, updated_at=now))
+        await self.db.commit()
+        return gaps
+    
+    async def get_gaps(self, ticker: str, include_repaired: bool = False) -> List[PriceGap]:
+        """
+        Получить найденные пропуски тикера.
+        
+        Args:
+            ticker: Тикер валюты
+            include_repaired: Включать уже заполненные пропуски
+        
+        Returns:
+            Список пропусков, от новых к старым
+        """
+        query = select(PriceGap).where(PriceGap.ticker == ticker)
+        if not include_repaired:
+            query = query.where(PriceGap.repaired_at.is_(None))
+        result = await self.db.execute(query.order_by(PriceGap.gap_start.desc()))
+        return list(result.scalars().all())
+    
+    async def get_repairable_gaps(self, ticker: str, max_attempts: int = None) -> List[PriceGap]:
+        """
+        Получить незаполненные пропуски, у которых не исчерпаны попытки заполнения.
+        
+        Args:
+            ticker: Тикер валюты
+            max_attempts: Максимальное число попыток заполнения
+        
+        Returns:
+            Список пропусков, от старых к новым
+        """
+        max_attempts = max_attempts or settings.gap_repair_max_attempts
+        result = await self.db.execute(
+            select(PriceGap)
+            .where(
+                PriceGap.ticker == ticker,
+                PriceGap.repaired_at.is_(None),
+                PriceGap.repair_attempts < max_attempts,
+            )
+            .order_by(PriceGap.gap_start)
+        )
+        return list(result.scalars().all())
@@ -0,0 +1,167 @@
+"""Трассировка задержки тиков от биржи до записи в БД.
+
+Для каждого тика сохраняются отметки времени: отправка запроса, получение
+запроса и отправка ответа сервером Deribit (поля usIn/usOut ответа),
+получение ответа и фиксация записи цены. По ним считаются этапы:
+
+- request: от отправки запроса до его получения биржей
+- exchange: обработка на бирже (usOut - usIn)
+- response: от отправки ответа биржей до его получения
+- round_trip: полный запрос (без влияния расхождения часов)
+- write: от получения ответа до фиксации записи
+- staleness: возраст цены в момент фиксации (от usOut)
+
+request, response и staleness сравнивают часы сервера Deribit с локальными,
+поэтому включают расхождение часов; round_trip, exchange и write - нет.
+"""
+import time
+import logging
+from typing import Dict, Mapping, Optional, Sequence
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.metrics import INGESTION_STAGE_DURATION
+from app.models import TickLatency
+from app.services.deribit_client import IndexPriceQuote
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("request", "exchange", "response", "round_trip", "write", "staleness")
+PERCENTILES = (50, 95, 99)
+
+
+def to_us(seconds: float) -> int:
+    """UNIX time в секундах -> микросекунды."""
+    return int(round(seconds * 1_000_000))
+
+
+def stage_durations(row: TickLatency) -> Dict[str, Optional[float]]:
+    """
+    Длительности этапов тика в секундах.
+    
+    Args:
+        row: Отметки времени тика
+    
+    Returns:
+        Этап -> длительность; None, если биржа не вернула usIn/usOut
+    """
+    exchange = row.exchange_in_us is not None and row.exchange_out_us is not None
+    durations = {
+        "request": (row.exchange_in_us - row.sent_at_us) if exchange else None,
+        "exchange": (row.exchange_out_us - row.exchange_in_us) if exchange else None,
+        "response": (row.received_at_us - row.exchange_out_us) if exchange else None,
+        "round_trip": row.received_at_us - row.sent_at_us,
+        "write": row.committed_at_us - row.received_at_us,
+        "staleness": (row.committed_at_us - row.exchange_out_us) if exchange else None,
+    }
+    return {stage: None if value is None else value / 1_000_000 for stage, value in durations.items()}
+
+
+async def record_tick_latencies(
+    session: AsyncSession,
+    prices: Sequence,
+    quotes: Mapping[str, IndexPriceQuote],
+    committed_at: float,
+) -> int:
+    """
+    Сохранить отметки времени записанных тиков и учесть этапы в метриках.
+    
+    Ошибка записи трассировки не влияет на запись цен: она логируется, и
+    транзакция трассировки откатывается.
+    
+    Args:
+        session: Сессия БД
+        prices: Сохраненные записи Price
+        quotes: Ответы Deribit по тикерам
+        committed_at: Момент фиксации записи цен, UNIX time в секундах
+    
+    Returns:
+        Количество сохраненных записей трассировки
+    """
+    if not settings.latency_tracing_enabled:
+        return 0
+    
+    rows = []
+    for price in prices:
+        quote = quotes.get(price.ticker)
+        if quote is None:
+            continue
+        row = TickLatency(
+            price_id=price.id,
+            ticker=price.ticker,
+            timestamp=price.timestamp,
+            sent_at_us=to_us(quote.sent_at),
+            exchange_in_us=quote.us_in,
+            exchange_out_us=quote.us_out,
+            received_at_us=to_us(quote.received_at),
+            committed_at_us=to_us(committed_at),
+        )
+        rows.append(row)
+        for stage, duration in stage_durations(row).items():
+            if duration is not None:
+                INGESTION_STAGE_DURATION.labels(ticker=price.ticker, stage=stage).observe(max(duration, 0.0))
+    
+    if not rows:
+        return 0
+    try:
+        session.add_all(rows)
+        await session.commit()
+    except SQLAlchemyError as e:
+        await session.rollback()
+        logger.warning(f"Не удалось сохранить трассировку задержки тиков: {str(e)}")
+        return 0
+    return len(rows)
+
+
+async def latency_summary(
+    session: AsyncSession,
+    ticker: str,
+    start_timestamp: int,
+    end_timestamp: Optional[int] = None,
+) -> dict:
+    """
+    Распределение длительностей этапов тиков тикера за период.
+    
+    Args:
+        session: Сессия БД
+        ticker: Тикер
+        start_timestamp: Начало периода (timestamp тика)
+        end_timestamp: Конец периода включительно (по умолчанию - текущий момент)
+    
+    Returns:
+        Число тиков и для каждого этапа count, p50, p95, p99 и max в миллисекундах
+    """
+    end_timestamp = int(time.time()) if end_timestamp is None else end_timestamp
+    result = await session.execute(
+        select(TickLatency).where(
+            TickLatency.ticker == ticker,
+            TickLatency.timestamp >= start_timestamp,
+            TickLatency.timestamp <= end_timestamp,
+        )
+    )
+    rows = result.scalars().all()
+    
+    durations = {stage: [] for stage in STAGES}
+    for row in rows:
+        for stage, duration in stage_durations(row).items():
+            if duration is not None:
+                durations[stage].append(duration)
+    
+    stages = []
+    for stage in STAGES:
+        values = np.asarray(durations[stage], dtype=np.float64) * 1000
+        summary = {"stage": stage, "count": int(values.size)}
+        if values.size:
+            for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                summary[f"p{percentile}_ms"] = round(float(value), 3)
+            summary["max_ms"] = round(float(values.max()), 3)
+        stages.append(summary)
+    return {
+        "ticker": ticker,
+        "start_timestamp": start_timestamp,
+        "end_timestamp": end_timestamp,
+        "ticks": len(rows),
+        "stages": stages,
+    }
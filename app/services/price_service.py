@@ -1,25 +1,60 @@
 """Сервис для работы с ценами в базе данных."""
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from typing import List, Optional
+from sqlalchemy import select, insert, and_, cast, func, Float
+import time
+from typing import List, Optional, Sequence, Tuple
 from decimal import Decimal
 from datetime import datetime
 from datetime import timedelta
-from app.models import Price
+from app.config import settings
+from app.models import BACKFILL_SOURCE, Price
+from app.timing import timed_phase
 from app.schemas import PriceCreate
+from app.services.recent_store import RecentPriceStore, recent_prices
+
+
+def date_range_to_timestamps(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Преобразовать границы диапазона дат в UNIX timestamps.
+    
+    Args:
+        start_date: Начальная дата (опционально)
+        end_date: Конечная дата (опционально)
+        
+    Returns:
+        Пара (start_timestamp, end_timestamp), None для отсутствующих границ
+    """
+    start_timestamp = int(start_date.timestamp()) if start_date else None
+    end_timestamp = None
+    if end_date:
+        # Treat a date with no time component as inclusive end of day
+        end_timestamp = int(end_date.timestamp())
+        if (
+            end_date.hour == 0
+            and end_date.minute == 0
+            and end_date.second == 0
+            and end_date.microsecond == 0
+        ):
+            end_timestamp += 86399
+    return start_timestamp, end_timestamp
 
 
 class PriceService:
     """Сервис для работы с ценами."""
     
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, recent: Optional[RecentPriceStore] = None):
         """
         Инициализация сервиса.
         
         Args:
             db: Сессия базы данных
+            recent: Окно последних цен в памяти (по умолчанию общее окно процесса)
         """
         self.db = db
+        self.recent = recent_prices if recent is None else recent
     
     async def create_price(self, price_data: PriceCreate) -> Price:
         """
@@ -34,28 +69,130 @@ class PriceService:
         price = Price(
             ticker=price_data.ticker,
             price=price_data.price,
-            timestamp=price_data.timestamp
+            timestamp=price_data.timestamp,
+            open=price_data.open,
+            high=price_data.high,
+            low=price_data.low,
+            samples=price_data.samples
         )
         self.db.add(price)
         await self.db.commit()
         await self.db.refresh(price)
         return price
     
-    async def get_prices_by_ticker(self, ticker: str) -> List[Price]:
+    async def create_prices(self, prices_data: Sequence[PriceCreate]) -> List[Price]:
+        """
+        Создать несколько записей о ценах в одной транзакции.
+        
+        Args:
+            prices_data: Данные о ценах
+            
+        Returns:
+            Созданные записи
+        """
+        prices = [
+            Price(
+                ticker=data.ticker,
+                price=data.price,
+                timestamp=data.timestamp,
+                open=data.open,
+                high=data.high,
+                low=data.low,
+                samples=data.samples
+            )
+            for data in prices_data
+        ]
+        self.db.add_all(prices)
+        await self.db.commit()
+        return prices
+    
+    async def bulk_insert_prices(
+        self,
+        ticker: str,
+        points: Sequence[Tuple[int, Decimal]],
+        commit: bool = True,
+        source: Optional[str] = BACKFILL_SOURCE
+    ) -> int:
+        """
+        Массово вставить цены тикера, пропуская минуты, в которых уже есть запись.
+        
+        На PostgreSQL строки записываются через COPY, на остальных СУБД -
+        одним executemany INSERT.
+        
+        Args:
+            ticker: Тикер валюты
+            points: Пары (UNIX timestamp, цена)
+            commit: Зафиксировать транзакцию после вставки
+            source: Происхождение строк (по умолчанию догрузка закрытий свечей)
+            
+        Returns:
+            Количество вставленных записей
+        """
+        if not points:
+            return 0
+        
+        timestamps = [ts for ts, _ in points]
+        range_start = (min(timestamps) // 60) * 60
+        range_end = (max(timestamps) // 60) * 60 + 59
+        existing = await self.db.execute(
+            select(Price.timestamp).where(
+                Price.ticker == ticker,
+                Price.timestamp >= range_start,
+                Price.timestamp <= range_end,
+            )
+        )
+        taken_minutes = {ts // 60 for ts in existing.scalars()}
+        
+        records = []
+        inserted_at = int(time.time())
+        for ts, price in sorted(points):
+            minute = ts // 60
+            if minute in taken_minutes:
+                continue
+            taken_minutes.add(minute)
+            records.append((ticker, price, ts, source, inserted_at))
+        
+        if records:
+            conn = await self.db.connection()
+            if conn.dialect.name == "postgresql":
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    Price.__tablename__,
+                    records=records,
+                    columns=["ticker", "price", "timestamp", "source", "inserted_at"],
+                )
+            else:
+                await self.db.execute(
+                    insert(Price),
+                    [
+                        {"ticker": t, "price": p, "timestamp": ts, "source": s, "inserted_at": at}
+                        for t, p, ts, s, at in records
+                    ],
+                )
+        
+        if commit:
+            await self.db.commit()
+        return len(records)
+    
+    @timed_phase("query")
+    async def get_prices_by_ticker(self, ticker: str, limit: Optional[int] = None) -> List[Price]:
         """
         Получить все цены по тикеру.
         
         Args:
             ticker: Тикер валюты
+            limit: Максимальное число строк (опционально)
             
         Returns:
             Список цен
         """
-        result = await self.db.execute(
-            select(Price).where(Price.ticker == ticker).order_by(Price.timestamp.desc())
-        )
+        query = select(Price).where(Price.ticker == ticker).order_by(Price.timestamp.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        result = await self.db.execute(query)
         return list(result.scalars().all())
     
+    @timed_phase("query")
     async def get_last_price(self, ticker: str) -> Optional[Price]:
         """
         Получить последнюю цену по тикеру.
@@ -74,46 +211,164 @@ class PriceService:
         )
         return result.scalar_one_or_none()
     
+    @timed_phase("query")
     async def get_prices_by_date_range(
         self,
         ticker: str,
         start_date: Optional[datetime] = None,
-        end_date: Optional[datetime] = None
+        end_date: Optional[datetime] = None,
+        limit: Optional[int] = None
     ) -> List[Price]:
         """
         Получить цены по тикеру с фильтром по дате.
         
+        Диапазон, целиком лежащий в окне последних цен, отдается из памяти
+        (записи PricePoint с теми же атрибутами, что у Price).
+        
         Args:
             ticker: Тикер валюты
             start_date: Начальная дата (опционально)
             end_date: Конечная дата (опционально)
+            limit: Максимальное число строк (опционально)
             
         Returns:
             Список цен
         """
-        query = select(Price).where(Price.ticker == ticker)
+        start_timestamp, end_timestamp = date_range_to_timestamps(start_date, end_date)
+        recent = self.recent.query(ticker, start_timestamp, end_timestamp, limit)
+        if recent is not None:
+            return recent
         
+        query = select(Price).where(Price.ticker == ticker)
         conditions = []
-        if start_date:
-            start_timestamp = int(start_date.timestamp())
+        if start_timestamp is not None:
             conditions.append(Price.timestamp >= start_timestamp)
-        
-        if end_date:
-            # Treat a date with no time component as inclusive end of day
-            end_timestamp = int(end_date.timestamp())
-            if (
-                end_date.hour == 0
-                and end_date.minute == 0
-                and end_date.second == 0
-                and end_date.microsecond == 0
-            ):
-                end_timestamp += 86399
+        if end_timestamp is not None:
             conditions.append(Price.timestamp <= end_timestamp)
         
         if conditions:
             query = query.where(and_(*conditions))
         
         query = query.order_by(Price.timestamp.desc())
+        if limit is not None:
+            query = query.limit(limit)
         
         result = await self.db.execute(query)
         return list(result.scalars().all())
+    
+    @timed_phase("query")
+    async def get_series(
+        self,
+        ticker: str,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+        limit: Optional[int] = None,
+        include_backfill: bool = True
+    ) -> Tuple[List[int], List[float]]:
+        """
+        Получить ряд цен тикера в виде двух колонок без создания ORM объектов.
+        
+        Args:
+            ticker: Тикер валюты
+            start_timestamp: Начало диапазона, UNIX timestamp (опционально)
+            end_timestamp: Конец диапазона включительно, UNIX timestamp (опционально)
+            limit: Максимальное число точек от начала диапазона (опционально)
+            include_backfill: Включать строки догрузки (закрытия свечей вместо индексной цены)
+            
+        Returns:
+            Пара списков (timestamps, prices), отсортированных по возрастанию времени
+        """
+        query = select(Price.timestamp, cast(Price.price, Float)).where(Price.ticker == ticker)
+        if start_timestamp is not None:
+            query = query.where(Price.timestamp >= start_timestamp)
+        if end_timestamp is not None:
+            query = query.where(Price.timestamp <= end_timestamp)
+        if not include_backfill:
+            query = query.where(Price.source.is_(None))
+        query = query.order_by(Price.timestamp.asc())
+        if limit is not None:
+            query = query.limit(limit)
+        
+        result = await self.db.execute(query)
+        rows = result.all()
+        return [row[0] for row in rows], [row[1] for row in rows]
+    
+    @timed_phase("query")
+    async def get_changes(
+        self,
+        since_id: int,
+        ticker: Optional[str] = None,
+        since_timestamp: Optional[int] = None,
+        limit: int = 1000
+    ) -> List[Price]:
+        """
+        Получить записи, добавленные после водяного знака, по возрастанию id.
+        
+        id выдаются при вставке, а видны строки после фиксации транзакции,
+        поэтому строка с меньшим id может появиться позже строки с большим.
+        Чтобы водяной знак ее не перешагнул, записи отдаются только ниже
+        горизонта - наименьшего id среди строк, вставленных за последние
+        SYNC_SETTLE_SECONDS (с запасом на округление до секунды). Транзакции
+        записи короче этого окна, поэтому все строки ниже горизонта уже
+        зафиксированы или откатились.
+        
+        Args:
+            since_id: id последней полученной клиентом записи
+            ticker: Тикер валюты (опционально)
+            since_timestamp: Только записи с timestamp не раньше (опционально)
+            limit: Максимальное число записей
+            
+        Returns:
+            Список цен
+        """
+        query = select(Price).where(Price.id > since_id)
+        if settings.sync_settle_seconds > 0:
+            cutoff = int(time.time()) - settings.sync_settle_seconds - 1
+            horizon = await self.db.scalar(select(func.min(Price.id)).where(Price.inserted_at > cutoff))
+            if horizon is not None:
+                if horizon <= since_id + 1:
+                    return []
+                query = query.where(Price.id < horizon)
+        if ticker is not None:
+            query = query.where(Price.ticker == ticker)
+        if since_timestamp is not None:
+            query = query.where(Price.timestamp >= since_timestamp)
+        result = await self.db.execute(query.order_by(Price.id.asc()).limit(limit))
+        return list(result.scalars().all())
+    
+    async def wait_for_changes(
+        self,
+        since_id: int,
+        ticker: Optional[str] = None,
+        since_timestamp: Optional[int] = None,
+        limit: int = 1000,
+        wait: float = 0.0
+    ) -> List[Price]:
+        """
+        Получить записи после водяного знака, при их отсутствии - дождаться новых.
+        
+        Ожидание заканчивается уведомлением о записи цен из окна последних
+        цен или через SYNC_POLL_INTERVAL_SECONDS (если уведомления недоступны
+        или новые строки еще моложе SYNC_SETTLE_SECONDS), после чего БД
+        проверяется снова. На время ожидания соединение
+        возвращается в пул.
+        
+        Args:
+            since_id: id последней полученной клиентом записи
+            ticker: Тикер валюты (опционально)
+            since_timestamp: Только записи с timestamp не раньше (опционально)
+            limit: Максимальное число записей
+            wait: Максимальное ожидание новых записей, секунды (0 - без ожидания)
+            
+        Returns:
+            Список цен; пустой, если за wait секунд новых записей не появилось
+        """
+        deadline = time.monotonic() + wait
+        while True:
+            generation = self.recent.generation
+            prices = await self.get_changes(since_id, ticker, since_timestamp, limit)
+            remaining = deadline - time.monotonic()
+            if prices or remaining <= 0:
+                return prices
+            await self.db.close()
+            await self.recent.wait_written(generation, min(remaining, settings.sync_poll_interval_seconds))
@@ -0,0 +1,576 @@
+"""Окно последних цен в памяти процесса API.
+
+Большинство запросов /filter касаются последних суток. Для каждого тикера
+последние RECENT_WINDOW_HOURS часов хранятся в кольцевом буфере на массиве
+NumPy (int64: timestamp, id, цены в единицах 1e-8, число замеров, код
+источника), и
+PriceService.get_prices_by_date_range отдает диапазоны, целиком лежащие в
+окне, бинарным поиском без запроса к БД.
+
+Буфер заполняется из БД при запуске и обновляется уведомлениями о записи,
+которые процессы получения цен публикуют в канал Redis. Пока подписка не
+установлена, окно тикера не загружено или давно не обновлялось, запросы
+идут в БД.
+
+Те же загрузки и уведомления ведут накопитель статистики текущих суток
+(CurrentDayStats) для сводки /stats/daily.
+"""
+import json
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from app.config import settings
+from app.metrics import record_cache_lookup
+from app.models import BACKFILL_SOURCE, Price
+from app.redis_client import create_redis
+from app.services.daily_stats import CurrentDayStats, RunningStats
+
+logger = logging.getLogger(__name__)
+
+PRICE_CHANNEL = "prices:written"
+
+# Колонки строки буфера
+TS, ID, PRICE, OPEN, HIGH, LOW, SAMPLES, SOURCE = range(8)
+COLUMNS = 8
+
+# Значения Price.source по коду в колонке SOURCE
+SOURCES = (None, BACKFILL_SOURCE)
+
+# Цены хранятся целыми в единицах 1e-8 (точность колонки Numeric(20, 8))
+PRICE_EXPONENT = -8
+PRICE_QUANTUM = Decimal(1).scaleb(PRICE_EXPONENT)
+NULL = np.iinfo(np.int64).min
+
+
+def to_scaled(value) -> int:
+    """Цена -> целое в единицах 1e-8 (None -> NULL)."""
+    if value is None:
+        return NULL
+    return int(Decimal(str(value)).quantize(PRICE_QUANTUM, rounding=ROUND_HALF_UP).scaleb(-PRICE_EXPONENT))
+
+
+def from_scaled(value: int) -> Optional[Decimal]:
+    """Целое в единицах 1e-8 -> Decimal с 8 знаками, как у значения из БД."""
+    if value == NULL:
+        return None
+    return Decimal(value).scaleb(PRICE_EXPONENT)
+
+
+@dataclass
+class PricePoint:
+    """Цена из окна в памяти; атрибуты совпадают с моделью Price."""
+    id: int
+    ticker: str
+    price: Decimal
+    timestamp: int
+    open: Optional[Decimal] = None
+    high: Optional[Decimal] = None
+    low: Optional[Decimal] = None
+    samples: Optional[int] = None
+    source: Optional[str] = None
+
+
+def make_row(id: int, price, timestamp: int, open=None, high=None, low=None, samples=None, source=None) -> List[int]:
+    """Строка буфера из значений записи."""
+    return [
+        int(timestamp), int(id), to_scaled(price), to_scaled(open), to_scaled(high), to_scaled(low),
+        NULL if samples is None else int(samples), SOURCES.index(source),
+    ]
+
+
+class PriceRing:
+    """
+    Кольцевой буфер строк одного тикера, упорядоченных по (timestamp, id).
+    
+    Буфер растет удвоением до max_capacity, после чего новые строки
+    вытесняют самые старые. covered_from - момент, начиная с которого
+    в буфере есть все записи тикера из БД (None - окно не загружено).
+    """
+    
+    def __init__(self, max_capacity: int, initial_capacity: int = 1024):
+        """
+        Инициализация.
+        
+        Args:
+            max_capacity: Максимальное число строк
+            initial_capacity: Начальный размер массива
+        """
+        self.max_capacity = max_capacity
+        self.initial_capacity = min(initial_capacity, max_capacity)
+        self._data = np.empty((self.initial_capacity, COLUMNS), dtype=np.int64)
+        self._head = 0
+        self.size = 0
+        self.covered_from: Optional[int] = None
+    
+    @property
+    def capacity(self) -> int:
+        """Текущий размер массива."""
+        return len(self._data)
+    
+    def _segments(self) -> List[np.ndarray]:
+        """Строки буфера в порядке времени: один или два непрерывных участка массива."""
+        end = self._head + self.size
+        if end <= self.capacity:
+            return [self._data[self._head:end]]
+        return [self._data[self._head:], self._data[:end - self.capacity]]
+    
+    def rows(self) -> np.ndarray:
+        """Копия строк буфера в порядке времени."""
+        if not self.size:
+            return np.empty((0, COLUMNS), dtype=np.int64)
+        return np.concatenate(self._segments())
+    
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        """Timestamp последней строки."""
+        if not self.size:
+            return None
+        return int(self._data[(self._head + self.size - 1) % self.capacity, TS])
+    
+    def _evicted(self, timestamp: int):
+        """Учесть вытеснение строк до timestamp включительно."""
+        if self.covered_from is not None:
+            self.covered_from = max(self.covered_from, int(timestamp) + 1)
+    
+    def _rebuild(self, rows: np.ndarray):
+        """Заменить содержимое упорядоченными строками, подобрав размер массива."""
+        if len(rows) > self.max_capacity:
+            self._evicted(rows[len(rows) - self.max_capacity - 1, TS])
+            rows = rows[len(rows) - self.max_capacity:]
+        capacity = min(self.max_capacity, max(2 * len(rows), self.initial_capacity))
+        self._data = np.empty((capacity, COLUMNS), dtype=np.int64)
+        self._data[:len(rows)] = rows
+        self._head = 0
+        self.size = len(rows)
+    
+    def extend(self, rows: np.ndarray):
+        """
+        Добавить строки.
+        
+        Строки новее последней записываются в кольцо на место; более старые
+        (догрузка, повторное уведомление) сливаются с буфером с удалением
+        дубликатов по id.
+        
+        Args:
+            rows: Массив строк формы (n, COLUMNS)
+        """
+        if not len(rows):
+            return
+        rows = rows[np.lexsort((rows[:, ID], rows[:, TS]))]
+        last = self.last_timestamp
+        if last is not None and rows[0, TS] <= last:
+            merged = np.concatenate([self.rows(), rows])
+            _, first = np.unique(merged[:, ID], return_index=True)
+            merged = merged[first]
+            self._rebuild(merged[np.lexsort((merged[:, ID], merged[:, TS]))])
+            return
+        
+        if self.size + len(rows) > self.capacity and (
+            self.capacity < self.max_capacity or len(rows) >= self.capacity
+        ):
+            self._rebuild(np.concatenate([self.rows(), rows]))
+            return
+        
+        overflow = self.size + len(rows) - self.capacity
+        if overflow > 0:
+            self._evicted(self._data[(self._head + overflow - 1) % self.capacity, TS])
+            self._head = (self._head + overflow) % self.capacity
+            self.size -= overflow
+        start = (self._head + self.size) % self.capacity
+        first = min(len(rows), self.capacity - start)
+        self._data[start:start + first] = rows[:first]
+        self._data[:len(rows) - first] = rows[first:]
+        self.size += len(rows)
+    
+    def trim(self, cutoff: int):
+        """Удалить строки старше cutoff."""
+        stale = sum(int(np.searchsorted(segment[:, TS], cutoff, side="left")) for segment in self._segments())
+        if stale:
+            self._head = (self._head + stale) % self.capacity
+            self.size -= stale
+        if self.covered_from is not None:
+            self.covered_from = max(self.covered_from, cutoff)
+    
+    def select(self, start: Optional[int], end: Optional[int]) -> np.ndarray:
+        """
+        Строки с timestamp в [start, end] бинарным поиском.
+        
+        Args:
+            start: Начало диапазона (None - без ограничения)
+            end: Конец диапазона включительно (None - без ограничения)
+        
+        Returns:
+            Строки в порядке времени
+        """
+        parts = []
+        for segment in self._segments():
+            timestamps = segment[:, TS]
+            lo = 0 if start is None else np.searchsorted(timestamps, start, side="left")
+            hi = len(segment) if end is None else np.searchsorted(timestamps, end, side="right")
+            if hi > lo:
+                parts.append(segment[lo:hi])
+        if not parts:
+            return np.empty((0, COLUMNS), dtype=np.int64)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+class RecentPriceStore:
+    """Окна последних цен всех тикеров."""
+    
+    def __init__(
+        self,
+        window_seconds: int,
+        capacity: int,
+        max_staleness: Optional[float] = None,
+        clock=time.time,
+        daily: Optional[CurrentDayStats] = None,
+    ):
+        """
+        Инициализация.
+        
+        Args:
+            window_seconds: Длина окна в секундах
+            capacity: Максимум строк на тикер
+            max_staleness: Сколько секунд окно тикера считается актуальным без
+                уведомлений и перезагрузки из БД (None - без ограничения)
+            clock: Источник времени
+            daily: Накопитель статистики текущих суток (опционально)
+        """
+        self.window_seconds = window_seconds
+        self.capacity = capacity
+        self.max_staleness = max_staleness
+        self.clock = clock
+        self.daily = daily
+        self.ready = False
+        self._rings: Dict[str, PriceRing] = {}
+        # Время последней загрузки или уведомления по тикеру
+        self._updated_at: Dict[str, float] = {}
+        # Число обработанных уведомлений; по нему long-poll /sync ждет новых записей
+        self.generation = 0
+        self._written = asyncio.Event()
+    
+    def cutoff(self) -> int:
+        """Начало окна на текущий момент."""
+        return int(self.clock()) - self.window_seconds
+    
+    def load(self, ticker: str, rows: Iterable[Sequence], since: int):
+        """
+        Заменить окно тикера строками из БД.
+        
+        Args:
+            ticker: Тикер
+            rows: Записи (timestamp, id, price, open, high, low, samples, source) с timestamp >= since
+            since: Начало загруженного диапазона
+        """
+        ring = PriceRing(self.capacity)
+        ring.covered_from = since
+        data = [make_row(id, price, ts, *values) for ts, id, price, *values in rows]
+        ring.extend(np.array(data, dtype=np.int64).reshape(-1, COLUMNS))
+        self._rings[ticker] = ring
+        self._updated_at[ticker] = self.clock()
+    
+    def add(self, prices: Iterable[dict]):
+        """
+        Добавить записанные цены из уведомления.
+        
+        Цены тикеров без загруженного окна и цены старше окна пропускаются.
+        
+        Args:
+            prices: Словари с полями id, ticker, price, timestamp, open, high, low, samples, source
+        """
+        prices = list(prices)
+        by_ticker: Dict[str, list] = {}
+        for price in prices:
+            ring = self._rings.get(price["ticker"])
+            if ring is None or ring.covered_from is None or price["timestamp"] < ring.covered_from:
+                continue
+            by_ticker.setdefault(price["ticker"], []).append(make_row(
+                price["id"], price["price"], price["timestamp"],
+                price.get("open"), price.get("high"), price.get("low"), price.get("samples"), price.get("source"),
+            ))
+        for ticker, rows in by_ticker.items():
+            self._rings[ticker].extend(np.array(rows, dtype=np.int64))
+            self._updated_at[ticker] = self.clock()
+        if self.daily is not None:
+            self.daily.add(prices)
+        
+        cutoff = self.cutoff()
+        for ring in self._rings.values():
+            ring.trim(cutoff)
+    
+    def stale(self, ticker: str) -> bool:
+        """
+        Давно ли окно тикера не обновлялось.
+        
+        Тики пишутся каждый интервал получения цен, поэтому окно без
+        уведомлений дольше max_staleness секунд могло пропустить записи
+        (например, процесс получения цен не может публиковать в Redis).
+        """
+        if self.max_staleness is None:
+            return False
+        updated_at = self._updated_at.get(ticker)
+        return updated_at is None or self.clock() - updated_at > self.max_staleness
+    
+    def current_day(self, ticker: str, day: int) -> Optional[RunningStats]:
+        """
+        Статистика текущих суток тикера из накопителя.
+        
+        Args:
+            ticker: Тикер
+            day: Начало текущих суток UTC
+        
+        Returns:
+            Статистика или None, если накопителя нет или окно тикера не актуально
+        """
+        if self.daily is None or not self.ready or self.stale(ticker):
+            return None
+        return self.daily.get(ticker, day)
+    
+    def covers(self, ticker: str, start_timestamp: Optional[int]) -> bool:
+        """Лежит ли диапазон, начинающийся в start_timestamp, целиком в актуальном окне тикера."""
+        ring = self._rings.get(ticker)
+        return (
+            self.ready
+            and ring is not None
+            and ring.covered_from is not None
+            and start_timestamp is not None
+            and start_timestamp >= ring.covered_from
+            and not self.stale(ticker)
+        )
+    
+    def query(
+        self,
+        ticker: str,
+        start_timestamp: Optional[int],
+        end_timestamp: Optional[int],
+        limit: Optional[int] = None,
+    ) -> Optional[List[PricePoint]]:
+        """
+        Получить цены тикера за диапазон из окна.
+        
+        Args:
+            ticker: Тикер
+            start_timestamp: Начало диапазона
+            end_timestamp: Конец диапазона включительно (опционально)
+            limit: Максимальное число самых новых строк (опционально)
+        
+        Returns:
+            Цены по убыванию времени, как из БД, или None, если диапазон не в окне
+        """
+        if not self.ready:
+            return None
+        hit = self.covers(ticker, start_timestamp)
+        record_cache_lookup("recent_store", hit)
+        if not hit:
+            return None
+        
+        rows = self._rings[ticker].select(start_timestamp, end_timestamp)
+        if limit is not None and len(rows) > limit:
+            rows = rows[len(rows) - limit:]
+        return [
+            PricePoint(
+                id=row[ID],
+                ticker=ticker,
+                price=from_scaled(row[PRICE]),
+                timestamp=row[TS],
+                open=from_scaled(row[OPEN]),
+                high=from_scaled(row[HIGH]),
+                low=from_scaled(row[LOW]),
+                samples=None if row[SAMPLES] == NULL else row[SAMPLES],
+                source=SOURCES[row[SOURCE]],
+            )
+            for row in rows[::-1].tolist()
+        ]
+    
+    async def seed(self, session_factory, tickers: Sequence[str]):
+        """
+        Загрузить окна тикеров из БД.
+        
+        Args:
+            session_factory: Фабрика сессий primary
+            tickers: Тикеры
+        """
+        since = self.cutoff()
+        async with session_factory() as session:
+            for ticker in tickers:
+                result = await session.execute(
+                    select(
+                        Price.timestamp, Price.id, Price.price, Price.open, Price.high, Price.low,
+                        Price.samples, Price.source,
+                    )
+                    .where(Price.ticker == ticker, Price.timestamp >= since)
+                    .order_by(Price.timestamp.asc(), Price.id.asc())
+                )
+                rows = result.all()
+                self.load(ticker, rows, since)
+                if self.daily is not None:
+                    self.daily.load(ticker, rows, since)
+        self.ready = True
+    
+    async def handle(self, data, session_factory):
+        """
+        Применить уведомление из канала PRICE_CHANNEL.
+        
+        Args:
+            data: Тело сообщения (JSON)
+            session_factory: Фабрика сессий для перезагрузки окна
+        """
+        message = json.loads(data)
+        if message.get("resync"):
+            # Публикующий процесс терял уведомления: все окна перечитываются из БД
+            await self.seed(session_factory, list(self._rings))
+        if "prices" in message:
+            self.add(message["prices"])
+        reload = message.get("reload")
+        if reload and reload["ticker"] in self._rings and reload["end"] >= self.cutoff():
+            # Догрузка без id записей: окно тикера перечитывается из БД
+            await self.seed(session_factory, [reload["ticker"]])
+        self.notify_written()
+    
+    def notify_written(self):
+        """Разбудить всех, кто ждет уведомления о записи цен."""
+        self.generation += 1
+        self._written.set()
+        self._written = asyncio.Event()
+    
+    async def wait_written(self, generation: int, timeout: float) -> bool:
+        """
+        Дождаться уведомления о записи цен.
+        
+        Args:
+            generation: Значение generation на момент последнего чтения из БД;
+                если уведомление уже пришло после него, ожидания нет
+            timeout: Максимальное ожидание, секунды
+        
+        Returns:
+            True, если уведомление пришло
+        """
+        if self.generation != generation:
+            return True
+        try:
+            await asyncio.wait_for(self._written.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+    
+    async def follow(self, session_factory, tickers: Sequence[str], retry_delay: float = 1.0):
+        """
+        Подписаться на уведомления и поддерживать окна актуальными (до отмены).
+        
+        Подписка устанавливается до загрузки окон, поэтому записи, сделанные
+        во время загрузки, приходят уведомлениями (повторы отбрасываются по id).
+        Раз в RECENT_STORE_RESYNC_SECONDS окна перечитываются из БД на случай
+        потерянных уведомлений. При ошибке Redis или БД запросы идут в БД до
+        переподключения.
+        
+        Args:
+            session_factory: Фабрика сессий primary
+            tickers: Тикеры
+            retry_delay: Пауза перед переподключением, секунды
+        """
+        while True:
+            redis = create_redis()
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(PRICE_CHANNEL)
+                await self.seed(session_factory, tickers)
+                synced_at = time.monotonic()
+                logger.info(f"Окно последних цен загружено: {', '.join(tickers)}")
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        await self.handle(message["data"], session_factory)
+                    if time.monotonic() - synced_at >= settings.recent_store_resync_seconds:
+                        await self.seed(session_factory, tickers)
+                        synced_at = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.ready = False
+                logger.warning(f"Окно последних цен недоступно, чтение идет из БД: {str(e)}")
+                await asyncio.sleep(retry_delay)
+            finally:
+                await pubsub.aclose()
+                await redis.aclose()
+
+
+def price_payload(price) -> dict:
+    """Поля записи цены для уведомления."""
+    return {
+        "id": price.id,
+        "ticker": price.ticker,
+        "price": str(price.price),
+        "timestamp": price.timestamp,
+        "open": None if price.open is None else str(price.open),
+        "high": None if price.high is None else str(price.high),
+        "low": None if price.low is None else str(price.low),
+        "samples": price.samples,
+        "source": price.source,
+    }
+
+
+# Последняя публикация этого процесса не удалась
+_publish_failed = False
+
+
+async def _publish(message: dict):
+    """
+    Опубликовать уведомление; недоступность Redis не мешает записи цен.
+    
+    Первое уведомление после неудачной публикации помечается "resync":
+    получатели перечитывают окна из БД, чтобы подобрать потерянные записи.
+    """
+    global _publish_failed
+    if not settings.recent_store_enabled:
+        return
+    if _publish_failed:
+        message = {**message, "resync": True}
+    try:
+        # Отдельный клиент: задачи Celery создают event loop на каждый запуск
+        async with create_redis() as redis:
+            await redis.publish(PRICE_CHANNEL, json.dumps(message))
+        _publish_failed = False
+    except (RedisError, OSError) as e:
+        _publish_failed = True
+        logger.warning(f"Не удалось опубликовать уведомление о записи цен: {str(e)}")
+
+
+async def publish_prices(prices: Sequence):
+    """
+    Уведомить API о записанных ценах.
+    
+    Args:
+        prices: Сохраненные записи Price (с id)
+    """
+    if prices:
+        await _publish({"prices": [price_payload(price) for price in prices]})
+
+
+async def publish_reload(ticker: str, start_timestamp: int, end_timestamp: int):
+    """
+    Уведомить API о массовой записи диапазона (догрузка без id записей).
+    
+    Диапазоны старше окна последних цен не публикуются.
+    
+    Args:
+        ticker: Тикер
+        start_timestamp: Начало записанного диапазона
+        end_timestamp: Конец записанного диапазона
+    """
+    if end_timestamp < time.time() - settings.recent_window_hours * 3600:
+        return
+    await _publish({"reload": {"ticker": ticker, "start": start_timestamp, "end": end_timestamp}})
+
+
+recent_prices = RecentPriceStore(
+    settings.recent_window_hours * 3600,
+    settings.recent_store_capacity,
+    max_staleness=settings.recent_store_max_staleness_seconds,
+    daily=CurrentDayStats(),
+)
@@ -0,0 +1,184 @@
+"""Примитивы отказоустойчивости для внешних вызовов: повторы, circuit breaker, учет задержек."""
+import time
+import random
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Callable, Optional
+
+
+@dataclass
+class ResilienceStats:
+    """Счетчики работы слоя отказоустойчивости."""
+    calls: int = 0
+    attempts: int = 0
+    successes: int = 0
+    failures: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    budget_exhausted: int = 0
+    circuit_rejections: int = 0
+    circuit_opened: int = 0
+    hedges_launched: int = 0
+    hedges_won: int = 0
+    
+    def as_dict(self) -> dict:
+        """Счетчики в виде словаря."""
+        return asdict(self)
+
+
+class RetryPolicy:
+    """Повторы с экспоненциальной задержкой и полным jitter в пределах бюджета времени."""
+    
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.1,
+        max_delay: float = 1.0,
+        budget: float = 5.0,
+        rng: Optional[random.Random] = None,
+    ):
+        """
+        Инициализация политики.
+        
+        Args:
+            max_attempts: Максимальное число попыток, включая первую
+            base_delay: Базовая задержка перед первым повтором, секунды
+            max_delay: Верхняя граница задержки, секунды
+            budget: Общий бюджет времени на вызов со всеми повторами, секунды
+            rng: Генератор случайных чисел (для детерминированных тестов)
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self._rng = rng or random.Random()
+    
+    def backoff(self, attempt: int) -> float:
+        """
+        Получить задержку перед повтором.
+        
+        Args:
+            attempt: Номер неудавшейся попытки, начиная с 0
+        
+        Returns:
+            Случайная задержка из [0, min(max_delay, base_delay * 2^attempt)]
+        """
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Circuit breaker: после серии ошибок отклоняет вызовы, пока не пройдет reset_timeout."""
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Инициализация.
+        
+        Args:
+            failure_threshold: Число ошибок подряд, после которого цепь размыкается
+            reset_timeout: Время в разомкнутом состоянии до пробного вызова, секунды
+            clock: Источник монотонного времени
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+    
+    def allow(self) -> bool:
+        """
+        Проверить, можно ли выполнить вызов.
+        
+        В полуоткрытом состоянии пропускается только один пробный вызов.
+        
+        Returns:
+            True, если вызов разрешен
+        """
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if self.clock() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+    
+    def record_success(self):
+        """Учесть успешный вызов: цепь замыкается."""
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+    
+    def record_failure(self) -> bool:
+        """
+        Учесть неудачный вызов.
+        
+        Returns:
+            True, если после этой ошибки цепь разомкнулась
+        """
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+            return True
+        return False
+
+
+class LatencyTracker:
+    """Скользящее окно последних задержек для оценки перцентилей."""
+    
+    def __init__(self, size: int = 200):
+        """
+        Инициализация.
+        
+        Args:
+            size: Число хранимых последних замеров
+        """
+        self._samples = deque(maxlen=size)
+    
+    def record(self, latency: float):
+        """Добавить замер задержки в секундах."""
+        self._samples.append(latency)
+    
+    def __len__(self) -> int:
+        return len(self._samples)
+    
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Получить перцентиль задержки.
+        
+        Args:
+            q: Перцентиль от 0 до 100
+        
+        Returns:
+            Значение перцентиля или None, если замеров нет
+        """
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+@dataclass
+class ResilienceState:
+    """Общее для клиентов одного сервиса состояние: circuit breaker, задержки и счетчики."""
+    breaker: CircuitBreaker
+    latency: LatencyTracker
+    stats: ResilienceStats
@@ -0,0 +1,433 @@
+"""Бинарные снимки таблицы prices для быстрого переноса между окружениями.
+
+Снимок - gzip файл: строка заголовка с JSON описанием (колонки, тикеры,
+диапазон) и поток в бинарном формате COPY PostgreSQL. На PostgreSQL поток
+пишет и читает сам сервер (COPY ... TO STDOUT / COPY ... FROM STDIN в
+формате binary) пачками, не собирая строки в Python. На остальных СУБД
+(SQLite) тот же формат кодируется и разбирается в Python, поэтому снимок,
+снятый с SQLite, восстанавливается в PostgreSQL, и наоборот.
+
+Восстановление заменяет строки области снимка. Полный снимок загружается
+в нежурналируемую промежуточную таблицу, на ней строятся индексы prices,
+после чего таблицы меняются местами одной короткой транзакцией; id строк
+сохраняются. Снимок части тикеров или диапазона удаляет строки этой области
+и вставляет строки снимка с новыми id.
+"""
+import re
+import gzip
+import json
+import time
+import struct
+import logging
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import AsyncIterator, BinaryIO, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.models import Price
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PRICES-SNAPSHOT"
+VERSION = 1
+# Сигнатура, флаги и длина расширения заголовка бинарного COPY
+COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+COPY_HEADER = COPY_SIGNATURE + struct.pack(">ii", 0, 0)
+COPY_TRAILER = struct.pack(">h", -1)
+
+# Колонки снимка и их типы в бинарном формате COPY
+COLUMNS = (
+    ("id", "int4"),
+    ("ticker", "text"),
+    ("price", "numeric"),
+    ("timestamp", "int8"),
+    ("open", "numeric"),
+    ("high", "numeric"),
+    ("low", "numeric"),
+    ("samples", "int4"),
+    ("source", "text"),
+)
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+
+STAGING_TABLE = "prices_restore"
+BLOCK_SIZE = 1 << 20
+
+NUMERIC_POSITIVE = 0x0000
+NUMERIC_NEGATIVE = 0x4000
+NUMERIC_NAN = 0xC000
+
+
+@dataclass
+class SnapshotScope:
+    """Область снимка: тикеры и диапазон [start, end)."""
+    tickers: Optional[List[str]] = None
+    start_timestamp: Optional[int] = None
+    end_timestamp: Optional[int] = None
+    
+    @property
+    def full(self) -> bool:
+        """Снимок всей таблицы."""
+        return not self.tickers and self.start_timestamp is None and self.end_timestamp is None
+    
+    def conditions(self) -> list:
+        """Условия SQLAlchemy для строк области."""
+        conditions = []
+        if self.tickers:
+            conditions.append(Price.ticker.in_(self.tickers))
+        if self.start_timestamp is not None:
+            conditions.append(Price.timestamp >= self.start_timestamp)
+        if self.end_timestamp is not None:
+            conditions.append(Price.timestamp < self.end_timestamp)
+        return conditions
+    
+    def where(self) -> Tuple[str, list]:
+        """Условие SQL с позиционными параметрами asyncpg."""
+        clauses, args = [], []
+        if self.tickers:
+            args.append(list(self.tickers))
+            clauses.append(f"ticker = ANY(${len(args)}::varchar[])")
+        if self.start_timestamp is not None:
+            args.append(self.start_timestamp)
+            clauses.append(f'"timestamp" >= ${len(args)}')
+        if self.end_timestamp is not None:
+            args.append(self.end_timestamp)
+            clauses.append(f'"timestamp" < ${len(args)}')
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+
+def encode_numeric(value: Decimal) -> bytes:
+    """
+    Закодировать Decimal в бинарный формат numeric PostgreSQL.
+    
+    Цифры хранятся по основанию 10000; weight - степень 10000 первой цифры,
+    dscale - число знаков после запятой.
+    """
+    if value.is_nan():
+        return struct.pack(">hhHH", 0, 0, NUMERIC_NAN, 0)
+    exponent = value.as_tuple().exponent
+    dscale = max(-exponent, 0)
+    integer, _, fraction = format(abs(value), "f").partition(".")
+    integer = integer.lstrip("0")
+    integer = integer.zfill(-(-len(integer) // 4) * 4)
+    fraction += "0" * (-len(fraction) % 4)
+    digits = [int(integer[i:i + 4]) for i in range(0, len(integer), 4)]
+    digits += [int(fraction[i:i + 4]) for i in range(0, len(fraction), 4)]
+    weight = len(integer) // 4 - 1
+    while digits and digits[0] == 0:
+        digits.pop(0)
+        weight -= 1
+    while digits and digits[-1] == 0:
+        digits.pop()
+    if not digits:
+        weight = 0
+    sign = NUMERIC_NEGATIVE if value.is_signed() and digits else NUMERIC_POSITIVE
+    return struct.pack(f">hhHH{len(digits)}H", len(digits), weight, sign, dscale, *digits)
+
+
+def decode_numeric(data: bytes) -> Decimal:
+    """Разобрать numeric PostgreSQL из бинарного формата."""
+    ndigits, weight, sign, dscale = struct.unpack_from(">hhHH", data)
+    if sign == NUMERIC_NAN:
+        return Decimal("NaN")
+    number = 0
+    for digit in struct.unpack_from(f">{ndigits}H", data, 8):
+        number = number * 10000 + digit
+    value = Decimal(number).scaleb(4 * (weight - ndigits + 1)).quantize(Decimal(1).scaleb(-dscale))
+    return -value if sign == NUMERIC_NEGATIVE else value
+
+
+ENCODERS = {
+    "int4": lambda value: struct.pack(">i", value),
+    "int8": lambda value: struct.pack(">q", value),
+    "text": lambda value: value.encode(),
+    "numeric": lambda value: encode_numeric(Decimal(value)),
+}
+DECODERS = {
+    "int4": lambda data: struct.unpack(">i", data)[0],
+    "int8": lambda data: struct.unpack(">q", data)[0],
+    "text": lambda data: data.decode(),
+    "numeric": decode_numeric,
+}
+
+
+def encode_row(row: Sequence) -> bytes:
+    """Закодировать строку (в порядке COLUMNS) в кортеж бинарного COPY."""
+    parts = [struct.pack(">h", len(COLUMNS))]
+    for (_, kind), value in zip(COLUMNS, row):
+        if value is None:
+            parts.append(struct.pack(">i", -1))
+        else:
+            data = ENCODERS[kind](value)
+            parts.append(struct.pack(">i", len(data)) + data)
+    return b"".join(parts)
+
+
+class CopyReader:
+    """Разбор потока бинарного COPY блоками."""
+    
+    def __init__(self, stream: BinaryIO, block_size: int = BLOCK_SIZE):
+        self._stream = stream
+        self._block_size = block_size
+        self._buffer = b""
+        self._offset = 0
+    
+    def _read(self, size: int) -> bytes:
+        while len(self._buffer) - self._offset < size:
+            block = self._stream.read(self._block_size)
+            if not block:
+                raise ValueError("Снимок обрезан")
+            self._buffer = self._buffer[self._offset:] + block
+            self._offset = 0
+        data = self._buffer[self._offset:self._offset + size]
+        self._offset += size
+        return data
+    
+    def rows(self) -> Iterator[tuple]:
+        """Строки снимка в порядке COLUMNS."""
+        if self._read(len(COPY_SIGNATURE)) != COPY_SIGNATURE:
+            raise ValueError("Поток снимка не в бинарном формате COPY")
+        _, extension = struct.unpack(">ii", self._read(8))
+        self._read(extension)
+        while True:
+            (fields,) = struct.unpack(">h", self._read(2))
+            if fields == -1:
+                return
+            if fields != len(COLUMNS):
+                raise ValueError(f"В строке снимка {fields} полей вместо {len(COLUMNS)}")
+            row = []
+            for _, kind in COLUMNS:
+                (length,) = struct.unpack(">i", self._read(4))
+                row.append(None if length == -1 else DECODERS[kind](self._read(length)))
+            yield tuple(row)
+
+
+def _write_header(output: BinaryIO, scope: SnapshotScope, dialect: str):
+    header = {
+        "version": VERSION,
+        "format": "pgcopy-binary",
+        "columns": COLUMN_NAMES,
+        "tickers": scope.tickers,
+        "start_timestamp": scope.start_timestamp,
+        "end_timestamp": scope.end_timestamp,
+        "dialect": dialect,
+        "created_at": int(time.time()),
+    }
+    output.write(MAGIC + b" " + json.dumps(header).encode() + b"\n")
+
+
+def read_header(stream: BinaryIO) -> dict:
+    """
+    Прочитать заголовок снимка.
+    
+    Args:
+        stream: Распакованный поток снимка
+    
+    Returns:
+        Заголовок; поток остается на начале данных COPY
+    """
+    line = stream.readline()
+    magic, _, payload = line.partition(b" ")
+    if magic != MAGIC:
+        raise ValueError("Файл не является снимком prices")
+    header = json.loads(payload)
+    if header.get("version") != VERSION or header.get("columns") != COLUMN_NAMES:
+        raise ValueError(f"Неподдерживаемая версия или колонки снимка: {header.get('version')}, {header.get('columns')}")
+    return header
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+async def dump(
+    engine: AsyncEngine,
+    path: str,
+    scope: SnapshotScope = None,
+    chunk_rows: int = 50000,
+    level: int = 6,
+) -> int:
+    """
+    Снять снимок prices в файл.
+    
+    Args:
+        engine: Engine БД
+        path: Путь файла снимка
+        scope: Тикеры и диапазон (по умолчанию вся таблица)
+        chunk_rows: Размер пачки строк при чтении не из PostgreSQL
+        level: Уровень gzip
+    
+    Returns:
+        Число строк в снимке
+    """
+    scope = scope or SnapshotScope()
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        dialect = conn.dialect.name
+        with gzip.open(path, "wb", compresslevel=level) as output:
+            _write_header(output, scope, dialect)
+            if dialect == "postgresql":
+                raw = (await conn.get_raw_connection()).driver_connection
+                where, args = scope.where()
+                
+                async def write(chunk: bytes):
+                    output.write(chunk)
+                
+                status = await raw.copy_from_query(
+                    f"SELECT {', '.join(_quote(name) for name in COLUMN_NAMES)} FROM prices{where}",
+                    *args,
+                    output=write,
+                    format="binary",
+                )
+                rows = int(status.split()[-1])
+            else:
+                rows = await _dump_rows(conn, output, scope, chunk_rows)
+    logger.info(f"Снимок {path}: {rows} строк за {time.perf_counter() - started:.1f} с")
+    return rows
+
+
+async def _dump_rows(conn, output: BinaryIO, scope: SnapshotScope, chunk_rows: int) -> int:
+    """Записать строки в формате COPY средствами Python с keyset пагинацией по id."""
+    columns = [getattr(Price, name) for name in COLUMN_NAMES]
+    output.write(COPY_HEADER)
+    rows = 0
+    last_id = None
+    while True:
+        query = select(*columns).where(*scope.conditions())
+        if last_id is not None:
+            query = query.where(Price.id > last_id)
+        chunk = (await conn.execute(query.order_by(Price.id).limit(chunk_rows))).all()
+        if not chunk:
+            break
+        output.write(b"".join(encode_row(row) for row in chunk))
+        rows += len(chunk)
+        last_id = chunk[-1].id
+        if len(chunk) < chunk_rows:
+            break
+    output.write(COPY_TRAILER)
+    return rows
+
+
+async def restore(engine: AsyncEngine, path: str, chunk_rows: int = 50000) -> int:
+    """
+    Восстановить prices из снимка, заменив строки области снимка.
+    
+    Args:
+        engine: Engine БД
+        path: Путь файла снимка
+        chunk_rows: Размер пачки вставки не в PostgreSQL
+    
+    Returns:
+        Число восстановленных строк
+    """
+    started = time.perf_counter()
+    with gzip.open(path, "rb") as stream:
+        header = read_header(stream)
+        scope = SnapshotScope(header["tickers"], header["start_timestamp"], header["end_timestamp"])
+        async with engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                raw = (await conn.get_raw_connection()).driver_connection
+                rows = await _restore_copy(raw, stream, scope)
+            else:
+                rows = await _restore_rows(conn, stream, scope, chunk_rows)
+    logger.info(f"Восстановлено из {path}: {rows} строк за {time.perf_counter() - started:.1f} с")
+    return rows
+
+
+async def _blocks(stream: BinaryIO) -> AsyncIterator[bytes]:
+    while True:
+        block = stream.read(BLOCK_SIZE)
+        if not block:
+            return
+        yield block
+
+
+async def _restore_copy(raw, stream: BinaryIO, scope: SnapshotScope) -> int:
+    """Загрузить снимок в промежуточную таблицу через COPY и перенести в prices."""
+    await raw.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+    # Без журнала и без индексов загрузка идет со скоростью записи файлов таблицы
+    await raw.execute(f"CREATE UNLOGGED TABLE {STAGING_TABLE} (LIKE prices INCLUDING DEFAULTS)")
+    try:
+        status = await raw.copy_to_table(STAGING_TABLE, source=_blocks(stream), columns=COLUMN_NAMES, format="binary")
+        rows = int(status.split()[-1])
+        if scope.full:
+            await _swap(raw)
+        else:
+            await _merge(raw, scope)
+    finally:
+        await raw.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+    return rows
+
+
+async def _swap(raw):
+    """Построить индексы prices на промежуточной таблице и заменить ею prices."""
+    constraints = await raw.fetch(
+        "SELECT conname AS name, pg_get_constraintdef(oid) AS definition FROM pg_constraint "
+        "WHERE conrelid = 'prices'::regclass AND contype IN ('p', 'u')"
+    )
+    indexes = await raw.fetch(
+        "SELECT c.relname AS name, pg_get_indexdef(i.indexrelid) AS definition "
+        "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = 'prices'::regclass "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)"
+    )
+    
+    # Таблица должна пережить сбой и попасть на реплики
+    await raw.execute(f"ALTER TABLE {STAGING_TABLE} SET LOGGED")
+    renames = []
+    for constraint in constraints:
+        temporary = constraint["name"][:54] + "_restore"
+        await raw.execute(
+            f"ALTER TABLE {STAGING_TABLE} ADD CONSTRAINT {_quote(temporary)} {constraint['definition']}"
+        )
+        renames.append(f"ALTER TABLE prices RENAME CONSTRAINT {_quote(temporary)} TO {_quote(constraint['name'])}")
+    for index in indexes:
+        temporary = index["name"][:54] + "_restore"
+        match = re.match(r"(CREATE (?:UNIQUE )?INDEX )\S+ ON \S+( .*)", index["definition"])
+        await raw.execute(f"{match[1]}{_quote(temporary)} ON {STAGING_TABLE}{match[2]}")
+        renames.append(f"ALTER INDEX {_quote(temporary)} RENAME TO {_quote(index['name'])}")
+    await raw.execute(f"ANALYZE {STAGING_TABLE}")
+    
+    async with raw.transaction():
+        await raw.execute("LOCK TABLE prices IN ACCESS EXCLUSIVE MODE")
+        # Последовательность id принадлежит колонке prices.id и удалилась бы вместе с таблицей
+        sequence = await raw.fetchval("SELECT pg_get_serial_sequence('prices', 'id')")
+        if sequence:
+            await raw.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+        await raw.execute("DROP TABLE prices")
+        await raw.execute(f"ALTER TABLE {STAGING_TABLE} RENAME TO prices")
+        for statement in renames:
+            await raw.execute(statement)
+        if sequence:
+            await raw.execute(f"ALTER SEQUENCE {sequence} OWNED BY prices.id")
+            await raw.execute(f"SELECT setval('{sequence}', COALESCE(MAX(id), 0) + 1, false) FROM prices")
+
+
+async def _merge(raw, scope: SnapshotScope):
+    """Заменить строки области снимка строками промежуточной таблицы."""
+    where, args = scope.where()
+    columns = ", ".join(_quote(name) for name in COLUMN_NAMES if name != "id")
+    async with raw.transaction():
+        await raw.execute(f"DELETE FROM prices{where}", *args)
+        await raw.execute(
+            f"INSERT INTO prices ({columns}) SELECT {columns} FROM {STAGING_TABLE} ORDER BY ticker, \"timestamp\", id"
+        )
+
+
+async def _restore_rows(conn, stream: BinaryIO, scope: SnapshotScope, chunk_rows: int) -> int:
+    """Разобрать снимок в Python и заменить строки области вставкой пачками в одной транзакции."""
+    names = COLUMN_NAMES if scope.full else COLUMN_NAMES[1:]
+    rows = 0
+    batch = []
+    async with conn.begin():
+        await conn.execute(delete(Price).where(*scope.conditions()))
+        for row in CopyReader(stream).rows():
+            values = dict(zip(COLUMN_NAMES, row))
+            batch.append({name: values[name] for name in names})
+            if len(batch) >= chunk_rows:
+                await conn.execute(insert(Price), batch)
+                rows += len(batch)
+                batch = []
+        if batch:
+            await conn.execute(insert(Price), batch)
+            rows += len(batch)
+    return rows
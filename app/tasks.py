@@ -3,10 +3,20 @@ import time
 import logging
 import asyncio
 from app.celery_app import celery_app
+from app.coordination import NONE, claim_tick, release_tick
 from app.services.deribit_client import DeribitClient
 from app.services.price_service import PriceService
+from app.services.backfill import Backfiller
+from app.services.daily_stats import DAY, day_start, refresh_days
+from app.services.export import Exporter
+from app.services.gap_detector import GapDetector
+from app.services.latency import record_tick_latencies
+from app.services.recent_store import publish_prices
 from app.schemas import PriceCreate
+from app import profiling
 from app.config import settings
+from app.database import install_query_timing
+from app.metrics import DB_WRITE_DURATION, TICK_DURATION, PRICE_GAPS_OPEN_MINUTES
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 
 logger = logging.getLogger(__name__)
@@ -23,6 +33,7 @@ def _create_db_session():
         echo=False,
         future=True,
     )
+    install_query_timing(engine)
     async_session = async_sessionmaker(
         engine,
         class_=AsyncSession,
@@ -33,28 +44,47 @@ def _create_db_session():
     return async_session, engine
 
 
-async def _fetch_and_save_price(ticker: str, currency: str):
+async def _fetch_and_save_price(ticker: str, currency: str, base_url: str = None, session_factory=None) -> bool:
     """
     Получить индексную цену валюты с биржи Deribit и сохранить в БД.
     
     Args:
         ticker: Тикер для сохранения (BTC или ETH)
         currency: Валюта для запроса к API (BTC or ETH)
+        base_url: URL API Deribit (по умолчанию из настроек)
+        session_factory: Фабрика сессий БД; по умолчанию создается engine в текущем event loop
+        
+    Returns:
+        True, если цена сохранена
     """
-    async with DeribitClient() as client:
+    async with DeribitClient(base_url=base_url) as client:
         try:
             # Получаем текущее время в формате UNIX timestamp ПЕРЕД запросом к API
             # Это гарантирует точный интервал ровно 60 секунд между записями
             timestamp = int(time.time())
+            tick_started = time.perf_counter()
             
-            # Получаем индексную цену с биржи Deribit
-            price = await client.get_index_price(currency)
+            # Получаем индексную цену с биржи Deribit вместе с отметками времени запроса
+            quote = await client.get_index_price_quote(currency)
+            price = quote.price
             
             logger.info(f"Получена цена {ticker}: {price} (timestamp: {timestamp})")
             
+            # Несколько экземпляров beat запускают задачу каждый по своему расписанию:
+            # цену тикера за минуту записывает только первый из них. Минута занимается
+            # после успешного запроса, чтобы ошибка Deribit не мешала записать ее другим
+            minute = timestamp - timestamp % 60
+            coordinated = settings.ingestion_coordination != NONE
+            if coordinated and not await claim_tick(ticker, minute):
+                logger.info(f"Цена {ticker} за минуту {minute} уже записана другим процессом")
+                return False
+            
             # Создаем engine и сессию БД в текущем event loop
             # Это важно для работы с Celery prefork pool
-            async_session, engine = _create_db_session()
+            if session_factory is not None:
+                async_session, engine = session_factory, None
+            else:
+                async_session, engine = _create_db_session()
             
             try:
                 async with async_session() as session:
@@ -64,43 +94,297 @@ async def _fetch_and_save_price(ticker: str, currency: str):
                         price=price,
                         timestamp=timestamp
                     )
-                    saved_price = await service.create_price(price_data)
+                    with DB_WRITE_DURATION.labels(operation="create_price").time():
+                        saved_price = await service.create_price(price_data)
+                    committed_at = time.time()
+                    TICK_DURATION.labels(ticker=ticker).observe(time.perf_counter() - tick_started)
+                    await publish_prices([saved_price])
+                    await record_tick_latencies(session, [saved_price], {ticker: quote}, committed_at)
                     logger.info(f"Сохранена цена {ticker} в БД: ID={saved_price.id}, цена={saved_price.price}, timestamp={saved_price.timestamp}")
+                    return True
+            except Exception:
+                # Запись не удалась: минуту может записать другой процесс
+                if coordinated:
+                    await release_tick(ticker, minute)
+                raise
             finally:
                 # Закрываем engine после использования
-                await engine.dispose()
+                if engine is not None:
+                    await engine.dispose()
         except Exception as e:
             # Логируем ошибку, но не прерываем выполнение задачи
             logger.error(f"Ошибка при получении цены для {ticker}: {str(e)}", exc_info=True)
+            return False
 
 
 @celery_app.task(name="app.tasks.fetch_prices")
-def fetch_prices():
+def fetch_prices(profile: bool = False):
     """
     Задача для получения индексных цен BTC_USD и ETH_USD с биржи Deribit.
     Выполняется каждую минуту через Celery Beat.
     
-    Получает текущие индексные цены (index price) для обеих валют
-    и сохраняет их в базу данных с тикером, ценой и UNIX timestamp.
+    Получает текущие индексные цены (index price) для всех валют из
+    TRACKED_TICKERS и сохраняет их в базу данных с тикером, ценой и UNIX timestamp.
+    
+    Args:
+        profile: Выполнить запуск под cProfile и сохранить профиль в PROFILING_DIR
     """
     import asyncio
     
-    logger.info("Запуск задачи получения цен BTC и ETH")
+    logger.info(f"Запуск задачи получения цен {', '.join(settings.tracked_tickers)}")
     
     # Создаем новый event loop для задачи
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     
-    try:
-        # Запускаем обе задачи параллельно (получение цен для BTC и ETH одновременно)
+    def run():
+        # Получаем цены всех отслеживаемых тикеров параллельно
         loop.run_until_complete(
-            asyncio.gather(
-                _fetch_and_save_price("BTC", "BTC"),
-                _fetch_and_save_price("ETH", "ETH")
-            )
+            asyncio.gather(*(
+                _fetch_and_save_price(ticker, ticker)
+                for ticker in settings.tracked_tickers
+            ))
         )
+    
+    try:
+        if profile:
+            with profiling.profiled() as profiler:
+                run()
+            path = profiling.save_profile(profiler, "fetch_prices")
+            logger.info(f"Профиль fetch_prices сохранен в {path}\n{profiling.format_stats(profiler, limit=20)}")
+        else:
+            run()
         logger.info("Задача получения цен успешно завершена")
     except Exception as e:
         logger.error(f"Ошибка при выполнении задачи получения цен: {str(e)}", exc_info=True)
     finally:
         loop.close()
+
+
+async def _backfill(ticker: str, start_timestamp: int, end_timestamp: int) -> dict:
+    """
+    Догрузить историю тикера за диапазон в текущем event loop.
+    
+    Args:
+        ticker: Тикер валюты (BTC или ETH)
+        start_timestamp: Начало диапазона, UNIX timestamp
+        end_timestamp: Конец диапазона (не включительно), UNIX timestamp
+        
+    Returns:
+        Итог догрузки в виде словаря
+    """
+    async_session, engine = _create_db_session()
+    try:
+        async with DeribitClient() as client:
+            result = await Backfiller(client, async_session).run(ticker, start_timestamp, end_timestamp)
+    finally:
+        await engine.dispose()
+    return {
+        "ticker": result.ticker,
+        "windows_total": result.windows_total,
+        "windows_skipped": result.windows_skipped,
+        "windows_done": result.windows_done,
+        "rows_written": result.rows_written,
+        "rate_limited": result.rate_limited,
+        "failed_windows": result.failed_windows,
+    }
+
+
+@celery_app.task(name="app.tasks.backfill_prices")
+def backfill_prices(ticker: str, start_timestamp: int, end_timestamp: int) -> dict:
+    """
+    Задача исторической догрузки цен тикера за диапазон.
+    
+    Окна, загруженные предыдущими запусками, пропускаются по чекпоинтам,
+    поэтому задачу можно безопасно перезапускать после сбоя.
+    
+    Args:
+        ticker: Тикер валюты (BTC или ETH)
+        start_timestamp: Начало диапазона, UNIX timestamp
+        end_timestamp: Конец диапазона (не включительно), UNIX timestamp
+        
+    Returns:
+        Итог догрузки
+    """
+    logger.info(f"Запуск догрузки {ticker} за [{start_timestamp}, {end_timestamp})")
+    
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    
+    try:
+        return loop.run_until_complete(_backfill(ticker, start_timestamp, end_timestamp))
+    finally:
+        loop.close()
+
+
+async def _repair_gaps(session_factory=None, base_url: str = None) -> dict:
+    """
+    Найти новые пропуски по всем тикерам и заполнить их через догрузку.
+    
+    Пропуск считается заполненным, только если догрузка записала строки;
+    иначе учитывается попытка, и пропуск остается в списке открытых.
+    
+    Args:
+        session_factory: Фабрика сессий БД; по умолчанию создается engine в текущем event loop
+        base_url: URL API Deribit (по умолчанию из настроек)
+    
+    Returns:
+        Количество найденных и заполненных пропусков по тикерам
+    """
+    if session_factory is not None:
+        async_session, engine = session_factory, None
+    else:
+        async_session, engine = _create_db_session()
+    summary = {}
+    try:
+        async with DeribitClient(base_url=base_url) as client:
+            backfiller = Backfiller(client, async_session)
+            for ticker in settings.tracked_tickers:
+                async with async_session() as session:
+                    detector = GapDetector(session)
+                    found = await detector.scan(ticker)
+                    gaps = await detector.get_repairable_gaps(ticker)
+                    
+                    repaired = 0
+                    for gap in gaps:
+                        gap.repair_attempts += 1
+                        try:
+                            result = await backfiller.run_range(ticker, gap.gap_start + 1, gap.gap_end)
+                            gap.filled_minutes = result.rows_written
+                            # Без записанных строк (нет данных у Deribit, ошибка окна) пропуск
+                            # остается открытым до исчерпания GAP_REPAIR_MAX_ATTEMPTS
+                            if result.rows_written:
+                                gap.repaired_at = int(time.time())
+                                repaired += 1
+                            else:
+                                logger.warning(
+                                    f"Пропуск {ticker} [{gap.gap_start}, {gap.gap_end}] не заполнен: "
+                                    f"догрузка не записала строк (попытка {gap.repair_attempts})"
+                                )
+                        except Exception as e:
+                            logger.error(
+                                f"Ошибка заполнения пропуска {ticker} [{gap.gap_start}, {gap.gap_end}]: {str(e)}",
+                                exc_info=True
+                            )
+                        await session.commit()
+                    
+                    summary[ticker] = {"found": len(found), "repaired": repaired, "pending": len(gaps) - repaired}
+                    open_gaps = await detector.get_gaps(ticker)
+                    PRICE_GAPS_OPEN_MINUTES.labels(ticker=ticker).set(sum(g.missing_minutes for g in open_gaps))
+                    logger.info(f"Пропуски {ticker}: найдено {len(found)}, заполнено {repaired} из {len(gaps)}")
+    finally:
+        if engine is not None:
+            await engine.dispose()
+    return summary
+
+
+@celery_app.task(name="app.tasks.repair_gaps")
+def repair_gaps() -> dict:
+    """
+    Задача поиска и заполнения пропусков в минутном ряду цен.
+    
+    Поиск инкрементальный: проверяются только тики после сохраненного
+    watermark. Найденные пропуски догружаются из свечей Deribit.
+    
+    Returns:
+        Количество найденных и заполненных пропусков по тикерам
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    
+    try:
+        return loop.run_until_complete(_repair_gaps())
+    finally:
+        loop.close()
+
+
+async def _finalize_daily_stats(start_timestamp: int, end_timestamp: int) -> dict:
+    """
+    Пересчитать дневную статистику всех тикеров за диапазон.
+    
+    Args:
+        start_timestamp: Начало диапазона, UNIX timestamp
+        end_timestamp: Конец диапазона (не включительно), UNIX timestamp
+    
+    Returns:
+        Число сохраненных суток по тикерам
+    """
+    async_session, engine = _create_db_session()
+    try:
+        return {
+            ticker: await refresh_days(async_session, ticker, start_timestamp, end_timestamp)
+            for ticker in settings.tracked_tickers
+        }
+    finally:
+        await engine.dispose()
+
+
+@celery_app.task(name="app.tasks.finalize_daily_stats")
+def finalize_daily_stats(start_timestamp: int = None, end_timestamp: int = None) -> dict:
+    """
+    Задача сохранения дневной статистики закрытых суток UTC.
+    
+    По расписанию запускается вскоре после полуночи UTC и пересчитывает
+    последние DAILY_STATS_LOOKBACK_DAYS закрытых суток, поэтому пропущенный
+    запуск восполняется следующим. С явным диапазоном заполняет историю.
+    
+    Args:
+        start_timestamp: Начало диапазона, UNIX timestamp (опционально)
+        end_timestamp: Конец диапазона (не включительно), UNIX timestamp (опционально)
+    
+    Returns:
+        Число сохраненных суток по тикерам
+    """
+    today = day_start(time.time())
+    if start_timestamp is None:
+        start_timestamp = today - settings.daily_stats_lookback_days * DAY
+    if end_timestamp is None:
+        end_timestamp = today
+    
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    
+    try:
+        return loop.run_until_complete(_finalize_daily_stats(start_timestamp, end_timestamp))
+    finally:
+        loop.close()
+
+
+async def _export(job_id: str) -> dict:
+    """
+    Выполнить задание выгрузки в текущем event loop.
+    
+    Args:
+        job_id: Идентификатор задания
+    
+    Returns:
+        Итог выгрузки в виде словаря
+    """
+    async_session, engine = _create_db_session()
+    try:
+        job = await Exporter(async_session).run(job_id)
+    finally:
+        await engine.dispose()
+    return {"id": job.id, "status": job.status, "rows_written": job.rows_written, "file_size": job.file_size}
+
+
+@celery_app.task(name="app.tasks.export_prices")
+def export_prices(job_id: str) -> dict:
+    """
+    Задача выгрузки цен в файл по заданию, созданному через API.
+    
+    Args:
+        job_id: Идентификатор задания
+    
+    Returns:
+        Статус, число строк и размер файла
+    """
+    logger.info(f"Запуск выгрузки {job_id}")
+    
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    
+    try:
+        return loop.run_until_complete(_export(job_id))
+    finally:
+        loop.close()
@@ -0,0 +1,109 @@
+"""Разбиение времени обработки HTTP запроса на фазы для заголовка Server-Timing.
+
+Фазы:
+    db        - суммарное время выполнения SQL (события курсора SQLAlchemy)
+    hydrate   - время чтения в сервисах за вычетом SQL: разбор строк и создание ORM объектов
+    serialize - остальное время обработчика маршрута: валидация ответа и JSON
+"""
+import time
+import functools
+from contextvars import ContextVar
+from typing import Dict, Optional
+from fastapi.routing import APIRoute
+
+
+class RequestTimings:
+    """Накопитель длительностей фаз одного запроса."""
+    
+    def __init__(self):
+        """Инициализация: время начала запроса фиксируется сразу."""
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+    
+    def add(self, name: str, seconds: float):
+        """Добавить длительность к фазе."""
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+    
+    def get(self, name: str) -> float:
+        """Получить накопленную длительность фазы в секундах."""
+        return self.phases.get(name, 0.0)
+    
+    def header(self) -> str:
+        """
+        Сформировать значение заголовка Server-Timing.
+        
+        Returns:
+            Строка вида "db;dur=1.20, hydrate;dur=0.35, serialize;dur=2.10, total;dur=4.00"
+            (длительности в миллисекундах)
+        """
+        durations = {"db": self.get("db")}
+        if "handler" in self.phases:
+            # Соединение из пула тоже берется до вызова endpoint, его время вычитаем отдельно
+            durations["hydrate"] = max(self.get("query") - self.get("db"), 0.0)
+            durations["serialize"] = max(self.get("handler") - self.get("query") - self.get("pool"), 0.0)
+        if "pool" in self.phases:
+            durations["pool"] = self.get("pool")
+        durations["total"] = time.perf_counter() - self.started
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in durations.items())
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> RequestTimings:
+    """
+    Начать учет фаз для текущего запроса.
+    
+    Returns:
+        Накопитель, доступный через контекст во всех вложенных задачах
+    """
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+def current() -> Optional[RequestTimings]:
+    """Накопитель текущего запроса или None вне HTTP запроса."""
+    return _current.get()
+
+
+def record(name: str, seconds: float):
+    """Добавить длительность к фазе текущего запроса; вне запроса ничего не делает."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+def timed_phase(name: str):
+    """
+    Декоратор корутины: учитывает время ее выполнения в фазе name.
+    
+    Args:
+        name: Имя фазы
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+class TimedRoute(APIRoute):
+    """Маршрут, учитывающий полное время обработчика (зависимости, endpoint, сериализация)."""
+    
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        
+        async def timed_handler(request):
+            started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                record("handler", time.perf_counter() - started)
+        
+        return timed_handler
@@ -0,0 +1,52 @@
+"""Скрипт для исторической догрузки цен с биржи Deribit."""
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from app.database import AsyncSessionLocal
+from app.services.backfill import Backfiller
+from app.services.deribit_client import DeribitClient
+
+
+def parse_date(value: str) -> int:
+    """Преобразовать дату DD-MM-YYYY (UTC) в UNIX timestamp."""
+    return int(datetime.strptime(value, "%d-%m-%Y").replace(tzinfo=timezone.utc).timestamp())
+
+
+async def backfill(tickers, start_timestamp, end_timestamp, window, concurrency, base_url, resume):
+    """Догрузить историю для списка тикеров."""
+    async with DeribitClient(base_url=base_url) as client:
+        backfiller = Backfiller(client, AsyncSessionLocal, window_seconds=window, concurrency=concurrency)
+        for ticker in tickers:
+            result = await backfiller.run(ticker, start_timestamp, end_timestamp, resume=resume)
+            print(
+                f"{ticker}: окон {result.windows_total}, пропущено {result.windows_skipped}, "
+                f"загружено {result.windows_done}, строк {result.rows_written}, "
+                f"ошибок {len(result.failed_windows)}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Историческая догрузка цен с Deribit")
+    parser.add_argument("--ticker", action="append", choices=["BTC", "ETH"], required=True,
+                        help="Тикер (можно указать несколько раз)")
+    parser.add_argument("--start", required=True, help="Начальная дата DD-MM-YYYY (UTC)")
+    parser.add_argument("--end", required=True, help="Конечная дата DD-MM-YYYY (UTC, не включительно)")
+    parser.add_argument("--window", type=int, default=None, help="Длина окна запроса в секундах")
+    parser.add_argument("--concurrency", type=int, default=None, help="Число одновременных запросов")
+    parser.add_argument("--base-url", default=None, help="URL API Deribit (например, фейкового сервера)")
+    parser.add_argument("--no-resume", action="store_true", help="Игнорировать сохраненные чекпоинты")
+    parser.add_argument("--celery", action="store_true", help="Поставить задачи в очередь Celery вместо локального запуска")
+    args = parser.parse_args()
+    
+    start_ts = parse_date(args.start)
+    end_ts = parse_date(args.end)
+    
+    if args.celery:
+        from app.tasks import backfill_prices
+        for ticker in args.ticker:
+            task = backfill_prices.delay(ticker, start_ts, end_ts)
+            print(f"{ticker}: задача {task.id} поставлена в очередь")
+    else:
+        asyncio.run(backfill(
+            args.ticker, start_ts, end_ts, args.window, args.concurrency, args.base_url, not args.no_resume
+        ))
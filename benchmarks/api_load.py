@@ -0,0 +1,305 @@
+"""Нагрузочный прогон API со смешанной нагрузкой и перцентилями задержки по endpoint'ам.
+
+По умолчанию приложение запускается в том же процессе (ASGI транспорт httpx)
+на SQLite с синтетическими данными. С --base-url нагрузка идет на внешний
+сервер (uvicorn с нужным числом воркеров), данные в его базе нужно загрузить
+заранее.
+
+Режимы:
+    --concurrency N   - закрытая модель: N клиентов, каждый отправляет следующий
+                        запрос сразу после ответа
+    --rate R          - открытая модель: R запросов в секунду (пуассоновский поток)
+                        независимо от ответов; задержка считается от запланированного
+                        момента отправки, поэтому очередь на стороне клиента не скрывает
+                        замедление сервера
+
+Запуск:
+    python -m benchmarks.api_load --concurrency 32 --duration 20
+    python -m benchmarks.api_load --rate 200 --mix last=70,filter=20,aligned=5,all=5
+    python -m benchmarks.api_load --base-url http://localhost:8000 --rate 500
+"""
+import os
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app.database import Base, get_read_db
+from app.main import app
+from benchmarks import common
+from benchmarks.datagen import DEFAULT_START, load_rows, make_tickers
+
+API_TICKERS = ["BTC", "ETH"]
+
+
+def build_workloads(rows_per_ticker: int, rng: random.Random) -> Dict[str, Callable[[], Tuple[str, str]]]:
+    """
+    Генераторы запросов смешанной нагрузки.
+    
+    Args:
+        rows_per_ticker: Число минут в загруженных рядах (для выбора дат)
+        rng: Генератор случайных чисел
+    
+    Returns:
+        Имя нагрузки -> функция, возвращающая (шаблон endpoint'а, URL)
+    """
+    days = max(rows_per_ticker // 1440, 1)
+    
+    def random_day() -> str:
+        return datetime.fromtimestamp(DEFAULT_START + rng.randrange(days) * 86400).strftime("%d-%m-%Y")
+    
+    def last():
+        return "GET /api/prices/last", f"/api/prices/last?ticker={rng.choice(API_TICKERS)}"
+    
+    def filter_day():
+        day = random_day()
+        return (
+            "GET /api/prices/filter",
+            f"/api/prices/filter?ticker={rng.choice(API_TICKERS)}&start_date={day}&end_date={day}",
+        )
+    
+    def aligned():
+        day = random_day()
+        return "GET /api/prices/aligned", f"/api/prices/aligned?tickers=BTC,ETH&start_date={day}&end_date={day}"
+    
+    def all_prices():
+        return "GET /api/prices", f"/api/prices?ticker={rng.choice(API_TICKERS)}"
+    
+    return {"last": last, "filter": filter_day, "aligned": aligned, "all": all_prices}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """
+    Разобрать состав нагрузки вида "last=80,filter=15,aligned=5".
+    
+    Returns:
+        Имя нагрузки -> вес
+    """
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class LoadRecorder:
+    """Накопитель результатов запросов по endpoint'ам."""
+    
+    def __init__(self):
+        """Инициализация."""
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+    
+    def record(self, endpoint: str, latency: float, ok: bool):
+        """Учесть завершенный запрос."""
+        self.latencies.setdefault(endpoint, []).append(latency)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+    
+    def report(self, elapsed: float) -> Dict[str, dict]:
+        """
+        Сводка по endpoint'ам и по всей нагрузке.
+        
+        Args:
+            elapsed: Длительность прогона в секундах
+        
+        Returns:
+            Шаблон endpoint'а (или "total") -> перцентили, пропускная способность и доля ошибок
+        """
+        report = {}
+        everything = []
+        for endpoint, latencies in sorted(self.latencies.items()):
+            everything.extend(latencies)
+            report[endpoint] = self._summary(latencies, self.errors.get(endpoint, 0), elapsed)
+        if everything:
+            report["total"] = self._summary(everything, sum(self.errors.values()), elapsed)
+        return report
+    
+    @staticmethod
+    def _summary(latencies: List[float], errors: int, elapsed: float) -> dict:
+        return {
+            **common.summarize(latencies),
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "errors": errors,
+            "error_rate": round(errors / len(latencies), 4),
+        }
+
+
+async def _send(client: httpx.AsyncClient, recorder: LoadRecorder, endpoint: str, url: str, scheduled: float):
+    """Отправить запрос и учесть задержку от момента scheduled."""
+    try:
+        response = await client.get(url)
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        ok = False
+    recorder.record(endpoint, time.perf_counter() - scheduled, ok)
+
+
+async def run_closed(client, recorder, next_request, concurrency: int, duration: float):
+    """Закрытая модель: concurrency клиентов отправляют запросы подряд до истечения duration."""
+    deadline = time.perf_counter() + duration
+    
+    async def worker():
+        while time.perf_counter() < deadline:
+            endpoint, url = next_request()
+            await _send(client, recorder, endpoint, url, time.perf_counter())
+    
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def run_open(client, recorder, next_request, rate: float, duration: float, rng: random.Random,
+                   max_in_flight: int = 10000):
+    """Открытая модель: пуассоновский поток запросов с интенсивностью rate в секунду."""
+    started = time.perf_counter()
+    scheduled = started
+    in_flight = set()
+    dropped = 0
+    while scheduled - started < duration:
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            dropped += 1
+        else:
+            endpoint, url = next_request()
+            task = asyncio.create_task(_send(client, recorder, endpoint, url, scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        scheduled += rng.expovariate(rate)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    return dropped
+
+
+async def run(
+    mix: Dict[str, float],
+    duration: float,
+    concurrency: Optional[int] = None,
+    rate: Optional[float] = None,
+    rows_per_ticker: int = 20160,
+    tickers: int = 10,
+    base_url: Optional[str] = None,
+    seed: int = 0,
+) -> dict:
+    """
+    Выполнить нагрузочный прогон.
+    
+    Args:
+        mix: Состав нагрузки: имя -> вес
+        duration: Длительность прогона в секундах
+        concurrency: Число клиентов закрытой модели
+        rate: Интенсивность открытой модели, запросов в секунду
+        rows_per_ticker: Минут на тикер в синтетических данных (без base_url)
+        tickers: Число тикеров в синтетических данных (без base_url)
+        base_url: URL внешнего сервера
+        seed: Seed выбора запросов
+    
+    Returns:
+        Сводка по endpoint'ам
+    """
+    rng = random.Random(seed)
+    workloads = build_workloads(rows_per_ticker, rng)
+    unknown = set(mix) - set(workloads)
+    if unknown:
+        raise ValueError(f"Unknown workloads: {', '.join(sorted(unknown))}")
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    
+    def next_request():
+        return workloads[rng.choices(names, weights)[0]]()
+    
+    engine = None
+    db_dir = None
+    if base_url is None:
+        # Конкурентные запросы берут разные соединения, поэтому SQLite - во временном файле
+        db_dir = tempfile.mkdtemp(prefix="api-load-")
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(db_dir, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await load_rows(engine, make_tickers(tickers), rows_per_ticker)
+        session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        
+        async def override_get_db():
+            async with session_factory() as session:
+                yield session
+        
+        app.dependency_overrides[get_read_db] = override_get_db
+        client = httpx.AsyncClient(app=app, base_url="http://load", timeout=60)
+    else:
+        limits = httpx.Limits(max_connections=concurrency or 1000)
+        client = httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits)
+    
+    recorder = LoadRecorder()
+    dropped = 0
+    try:
+        started = time.perf_counter()
+        if rate:
+            dropped = await run_open(client, recorder, next_request, rate, duration, rng)
+        else:
+            await run_closed(client, recorder, next_request, concurrency or 16, duration)
+        elapsed = time.perf_counter() - started
+    finally:
+        await client.aclose()
+        if engine is not None:
+            app.dependency_overrides.pop(get_read_db, None)
+            await engine.dispose()
+            shutil.rmtree(db_dir, ignore_errors=True)
+    
+    report = recorder.report(elapsed)
+    if dropped:
+        report.setdefault("total", {})["dropped"] = dropped
+    return report
+
+
+def main():
+    """Точка входа нагрузочного прогона API."""
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон API")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--concurrency", type=int, default=None, help="Число клиентов (закрытая модель)")
+    mode.add_argument("--rate", type=float, default=None, help="Запросов в секунду (открытая модель)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Длительность прогона, секунды")
+    parser.add_argument("--mix", default="last=70,filter=20,aligned=5,all=5",
+                        help="Состав нагрузки: last, filter, aligned, all с весами")
+    parser.add_argument("--rows", type=int, default=20160, help="Минут на тикер в синтетических данных")
+    parser.add_argument("--tickers", type=int, default=10, help="Число тикеров в синтетических данных")
+    parser.add_argument("--base-url", default=None, help="URL внешнего сервера вместо приложения в процессе")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Файл результатов JSON (по умолчанию benchmarks/results/)")
+    parser.add_argument("--compare", default=None, help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+    
+    mix = parse_mix(args.mix)
+    results = asyncio.run(run(
+        mix, args.duration, concurrency=args.concurrency, rate=args.rate,
+        rows_per_ticker=args.rows, tickers=args.tickers, base_url=args.base_url, seed=args.seed,
+    ))
+    
+    for endpoint, summary in results.items():
+        print(
+            f"{endpoint:<28} {summary['runs']:>7} запр.  {summary['throughput_rps']:>8.1f} rps  "
+            f"p50 {summary['median_ms']:>8.1f}  p95 {summary['p95_ms']:>8.1f}  p99 {summary['p99_ms']:>8.1f} ms  "
+            f"ошибок {summary['error_rate'] * 100:.2f}%"
+        )
+    
+    output = args.output or common.default_output("api_load")
+    common.write_results(output, {
+        "meta": common.metadata(
+            benchmark="api_load", mix=mix, duration=args.duration, concurrency=args.concurrency,
+            rate=args.rate, rows_per_ticker=args.rows, tickers=args.tickers,
+            target=args.base_url or "in-process",
+        ),
+        "results": results,
+    })
+    print(f"Результаты сохранены в {output}")
+    
+    if args.compare:
+        print(common.compare(args.compare, results) or "Нет общих замеров для сравнения")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Общие функции бенчмарков: статистика замеров и сохранение результатов в JSON."""
+import os
+import json
+import time
+import platform
+import subprocess
+from typing import Dict, Optional, Sequence
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def git_revision() -> str:
+    """Короткий хеш текущего коммита или "unknown" вне git."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """
+    Сводка по замерам длительности.
+    
+    Args:
+        samples: Длительности в секундах
+    
+    Returns:
+        min / median / p95 / p99 / max / mean в миллисекундах и число замеров
+    """
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "runs": int(values.size),
+        "min_ms": round(float(values.min()), 3),
+        "median_ms": round(float(np.median(values)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+        "mean_ms": round(float(values.mean()), 3),
+    }
+
+
+def metadata(**extra) -> dict:
+    """Описание окружения прогона для сравнения результатов между коммитами."""
+    return {
+        "revision": git_revision(),
+        "created_at": int(time.time()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        **extra,
+    }
+
+
+def default_output(name: str) -> str:
+    """Путь файла результатов по умолчанию: benchmarks/results/<name>-<коммит>.json."""
+    return os.path.join(RESULTS_DIR, f"{name}-{git_revision()}.json")
+
+
+def write_results(path: str, payload: dict):
+    """Сохранить результаты прогона в JSON."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+
+
+def compare(baseline_path: str, results: Dict[str, Dict[str, float]], metric: str = "median_ms") -> Optional[str]:
+    """
+    Сравнить результаты с сохраненным прогоном.
+    
+    Args:
+        baseline_path: Путь к JSON прошлого прогона
+        results: Текущие результаты: имя замера -> сводка
+        metric: Поле сводки для сравнения
+    
+    Returns:
+        Текстовая таблица изменений или None, если общих замеров нет
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    lines = []
+    for name, summary in results.items():
+        if name not in baseline or metric not in baseline[name] or metric not in summary:
+            continue
+        before = baseline[name][metric]
+        after = summary[metric]
+        change = (after - before) / before * 100 if before else 0.0
+        lines.append(f"{name:<55} {before:>10.3f} -> {after:>10.3f} ms  {change:+6.1f}%")
+    return "\n".join(lines) if lines else None
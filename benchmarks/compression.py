@@ -0,0 +1,190 @@
+"""Бенчмарк сжатия ответов: затраты CPU и экономия байт по кодировкам и уровням.
+
+Тело ответа - настоящий ответ GET /api/prices?ticker=BTC: по умолчанию
+приложение запускается в том же процессе на SQLite с синтетическими
+данными, с --base-url тело запрашивается у запущенного сервера.
+
+Каждая кодировка сжимает тело двумя способами: целиком (ответ известной
+длины) и фрагментами по --chunk-size со сбросом после каждого фрагмента
+(потоковый ответ). Время - процессорное время сжатия.
+
+Запуск:
+    python -m benchmarks.compression
+    python -m benchmarks.compression --rows 525600 --levels gzip=1,6,9 --levels zstd=1,3,9,19
+    python -m benchmarks.compression --base-url http://localhost:8000
+"""
+import time
+import asyncio
+import argparse
+from typing import Dict, List
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.compression import available_encoders
+from app.database import Base, get_read_db
+from app.main import app
+from benchmarks import common
+from benchmarks.datagen import load_rows
+from benchmarks.price_service import create_engine
+
+DEFAULT_LEVELS = {
+    "gzip": [1, 6, 9],
+    "br": [1, 4, 6, 11],
+    "zstd": [1, 3, 9, 19],
+}
+PAYLOAD_URL = "/api/prices?ticker=BTC"
+
+
+async def fetch_payload(rows: int, base_url: str = None) -> bytes:
+    """
+    Получить несжатое тело ответа /api/prices.
+    
+    Args:
+        rows: Число минут ряда BTC в синтетических данных (без base_url)
+        base_url: URL запущенного сервера
+    
+    Returns:
+        Тело ответа
+    """
+    headers = {"Accept-Encoding": "identity"}
+    if base_url is not None:
+        async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+            response = await client.get(PAYLOAD_URL, headers=headers)
+            response.raise_for_status()
+            return response.content
+    
+    engine = create_engine()
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await load_rows(engine, ["BTC"], rows)
+        session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        
+        async def override_get_db():
+            async with session_factory() as session:
+                yield session
+        
+        app.dependency_overrides[get_read_db] = override_get_db
+        async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=300) as client:
+            response = await client.get(PAYLOAD_URL, headers=headers)
+            response.raise_for_status()
+            return response.content
+    finally:
+        app.dependency_overrides.pop(get_read_db, None)
+        await engine.dispose()
+
+
+def compress(encoder_class, level: int, payload: bytes, chunk_size: int = None) -> int:
+    """
+    Сжать тело так же, как CompressionMiddleware.
+    
+    Args:
+        encoder_class: Класс потокового кодировщика
+        level: Уровень сжатия
+        payload: Тело
+        chunk_size: Размер фрагмента потокового ответа; None - тело целиком
+    
+    Returns:
+        Размер сжатого тела в байтах
+    """
+    encoder = encoder_class(level)
+    if chunk_size is None:
+        return len(encoder.compress(payload) + encoder.finish())
+    size = 0
+    for offset in range(0, len(payload), chunk_size):
+        size += len(encoder.compress(payload[offset:offset + chunk_size]) + encoder.flush())
+    return size + len(encoder.finish())
+
+
+def bench_level(encoder_class, level: int, payload: bytes, repeat: int, chunk_size: int = None) -> dict:
+    """
+    Замерить процессорное время и размер вывода для одного уровня.
+    
+    Returns:
+        Сводка времени, размер, степень сжатия и скорость в МБ/с процессорного времени
+    """
+    samples = []
+    size = 0
+    for _ in range(repeat):
+        started = time.process_time()
+        size = compress(encoder_class, level, payload, chunk_size)
+        samples.append(time.process_time() - started)
+    summary = common.summarize(samples)
+    return {
+        **summary,
+        "input_bytes": len(payload),
+        "output_bytes": size,
+        "ratio": round(len(payload) / size, 2),
+        "saved_bytes": len(payload) - size,
+        "cpu_mb_per_second": round(len(payload) / 1e6 / (summary["median_ms"] / 1000), 1) if summary["median_ms"] else None,
+    }
+
+
+def run(payload: bytes, levels: Dict[str, List[int]], repeat: int, chunk_size: int) -> Dict[str, dict]:
+    """
+    Выполнить бенчмарк по всем доступным кодировкам и уровням.
+    
+    Returns:
+        Сводки по именам вида "<кодировка>-<уровень>" и "<кодировка>-<уровень>-stream"
+    """
+    encoders = available_encoders()
+    results = {}
+    for encoding, encoding_levels in levels.items():
+        if encoding not in encoders:
+            print(f"{encoding}: пакет не установлен, пропускается")
+            continue
+        for level in encoding_levels:
+            for name, size in ((f"{encoding}-{level}", None), (f"{encoding}-{level}-stream", chunk_size)):
+                summary = bench_level(encoders[encoding], level, payload, repeat, size)
+                results[name] = summary
+                print(
+                    f"{name:<16} CPU {summary['median_ms']:>9.1f} ms  {summary['cpu_mb_per_second'] or 0:>7.1f} МБ/с  "
+                    f"{summary['output_bytes']:>11} байт  x{summary['ratio']:<6} сэкономлено {summary['saved_bytes']}"
+                )
+    return results
+
+
+def parse_levels(specs: List[str]) -> Dict[str, List[int]]:
+    """Разобрать аргументы вида "gzip=1,6,9"; без аргументов - уровни по умолчанию."""
+    if not specs:
+        return DEFAULT_LEVELS
+    levels = {}
+    for spec in specs:
+        encoding, _, values = spec.partition("=")
+        levels[encoding.strip()] = [int(value) for value in values.split(",")]
+    return levels
+
+
+def main():
+    """Точка входа бенчмарка сжатия."""
+    parser = argparse.ArgumentParser(description="Бенчмарк сжатия ответов")
+    parser.add_argument("--rows", type=int, default=100000, help="Минут ряда BTC в синтетических данных")
+    parser.add_argument("--base-url", default=None, help="URL запущенного сервера вместо приложения в процессе")
+    parser.add_argument("--levels", action="append", default=[],
+                        help="Кодировка и уровни, например gzip=1,6,9 (можно повторять)")
+    parser.add_argument("--repeat", type=int, default=3, help="Число замеров каждого уровня")
+    parser.add_argument("--chunk-size", type=int, default=65536, help="Размер фрагмента потокового ответа, байты")
+    parser.add_argument("--output", default=None, help="Файл результатов JSON (по умолчанию benchmarks/results/)")
+    parser.add_argument("--compare", default=None, help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+    
+    payload = asyncio.run(fetch_payload(args.rows, args.base_url))
+    print(f"Тело {PAYLOAD_URL}: {len(payload)} байт")
+    levels = parse_levels(args.levels)
+    results = run(payload, levels, args.repeat, args.chunk_size)
+    
+    output = args.output or common.default_output("compression")
+    common.write_results(output, {
+        "meta": common.metadata(
+            benchmark="compression", payload_bytes=len(payload), rows=args.rows, levels=levels,
+            chunk_size=args.chunk_size, repeat=args.repeat, target=args.base_url or "in-process",
+        ),
+        "results": results,
+    })
+    print(f"Результаты сохранены в {output}")
+    
+    if args.compare:
+        print(common.compare(args.compare, results) or "Нет общих замеров для сравнения")
+
+
+if __name__ == "__main__":
+    main()
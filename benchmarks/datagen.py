@@ -0,0 +1,120 @@
+"""Быстрый генератор синтетических минутных рядов и массовая загрузка в таблицу prices."""
+from decimal import Decimal
+from typing import Iterator, List, Sequence, Tuple
+import numpy as np
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.models import Price
+
+# Начало синтетической истории: 01-01-2024 00:00 UTC
+DEFAULT_START = 1704067200
+BASE_PRICES = {"BTC": 40000.0, "ETH": 2000.0}
+
+
+def make_tickers(count: int) -> List[str]:
+    """
+    Список тикеров: BTC и ETH (их принимает API) и синтетические T001, T002, ...
+    
+    Args:
+        count: Общее число тикеров, минимум 2
+    """
+    return ["BTC", "ETH"] + [f"T{i:03d}" for i in range(1, max(count, 2) - 1)]
+
+
+def generate_series(
+    ticker: str,
+    rows: int,
+    start: int = DEFAULT_START,
+    interval: int = 60,
+    seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Сгенерировать минутный ряд цен геометрическим случайным блужданием.
+    
+    Args:
+        ticker: Тикер (определяет базовую цену)
+        rows: Число точек
+        start: Время первой точки, UNIX timestamp
+        interval: Шаг ряда в секундах
+        seed: Зерно генератора
+    
+    Returns:
+        Пара массивов (timestamps int64, prices float64 с 2 знаками)
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = start + np.arange(rows, dtype=np.int64) * interval
+    log_returns = rng.normal(0.0, 0.0005, rows)
+    prices = np.round(BASE_PRICES.get(ticker, 100.0) * np.exp(np.cumsum(log_returns)), 2)
+    return timestamps, prices
+
+
+def generate_rows(
+    tickers: Sequence[str],
+    rows_per_ticker: int,
+    chunk_size: int = 100_000,
+    start: int = DEFAULT_START,
+) -> Iterator[List[tuple]]:
+    """
+    Сгенерировать строки для загрузки пачками.
+    
+    Args:
+        tickers: Тикеры
+        rows_per_ticker: Число минут на тикер
+        chunk_size: Размер пачки
+        start: Время первой точки, UNIX timestamp
+    
+    Yields:
+        Списки кортежей (ticker, price, timestamp)
+    """
+    for seed, ticker in enumerate(tickers):
+        timestamps, prices = generate_series(ticker, rows_per_ticker, start=start, seed=seed)
+        for offset in range(0, rows_per_ticker, chunk_size):
+            ts_chunk = timestamps[offset:offset + chunk_size].tolist()
+            price_chunk = prices[offset:offset + chunk_size].tolist()
+            yield [(ticker, price, ts) for price, ts in zip(price_chunk, ts_chunk)]
+
+
+async def load_rows(
+    engine: AsyncEngine,
+    tickers: Sequence[str],
+    rows_per_ticker: int,
+    chunk_size: int = 100_000,
+    start: int = DEFAULT_START,
+) -> int:
+    """
+    Очистить таблицу prices и загрузить синтетические ряды.
+    
+    На PostgreSQL строки пишутся через COPY, на остальных СУБД - executemany INSERT.
+    
+    Args:
+        engine: Engine тестовой базы (таблицы должны существовать)
+        tickers: Тикеры
+        rows_per_ticker: Число минут на тикер
+        chunk_size: Размер пачки
+        start: Время первой точки, UNIX timestamp
+    
+    Returns:
+        Число загруженных строк
+    """
+    total = 0
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DELETE FROM {Price.__tablename__}"))
+        postgres = conn.dialect.name == "postgresql"
+        for chunk in generate_rows(tickers, rows_per_ticker, chunk_size=chunk_size, start=start):
+            if postgres:
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    Price.__tablename__,
+                    # Бинарный COPY в numeric: Decimal из строки, без хвоста двоичной дроби
+                    records=[(t, Decimal(repr(p)), ts) for t, p, ts in chunk],
+                    columns=["ticker", "price", "timestamp"],
+                )
+            else:
+                await conn.execute(
+                    insert(Price),
+                    [{"ticker": t, "price": p, "timestamp": ts} for t, p, ts in chunk],
+                )
+            total += len(chunk)
+        if postgres:
+            await conn.execute(text(f"ANALYZE {Price.__tablename__}"))
+    return total
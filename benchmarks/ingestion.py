@@ -0,0 +1,245 @@
+"""Нагрузочный прогон получения цен против локального фейкового Deribit.
+
+Показывает, сколько индексов один процесс успевает получить и записать
+за интервал: для каждого числа тикеров путь получения цен запускается по
+выровненному расписанию, считаются пропущенные слоты (overrun), перцентили
+времени тика, пропускная способность и скорость записи в БД.
+
+Запуск:
+    python -m benchmarks.ingestion --tickers 2,10,50,100 --interval 1 --duration 10
+    python -m benchmarks.ingestion --path scheduler --latency lognormal:0.05,0.5 --error-rate 0.01
+    python -m benchmarks.ingestion --base-url http://localhost:8080/api/v2 --postgres-url postgresql://...
+
+Пути:
+    task      - как задача fetch_prices: отдельный клиент Deribit и запись одной
+                цены на тикер (engine на каждый вызов, как в задаче, не создается)
+
+Синтетические тикеры на время прогона добавляются в TRACKED_TICKERS.
+    scheduler - как app.scheduler: общий клиент и одна пачка записей на слот
+"""
+import os
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+from typing import Dict, List
+from aiohttp.test_utils import TestServer
+from prometheus_client import REGISTRY
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app.config import settings
+from app.database import Base
+from app.models import Price
+from app.scheduler import AlignedScheduler, ingest_slot
+from app.services.deribit_client import DeribitClient
+from app.tasks import _fetch_and_save_price
+from benchmarks import common
+from benchmarks.datagen import make_tickers
+from benchmarks.price_service import create_engine
+from tools.fake_deribit import FakeDeribit, latency_distribution
+
+WRITE_OPERATIONS = {"task": "create_price", "scheduler": "create_prices"}
+
+
+def _db_write_totals(operation: str) -> tuple:
+    """Текущие сумма и число замеров гистограммы db_write_duration_seconds."""
+    labels = {"operation": operation}
+    return (
+        REGISTRY.get_sample_value("db_write_duration_seconds_sum", labels) or 0.0,
+        REGISTRY.get_sample_value("db_write_duration_seconds_count", labels) or 0.0,
+    )
+
+
+async def run_level(
+    base_url: str,
+    session_factory,
+    tickers: List[str],
+    interval: float,
+    duration: float,
+    path: str,
+) -> Dict[str, object]:
+    """
+    Прогнать путь получения цен для набора тикеров.
+    
+    Args:
+        base_url: URL API Deribit (фейкового сервера)
+        session_factory: Фабрика сессий БД
+        tickers: Тикеры
+        interval: Интервал слотов в секундах
+        duration: Длительность прогона в секундах
+        path: "task" или "scheduler"
+    
+    Returns:
+        Результаты прогона
+    """
+    tick_latencies = []
+    saved = 0
+    write_sum_before, write_count_before = _db_write_totals(WRITE_OPERATIONS[path])
+    
+    async with session_factory() as session:
+        rows_before = await session.scalar(select(func.count()).select_from(Price))
+    
+    async with DeribitClient(base_url=base_url) as client:
+        async def callback(slot: float):
+            nonlocal saved
+            if path == "task":
+                results = await asyncio.gather(*(
+                    _fetch_and_save_price(ticker, ticker, base_url=base_url, session_factory=session_factory)
+                    for ticker in tickers
+                ))
+                saved += sum(results)
+            else:
+                saved += await ingest_slot(client, session_factory, slot, tickers)
+            tick_latencies.append(time.time() - slot)
+        
+        scheduler = AlignedScheduler(interval, callback)
+        stop = asyncio.Event()
+        asyncio.get_running_loop().call_later(duration, stop.set)
+        started = time.perf_counter()
+        await scheduler.run(stop)
+        elapsed = time.perf_counter() - started
+    
+    async with session_factory() as session:
+        rows_written = await session.scalar(select(func.count()).select_from(Price)) - rows_before
+    write_sum_after, write_count_after = _db_write_totals(WRITE_OPERATIONS[path])
+    write_count = write_count_after - write_count_before
+    
+    attempted = scheduler.stats.ticks * len(tickers)
+    latency = common.summarize(tick_latencies) if tick_latencies else {}
+    return {
+        "tickers": len(tickers),
+        "ticks": scheduler.stats.ticks,
+        "overruns": scheduler.stats.overruns,
+        "missed_slots": scheduler.stats.missed_slots,
+        "max_lag_ms": round(scheduler.stats.max_lag * 1000, 3),
+        "prices_saved": saved,
+        "prices_failed": attempted - saved,
+        "throughput_per_second": round(saved / elapsed, 2),
+        "tick_latency": latency,
+        "db_rows_per_second": round(rows_written / elapsed, 2),
+        "db_write_mean_ms": round((write_sum_after - write_sum_before) / write_count * 1000, 3) if write_count else None,
+        "sustainable": (
+            scheduler.stats.overruns == 0
+            and scheduler.stats.missed_slots == 0
+            and bool(latency)
+            and latency["p95_ms"] < interval * 1000
+        ),
+    }
+
+
+async def run(
+    ticker_counts: List[int],
+    interval: float,
+    duration: float,
+    path: str,
+    latency: str,
+    error_rate: float,
+    base_url: str = None,
+    postgres_url: str = None,
+) -> Dict[str, dict]:
+    """
+    Выполнить прогоны для всех чисел тикеров.
+    
+    Без base_url фейковый сервер запускается в том же процессе и делит с
+    прогоном event loop; для точных замеров запускайте его отдельно
+    (python -m tools.fake_deribit).
+    
+    Returns:
+        Результаты по именам вида "<путь>@<число тикеров>"
+    """
+    server = None
+    fake = None
+    if base_url is None:
+        fake = FakeDeribit(latency=latency_distribution(latency, seed=0), error_rate=error_rate, seed=0)
+        server = TestServer(fake.make_app())
+        await server.start_server()
+        base_url = str(server.make_url("/api/v2"))
+    
+    if postgres_url:
+        engine = create_engine(postgres_url)
+    else:
+        # Сессии тикеров пишут конкурентно: нужен пул соединений, а не одно соединение
+        # in-memory базы, поэтому SQLite - во временном файле
+        db_dir = tempfile.mkdtemp(prefix="ingestion-bench-")
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{os.path.join(db_dir, 'bench.db')}",
+            connect_args={"timeout": 30},
+        )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    results = {}
+    tracked_tickers = settings.tracked_tickers
+    try:
+        for count in ticker_counts:
+            tickers = make_tickers(count)
+            # Синтетические тикеры должны проходить валидацию PriceCreate, как в развертывании с TRACKED_TICKERS
+            settings.tracked_tickers = tickers
+            requests_before = fake.requests if fake else 0
+            errors_before = fake.errors if fake else 0
+            level = await run_level(base_url, session_factory, tickers, interval, duration, path)
+            if fake is not None:
+                level["fake_requests"] = fake.requests - requests_before
+                level["fake_errors"] = fake.errors - errors_before
+            results[f"{path}@{count}"] = level
+            print(
+                f"{path}@{count:<6} тиков {level['ticks']:>4}  overrun {level['overruns']:>3}  "
+                f"пропущено {level['missed_slots']:>3}  p95 {level['tick_latency'].get('p95_ms', 0):>9.1f} ms  "
+                f"{level['throughput_per_second']:>9.1f} цен/с  БД {level['db_rows_per_second']:>9.1f} строк/с  "
+                f"{'OK' if level['sustainable'] else 'НЕ УСПЕВАЕТ'}"
+            )
+    finally:
+        settings.tracked_tickers = tracked_tickers
+        await engine.dispose()
+        if server is not None:
+            await server.close()
+        if not postgres_url:
+            shutil.rmtree(db_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    """Точка входа нагрузочного прогона."""
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон получения цен")
+    parser.add_argument("--tickers", default="2,10,50,100", help="Числа тикеров через запятую")
+    parser.add_argument("--interval", type=float, default=1.0, help="Интервал слотов в секундах")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность прогона одного числа тикеров, секунды")
+    parser.add_argument("--path", choices=["task", "scheduler"], default="task", help="Путь получения цен")
+    parser.add_argument("--latency", default="lognormal:0.02,0.5",
+                        help="Задержка фейкового сервера: 0.05, uniform:a,b, lognormal:median,sigma, exp:mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов HTTP 500")
+    parser.add_argument("--base-url", default=None, help="URL внешнего фейкового сервера (по умолчанию встроенный)")
+    parser.add_argument("--postgres-url", default=None, help="URL отдельной базы PostgreSQL вместо SQLite в памяти")
+    parser.add_argument("--output", default=None, help="Файл результатов JSON (по умолчанию benchmarks/results/)")
+    parser.add_argument("--compare", default=None, help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+    # Overrun и ошибки учитываются в результатах, построчные предупреждения не нужны
+    logging.getLogger("app").setLevel(logging.ERROR)
+    
+    ticker_counts = [int(count) for count in args.tickers.split(",")]
+    results = asyncio.run(run(
+        ticker_counts, args.interval, args.duration, args.path, args.latency, args.error_rate,
+        base_url=args.base_url, postgres_url=args.postgres_url,
+    ))
+    
+    output = args.output or common.default_output(f"ingestion-{args.path}")
+    common.write_results(output, {
+        "meta": common.metadata(
+            benchmark="ingestion", path=args.path, interval=args.interval, duration=args.duration,
+            latency=args.latency, error_rate=args.error_rate,
+            backend="postgresql" if args.postgres_url else "sqlite",
+        ),
+        "results": results,
+    })
+    print(f"Результаты сохранены в {output}")
+    
+    if args.compare:
+        flat = {name: level["tick_latency"] for name, level in results.items()}
+        print(common.compare(args.compare, flat) or "Нет общих замеров для сравнения")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Скрипт для снятия и восстановления бинарных снимков таблицы prices."""
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from app.database import engine
+from app.services.snapshot import SnapshotScope, dump, restore
+
+
+def parse_date(value: str) -> int:
+    """Преобразовать дату DD-MM-YYYY (UTC) в UNIX timestamp."""
+    return int(datetime.strptime(value, "%d-%m-%Y").replace(tzinfo=timezone.utc).timestamp())
+
+
+async def run(args):
+    """Выполнить команду и закрыть engine."""
+    try:
+        if args.command == "dump":
+            scope = SnapshotScope(
+                tickers=args.ticker,
+                start_timestamp=parse_date(args.start) if args.start else None,
+                end_timestamp=parse_date(args.end) if args.end else None,
+            )
+            rows = await dump(engine, args.path, scope, level=args.level)
+            print(f"Снимок {args.path}: {rows} строк")
+        else:
+            rows = await restore(engine, args.path)
+            print(f"Восстановлено из {args.path}: {rows} строк")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бинарные снимки таблицы prices")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    dump_parser = commands.add_parser("dump", help="Снять снимок prices в файл")
+    dump_parser.add_argument("path", help="Файл снимка, например prices.snapshot.gz")
+    dump_parser.add_argument("--ticker", action="append", choices=["BTC", "ETH"],
+                             help="Тикер (можно указать несколько раз; по умолчанию все)")
+    dump_parser.add_argument("--start", default=None, help="Начальная дата DD-MM-YYYY (UTC)")
+    dump_parser.add_argument("--end", default=None, help="Конечная дата DD-MM-YYYY (UTC, не включительно)")
+    dump_parser.add_argument("--level", type=int, default=6, help="Уровень gzip (1 - быстрее, 9 - меньше)")
+    
+    restore_parser = commands.add_parser(
+        "restore", help="Заменить строки области снимка (для полного снимка - всю таблицу)"
+    )
+    restore_parser.add_argument("path", help="Файл снимка")
+    
+    asyncio.run(run(parser.parse_args()))
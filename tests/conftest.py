@@ -3,9 +3,11 @@ import pytest
 import asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import StaticPool
-from app.database import Base, get_db
+from app.database import Base, get_db, get_read_db, install_query_timing
 from app.main import app
 from httpx import AsyncClient
+from aiohttp.test_utils import TestServer
+from tools.fake_deribit import FakeDeribit
 
 
 @pytest.fixture(scope="session")
@@ -24,6 +26,7 @@ async def test_db():
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
+    install_query_timing(engine)
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -49,8 +52,26 @@ async def client(test_db):
         yield test_db
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     
     async with AsyncClient(app=app, base_url="http://test") as ac:
         yield ac
     
     app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def session_factory(test_db):
+    """Фабрика сессий, работающая с той же тестовой базой, что и test_db."""
+    return async_sessionmaker(test_db.bind, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def fake_deribit():
+    """Запустить локальный фейковый сервер Deribit."""
+    fake = FakeDeribit()
+    server = TestServer(fake.make_app())
+    await server.start_server()
+    fake.base_url = str(server.make_url("/api/v2"))
+    yield fake
+    await server.close()
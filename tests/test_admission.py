@@ -0,0 +1,189 @@
+"""Тесты для контроля допуска и ограничения размера результата."""
+import asyncio
+import pytest
+from decimal import Decimal
+from httpx import AsyncClient
+from redis.exceptions import ConnectionError as RedisConnectionError
+from starlette.responses import StreamingResponse
+from app import admission
+from app.admission import AdmissionLimiter, AdmissionMiddleware, AdmissionRejected, RateLimiter
+from app.config import settings
+from app.schemas import PriceCreate
+from app.services.price_service import PriceService
+
+
+class FakeRedis:
+    """Минимальный Redis в памяти: incr и expire."""
+    
+    def __init__(self, fail: bool = False):
+        self.values = {}
+        self.fail = fail
+    
+    async def incr(self, key):
+        if self.fail:
+            raise RedisConnectionError("connection refused")
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+    
+    async def expire(self, key, seconds):
+        return True
+
+
+def test_route_class():
+    """Тест: классы маршрутов по пути запроса."""
+    assert admission.route_class("/api/prices/last") == "cheap"
+    assert admission.route_class("/api/prices/gaps") == "cheap"
+    assert admission.route_class("/api/prices/exports/abc/download") == "cheap"
+    assert admission.route_class("/api/prices/latency") == "cheap"
+    assert admission.route_class("/api/prices/stats/daily") == "cheap"
+    assert admission.route_class("/api/prices/sync") == "sync"
+    assert admission.route_class("/api/prices") == "heavy"
+    assert admission.route_class("/api/prices/filter") == "heavy"
+    assert admission.route_class("/metrics") is None
+    assert admission.route_class("/api/pricesx") is None
+
+
+@pytest.mark.asyncio
+async def test_limiter_queue_and_timeout():
+    """Тест: при занятых слотах запрос ждет в очереди, сверх очереди - сразу отклоняется."""
+    limiter = AdmissionLimiter("heavy", limit=1, queue_size=1, queue_timeout=0.05)
+    release = asyncio.Event()
+    
+    async def hold():
+        async with limiter.admit():
+            await release.wait()
+    
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    assert limiter.in_flight == 1
+    
+    waiter = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    assert limiter.waiting == 1
+    
+    with pytest.raises(AdmissionRejected) as rejected:
+        async with limiter.admit():
+            pass
+    assert rejected.value.reason == "queue_full"
+    
+    with pytest.raises(AdmissionRejected) as rejected:
+        await waiter
+    assert rejected.value.reason == "queue_timeout"
+    
+    release.set()
+    await holder
+    assert limiter.in_flight == 0 and limiter.waiting == 0
+    async with limiter.admit():
+        assert limiter.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_window():
+    """Тест: лимит клиента в фиксированном окне, счетчики клиентов и классов раздельны."""
+    limiter = RateLimiter(FakeRedis(), {"heavy": 2, "cheap": 0}, window=60)
+    
+    results = [await limiter.check("1.2.3.4", "heavy", now=120.0) for _ in range(3)]
+    assert [allowed for allowed, _ in results] == [True, True, False]
+    assert results[-1][1] == 60
+    
+    assert (await limiter.check("5.6.7.8", "heavy", now=130.0))[0]
+    assert (await limiter.check("1.2.3.4", "heavy", now=180.0))[0]
+    for _ in range(10):
+        assert (await limiter.check("1.2.3.4", "cheap", now=120.0))[0]
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_fails_open():
+    """Тест: при недоступном Redis запросы пропускаются, Redis временно не опрашивается."""
+    redis = FakeRedis(fail=True)
+    limiter = RateLimiter(redis, {"heavy": 1}, failure_cooldown=60)
+    
+    assert (await limiter.check("1.2.3.4", "heavy"))[0]
+    redis.fail = False
+    assert (await limiter.check("1.2.3.4", "heavy"))[0]
+    assert (await limiter.check("1.2.3.4", "heavy"))[0]
+    assert redis.values == {}
+
+
+@pytest.mark.asyncio
+async def test_heavy_saturation_keeps_cheap_routes(client, monkeypatch):
+    """Тест: при занятом классе heavy тяжелые запросы получают 503, дешевые обслуживаются."""
+    monkeypatch.setattr(admission, "_rate_limiter", RateLimiter(FakeRedis(), {}))
+    monkeypatch.setitem(admission._limiters, "heavy", AdmissionLimiter("heavy", limit=0, queue_size=0, queue_timeout=0))
+    
+    response = await client.get("/api/prices?ticker=BTC")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(settings.admission_retry_after)
+    
+    response = await client.get("/api/prices/last?ticker=BTC")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_streamed_body_holds_slot(monkeypatch):
+    """Тест: слот занят, пока тело потокового ответа не отправлено целиком."""
+    monkeypatch.setattr(admission, "_rate_limiter", RateLimiter(FakeRedis(), {}))
+    limiter = AdmissionLimiter("cheap", limit=1, queue_size=0, queue_timeout=0)
+    monkeypatch.setitem(admission._limiters, "cheap", limiter)
+    in_flight = []
+    
+    async def chunks():
+        for chunk in (b"a", b"b", b"c"):
+            in_flight.append(limiter.in_flight)
+            await asyncio.sleep(0)
+            yield chunk
+    
+    async def app(scope, receive, send):
+        async def traced_send(message):
+            if message["type"] == "http.response.body":
+                in_flight.append(limiter.in_flight)
+            await send(message)
+        await StreamingResponse(chunks())(scope, receive, traced_send)
+    
+    async with AsyncClient(app=AdmissionMiddleware(app), base_url="http://test") as ac:
+        response = await ac.get("/api/prices/exports/job/download")
+        assert response.content == b"abc"
+        # Пока тело отправляется, второй запрос того же класса не допускается
+        assert in_flight and set(in_flight) == {1}
+        assert limiter.in_flight == 0
+        
+        async def busy():
+            yield b"x"
+            response = await ac.get("/api/prices/exports/job/download")
+            yield str(response.status_code).encode()
+        
+        async def busy_app(scope, receive, send):
+            await StreamingResponse(busy())(scope, receive, send)
+        
+        async with AsyncClient(app=AdmissionMiddleware(busy_app), base_url="http://test") as inner:
+            assert (await inner.get("/api/prices/exports/job/download")).content == b"x503"
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_client(client, monkeypatch):
+    """Тест: клиент сверх лимита получает 429 с Retry-After."""
+    monkeypatch.setattr(admission, "_rate_limiter", RateLimiter(FakeRedis(), {"heavy": 1}))
+    
+    assert (await client.get("/api/prices?ticker=BTC")).status_code == 200
+    response = await client.get("/api/prices?ticker=BTC")
+    
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["retry-after"]) <= 60
+
+
+@pytest.mark.asyncio
+async def test_result_size_guard(client, test_db, monkeypatch):
+    """Тест: выборка больше MAX_RESULT_ROWS отклоняется с 400."""
+    monkeypatch.setattr(admission, "_rate_limiter", RateLimiter(FakeRedis(), {}))
+    monkeypatch.setattr(settings, "max_result_rows", 2)
+    await PriceService(test_db).create_prices([
+        PriceCreate(ticker="BTC", price=Decimal("50000"), timestamp=1700000000 + i * 60) for i in range(3)
+    ])
+    
+    for url in ("/api/prices?ticker=BTC", "/api/prices/filter?ticker=BTC", "/api/prices/aligned?tickers=BTC,ETH"):
+        response = await client.get(url)
+        assert response.status_code == 400, url
+        assert "Narrow the date range" in response.json()["detail"]
+    
+    monkeypatch.setattr(settings, "max_result_rows", 3)
+    assert (await client.get("/api/prices?ticker=BTC")).json()["total"] == 3
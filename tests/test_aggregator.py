@@ -0,0 +1,58 @@
+"""Тесты для агрегации замеров в минутные свечи."""
+import pytest
+from decimal import Decimal
+from app.scheduler import sample_slot
+from app.services.aggregator import MinuteAggregator
+from app.services.deribit_client import DeribitClient
+from app.services.price_service import PriceService
+
+MINUTE = 1704067200  # 01-01-2024 00:00 UTC
+
+
+def test_bar_tracks_ohlc_and_samples():
+    """Тест накопления OHLC и числа замеров."""
+    aggregator = MinuteAggregator()
+    for offset, price in [(0, "10"), (5, "12"), (10, "9"), (15, "11")]:
+        assert aggregator.add("BTC", MINUTE + offset, Decimal(price)) == []
+    
+    closed = aggregator.add("BTC", MINUTE + 60, Decimal("13"))
+    
+    assert len(closed) == 1
+    bar = closed[0]
+    assert (bar.minute, bar.open, bar.high, bar.low, bar.close, bar.samples) == (
+        MINUTE, Decimal("10"), Decimal("12"), Decimal("9"), Decimal("11"), 4
+    )
+    row = bar.to_price_create()
+    assert row.price == Decimal("11") and row.timestamp == MINUTE
+
+
+def test_close_until_and_late_samples():
+    """Тест закрытия свечей по времени и отбрасывания опоздавших замеров."""
+    aggregator = MinuteAggregator()
+    aggregator.add("BTC", MINUTE + 1, Decimal("1"))
+    aggregator.add("ETH", MINUTE + 2, Decimal("2"))
+    
+    assert aggregator.close_until(MINUTE + 59) == []
+    closed = aggregator.close_until(MINUTE + 60)
+    
+    assert sorted(bar.ticker for bar in closed) == ["BTC", "ETH"]
+    assert aggregator.add("BTC", MINUTE + 58, Decimal("3")) == []
+    assert aggregator.pending() == []
+
+
+@pytest.mark.asyncio
+async def test_sample_slot_writes_one_row_per_minute(fake_deribit, session_factory, test_db):
+    """Тест: много замеров за минуту дают одну строку с OHLC."""
+    aggregator = MinuteAggregator()
+    async with DeribitClient(base_url=fake_deribit.base_url) as client:
+        for offset in range(0, 65, 5):
+            await sample_slot(client, aggregator, session_factory, MINUTE + offset, ["BTC"])
+    
+    prices = await PriceService(test_db).get_prices_by_ticker("BTC")
+    
+    assert len(prices) == 1
+    row = prices[0]
+    assert row.timestamp == MINUTE
+    assert row.samples == 12
+    assert row.low <= row.open <= row.high
+    assert row.low <= row.price <= row.high
@@ -0,0 +1,78 @@
+"""Тесты для векторных вычислений над рядами цен."""
+import numpy as np
+from app.services.analytics import (
+    build_grid,
+    align_to_grid,
+    log_returns,
+    rolling_correlation,
+    to_optional_list,
+)
+
+
+def test_build_grid_aligns_to_minutes():
+    """Тест построения минутной сетки."""
+    grid = build_grid(1000, 1250)
+    
+    assert grid.tolist() == [960, 1020, 1080, 1140, 1200]
+
+
+def test_align_to_grid_forward_fill_small_gaps():
+    """Тест заполнения небольших пропусков предыдущим значением."""
+    grid = build_grid(0, 600)
+    # Тики в минутах 0, 1 и 9; пропуск 2..8 длиннее max_gap
+    timestamps = [5, 61, 545]
+    values = [1.0, 2.0, 3.0]
+    
+    aligned = align_to_grid(timestamps, values, grid, max_gap=2)
+    
+    assert aligned[:4].tolist() == [1.0, 2.0, 2.0, 2.0]
+    assert np.isnan(aligned[4:9]).all()
+    assert aligned[9] == 3.0
+    assert aligned[10] == 3.0
+
+
+def test_align_to_grid_leading_nan():
+    """Тест пустых точек до первого наблюдения."""
+    grid = build_grid(0, 180)
+    
+    aligned = align_to_grid([130], [10.0], grid, max_gap=5)
+    
+    assert np.isnan(aligned[:2]).all()
+    assert aligned[2:].tolist() == [10.0, 10.0]
+
+
+def test_rolling_correlation_matches_numpy():
+    """Тест совпадения скользящей корреляции с np.corrcoef по каждому окну."""
+    rng = np.random.default_rng(42)
+    x = rng.normal(size=200)
+    y = 0.5 * x + rng.normal(size=200)
+    window = 20
+    
+    corr = rolling_correlation(x, y, window)
+    
+    assert np.isnan(corr[:window - 1]).all()
+    for end in (window, 77, 200):
+        expected = np.corrcoef(x[end - window:end], y[end - window:end])[0, 1]
+        assert np.isclose(corr[end - 1], expected)
+
+
+def test_rolling_correlation_nan_window():
+    """Тест: окно с пропуском дает NaN."""
+    x = np.arange(10, dtype=float)
+    y = np.arange(10, dtype=float) * 2
+    x[5] = np.nan
+    
+    corr = rolling_correlation(x, y, 3)
+    
+    assert np.isnan(corr[5:8]).all()
+    assert np.isclose(corr[4], 1.0)
+    assert np.isclose(corr[8], 1.0)
+
+
+def test_log_returns_and_optional_list():
+    """Тест доходностей и преобразования NaN в None."""
+    returns = log_returns(np.array([1.0, np.e, np.nan]))
+    
+    assert to_optional_list(returns)[0] is None
+    assert np.isclose(returns[1], 1.0)
+    assert to_optional_list(returns)[2] is None
@@ -97,3 +97,41 @@ async def test_get_prices_by_date_invalid_format(client):
     )
     
     assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_aligned_prices(client, test_db):
+    """Тест получения выровненных рядов и статистик пары."""
+    service = PriceService(test_db)
+    
+    base_ts = 1704110400  # начало минуты
+    for i in range(5):
+        await service.create_price(PriceCreate(
+            ticker="BTC", price=Decimal(40000 + i * 10), timestamp=base_ts + i * 60 + 3
+        ))
+    # У ETH пропущена минута 2
+    for i in (0, 1, 3, 4):
+        await service.create_price(PriceCreate(
+            ticker="ETH", price=Decimal(2000 + i), timestamp=base_ts + i * 60 + 7
+        ))
+    
+    response = await client.get("/api/prices/aligned?tickers=BTC_USD,ETH&window=3&max_gap=1")
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["tickers"] == ["BTC", "ETH"]
+    assert data["timestamps"] == [base_ts + i * 60 for i in range(5)]
+    assert data["values"][1] == [2000.0, 2001.0, 2001.0, 2003.0, 2004.0]
+    pair = data["pairs"][0]
+    assert pair["base"] == "BTC" and pair["quote"] == "ETH"
+    assert pair["spread"][0] == 38000.0
+    assert pair["ratio"][0] == 20.0
+    assert pair["rolling_correlation"][:3] == [None, None, None]
+
+
+@pytest.mark.asyncio
+async def test_get_aligned_prices_requires_two_tickers(client):
+    """Тест валидации списка тикеров."""
+    response = await client.get("/api/prices/aligned?tickers=BTC,BTC_USD")
+    
+    assert response.status_code == 400
@@ -0,0 +1,86 @@
+"""Тесты для исторической догрузки цен."""
+import pytest
+from decimal import Decimal
+from sqlalchemy import select, func
+from app.models import Price, BackfillCheckpoint
+from app.schemas import PriceCreate
+from app.services.backfill import Backfiller, split_windows
+from app.services.deribit_client import DeribitClient
+from app.services.price_service import PriceService
+
+START = 1704067200  # 01-01-2024 00:00 UTC
+
+
+def test_split_windows_aligned():
+    """Тест разбиения диапазона на выровненные окна."""
+    windows = split_windows(START + 100, START + 7200, 3600)
+    
+    assert windows == [(START, START + 3600), (START + 3600, START + 7200)]
+
+
+@pytest.mark.asyncio
+async def test_get_chart_data(fake_deribit):
+    """Тест получения свечей с фейкового сервера."""
+    async with DeribitClient(base_url=fake_deribit.base_url) as client:
+        candles = await client.get_chart_data("BTC-PERPETUAL", START, START + 299)
+    
+    assert [ts for ts, _ in candles] == [START + i * 60 for i in range(5)]
+    assert all(isinstance(price, Decimal) for _, price in candles)
+
+
+@pytest.mark.asyncio
+async def test_backfill_writes_rows_and_resumes(fake_deribit, session_factory, test_db):
+    """Тест догрузки окнами и пропуска загруженных окон при повторном запуске."""
+    async with DeribitClient(base_url=fake_deribit.base_url) as client:
+        backfiller = Backfiller(client, session_factory, window_seconds=3600, concurrency=2)
+        result = await backfiller.run("BTC", START, START + 3 * 3600)
+        
+        assert result.windows_done == 3
+        assert result.rows_written == 180
+        
+        again = await backfiller.run("BTC", START, START + 4 * 3600)
+    
+    assert again.windows_skipped == 3
+    assert again.windows_done == 1
+    assert len(fake_deribit.chart_requests) == 4
+    
+    count = await test_db.scalar(select(func.count()).select_from(Price).where(Price.ticker == "BTC"))
+    checkpoints = await test_db.scalar(select(func.count()).select_from(BackfillCheckpoint))
+    assert count == 240
+    assert checkpoints == 4
+
+
+@pytest.mark.asyncio
+async def test_backfill_retries_on_rate_limit(fake_deribit, session_factory):
+    """Тест повторов окна после ответа too_many_requests."""
+    fake_deribit.rate_limit_every = 2
+    
+    async with DeribitClient(base_url=fake_deribit.base_url) as client:
+        backfiller = Backfiller(
+            client, session_factory, window_seconds=3600, concurrency=1, rate_limit_backoff=0.01
+        )
+        result = await backfiller.run("ETH", START, START + 4 * 3600)
+    
+    assert result.rate_limited > 0
+    assert result.windows_done == 4
+    assert result.failed_windows == []
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_skips_existing_minutes(test_db):
+    """Тест: массовая вставка не дублирует минуты, в которых уже есть тик."""
+    service = PriceService(test_db)
+    await service.create_price(PriceCreate(ticker="BTC", price=Decimal("1"), timestamp=START + 65))
+    
+    written = await service.bulk_insert_prices(
+        "BTC", [(START, Decimal("2")), (START + 60, Decimal("3")), (START + 120, Decimal("4"))]
+    )
+    
+    assert written == 2
+    prices = await service.get_prices_by_ticker("BTC")
+    assert sorted(p.timestamp for p in prices) == [START, START + 65, START + 120]
+    
+    # Строки догрузки помечены и исключаются из рядов аналитики по запросу
+    assert {p.timestamp: p.source for p in prices} == {START: "backfill", START + 65: None, START + 120: "backfill"}
+    assert (await service.get_series("BTC", include_backfill=False))[0] == [START + 65]
+    assert (await service.get_series("BTC"))[0] == [START, START + 65, START + 120]
@@ -0,0 +1,128 @@
+"""Тесты для генератора данных, бенчмарка PriceService и нагрузочных прогонов."""
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+from app.config import settings
+from app.models import Price
+from app.compression import available_encoders
+from benchmarks import api_load, common, compression
+from benchmarks.api_load import LoadRecorder, parse_mix
+from benchmarks.ingestion import run_level
+from benchmarks.datagen import DEFAULT_START, generate_series, load_rows, make_tickers
+from benchmarks.price_service import bench_size
+from tools.fake_deribit import latency_distribution
+
+
+def test_generate_series_deterministic():
+    """Тест: ряд детерминирован по зерну, шаг - минута, цены положительны."""
+    timestamps, prices = generate_series("BTC", 1000, seed=1)
+    again_ts, again_prices = generate_series("BTC", 1000, seed=1)
+    
+    assert timestamps[0] == DEFAULT_START
+    assert np.all(np.diff(timestamps) == 60)
+    assert np.all(prices > 0)
+    assert np.array_equal(prices, again_prices)
+    assert make_tickers(4) == ["BTC", "ETH", "T001", "T002"]
+
+
+@pytest.mark.asyncio
+async def test_load_rows_replaces_table(test_db):
+    """Тест: загрузка очищает таблицу и пишет все строки пачками."""
+    engine = test_db.bind
+    await load_rows(engine, ["BTC", "ETH"], 500, chunk_size=128)
+    loaded = await load_rows(engine, ["BTC", "ETH", "T001"], 300, chunk_size=128)
+    
+    assert loaded == 900
+    assert await test_db.scalar(select(func.count()).select_from(Price)) == 900
+
+
+@pytest.mark.asyncio
+async def test_bench_size_smoke(test_db):
+    """Тест: бенчмарк одного размера замеряет все операции."""
+    results = await bench_size(test_db.bind, 3000, make_tickers(2), repeat=2)
+    
+    assert results["load@3000"]["rows"] == 3000
+    assert results["get_last_price@3000"]["runs"] == 2
+    assert "GET /api/prices/aligned_1d@3000" in results
+    assert all(summary["median_ms"] >= 0 for summary in results.values())
+
+
+def test_compare(tmp_path):
+    """Тест: сравнение с прошлым прогоном по медиане."""
+    path = tmp_path / "baseline.json"
+    common.write_results(str(path), {"meta": {}, "results": {"op@10": {"median_ms": 10.0}}})
+    
+    report = common.compare(str(path), {"op@10": {"median_ms": 15.0}, "new@10": {"median_ms": 1.0}})
+    
+    assert "op@10" in report and "+50.0%" in report
+    assert "new@10" not in report
+
+
+def test_latency_distribution():
+    """Тест: разбор описаний распределения задержки фейкового сервера."""
+    assert latency_distribution("0.05") == 0.05
+    
+    uniform = latency_distribution("uniform:0.01,0.02", seed=1)
+    assert all(0.01 <= uniform() <= 0.02 for _ in range(100))
+    
+    lognormal = latency_distribution("lognormal:0.05,0.5", seed=1)
+    samples = sorted(lognormal() for _ in range(1001))
+    assert 0.04 < samples[500] < 0.06
+    
+    with pytest.raises(ValueError):
+        latency_distribution("pareto:1")
+
+
+@pytest.mark.asyncio
+async def test_ingestion_run_level(fake_deribit, session_factory, monkeypatch):
+    """Тест: прогон пути планировщика на фейковом сервере считает тики и записи."""
+    tickers = make_tickers(3)
+    monkeypatch.setattr(settings, "tracked_tickers", tickers)
+    
+    level = await run_level(fake_deribit.base_url, session_factory, tickers, interval=0.2, duration=0.7, path="scheduler")
+    
+    assert level["ticks"] >= 2
+    assert level["prices_saved"] == level["ticks"] * 3
+    assert level["prices_failed"] == 0
+    assert level["db_rows_per_second"] > 0
+    assert level["tick_latency"]["runs"] == level["ticks"]
+
+
+def test_load_recorder_report():
+    """Тест: сводка нагрузочного прогона по endpoint'ам и в целом."""
+    recorder = LoadRecorder()
+    for latency in (0.01, 0.02, 0.03):
+        recorder.record("GET /a", latency, ok=True)
+    recorder.record("GET /b", 0.1, ok=False)
+    
+    report = recorder.report(elapsed=2.0)
+    
+    assert report["GET /a"]["runs"] == 3
+    assert report["GET /a"]["median_ms"] == 20.0
+    assert report["GET /b"]["error_rate"] == 1.0
+    assert report["total"]["throughput_rps"] == 2.0
+    assert report["total"]["errors"] == 1
+    assert parse_mix("last=80,filter=20") == {"last": 80.0, "filter": 20.0}
+
+
+@pytest.mark.asyncio
+async def test_api_load_closed_smoke():
+    """Тест: короткий прогон закрытой модели по приложению в процессе."""
+    report = await api_load.run({"last": 1, "filter": 1}, duration=0.3, concurrency=2, rows_per_ticker=1440, tickers=2)
+    
+    assert "GET /api/prices/last" in report
+    assert report["total"]["errors"] == 0
+    assert report["total"]["runs"] > 0
+
+
+def test_compression_bench_level():
+    """Тест: бенчмарк сжатия считает размер вывода так же, как middleware."""
+    payload = b'{"ticker":"BTC","price":"50000.00000000","timestamp":1700000000},' * 2000
+    encoders = available_encoders()
+    
+    results = compression.run(payload, {"gzip": [1, 6], "nope": [1]}, repeat=1, chunk_size=4096)
+    
+    assert set(results) == {"gzip-1", "gzip-1-stream", "gzip-6", "gzip-6-stream"}
+    assert results["gzip-6"]["output_bytes"] == compression.compress(encoders["gzip"], 6, payload)
+    assert results["gzip-6"]["ratio"] > 10
+    assert results["gzip-6-stream"]["output_bytes"] >= results["gzip-6"]["output_bytes"]
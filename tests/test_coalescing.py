@@ -0,0 +1,106 @@
+"""Тесты для объединения одновременных одинаковых запросов."""
+import asyncio
+import pytest
+from decimal import Decimal
+from prometheus_client import REGISTRY
+from app.coalescing import SingleFlight
+from app.schemas import PriceCreate
+from app.services.price_service import PriceService
+
+
+def _lookups(name: str, result: str) -> float:
+    labels = {"cache": f"singleflight_{name}", "result": result}
+    return REGISTRY.get_sample_value("cache_lookups_total", labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_result():
+    """Тест: одновременные вызовы с одним ключом выполняют func один раз."""
+    flight = SingleFlight("test_share")
+    calls = []
+    
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return b"result"
+    
+    results = await asyncio.gather(*(flight.do("BTC", load) for _ in range(10)))
+    
+    assert results == [b"result"] * 10
+    assert len(calls) == 1
+    assert flight.in_flight == 0
+    assert _lookups("test_share", "hit") == 9
+    assert _lookups("test_share", "miss") == 1
+    
+    # Результат не кэшируется: следующий вызов снова выполняет func
+    await flight.do("BTC", load)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_different_keys_and_errors():
+    """Тест: разные ключи выполняются отдельно, исключение получают все ожидающие."""
+    flight = SingleFlight("test_errors")
+    
+    async def load(value):
+        await asyncio.sleep(0.01)
+        if value == "bad":
+            raise ValueError("boom")
+        return value
+    
+    results = await asyncio.gather(
+        flight.do("a", lambda: load("a")),
+        flight.do("b", lambda: load("b")),
+        flight.do("bad", lambda: load("bad")),
+        flight.do("bad", lambda: load("bad")),
+        return_exceptions=True,
+    )
+    
+    assert results[:2] == ["a", "b"]
+    assert all(isinstance(result, ValueError) for result in results[2:])
+    assert flight.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_fail_followers():
+    """Тест: при отмене начавшего вызов запроса ожидающий выполняет вызов сам."""
+    flight = SingleFlight("test_cancel")
+    calls = []
+    
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+    
+    leader = asyncio.create_task(flight.do("BTC", load))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("BTC", load))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    
+    assert await follower == 2
+    assert leader.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_api_coalesces_identical_requests(client, test_db, monkeypatch):
+    """Тест: одновременные запросы /last выполняют один запрос к БД и возвращают одинаковый ответ."""
+    await PriceService(test_db).create_price(PriceCreate(ticker="BTC", price=Decimal("50000.5"), timestamp=1700000000))
+    calls = []
+    original = PriceService.get_last_price
+    
+    async def slow_last_price(self, ticker):
+        calls.append(ticker)
+        await asyncio.sleep(0.05)
+        return await original(self, ticker)
+    
+    monkeypatch.setattr(PriceService, "get_last_price", slow_last_price)
+    responses = await asyncio.gather(
+        *(client.get("/api/prices/last?ticker=BTC") for _ in range(5)),
+        client.get("/api/prices/last?ticker=BTC_USD"),
+    )
+    
+    assert [response.status_code for response in responses] == [200] * 6
+    assert len({response.content for response in responses}) == 1
+    assert responses[0].json() == {"ticker": "BTC", "price": "50000.50000000", "timestamp": 1700000000}
+    assert calls == ["BTC"]
@@ -0,0 +1,120 @@
+"""Тесты для сжатия ответов."""
+import zlib
+import asyncio
+import pytest
+from decimal import Decimal
+from prometheus_client import REGISTRY
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+from app.compression import CompressionMiddleware, GzipEncoder, available_encoders, negotiate
+from app.schemas import PriceCreate
+from app.services.price_service import PriceService
+
+
+def _decompressor(encoding: str):
+    """Потоковый распаковщик для проверки: функция распаковки очередного фрагмента."""
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress
+    if encoding == "br":
+        brotli = pytest.importorskip("brotli")
+        return brotli.Decompressor().process
+    zstandard = pytest.importorskip("zstandard")
+    return zstandard.ZstdDecompressor().decompressobj().decompress
+
+
+def test_negotiate():
+    """Тест: выбор кодировки по q и предпочтению сервера."""
+    supported = ["zstd", "br", "gzip"]
+    assert negotiate("gzip, deflate", supported) == "gzip"
+    assert negotiate("gzip, br, zstd", supported) == "zstd"
+    assert negotiate("gzip;q=1.0, br;q=0.5", supported) == "gzip"
+    assert negotiate("br;q=0, gzip;q=0.1", supported) == "gzip"
+    assert negotiate("*", supported) == "zstd"
+    assert negotiate("*;q=0.5, zstd;q=0", supported) == "br"
+    assert negotiate("identity", supported) is None
+    assert negotiate("", supported) is None
+
+
+async def _collect(app, accept_encoding: str):
+    """Выполнить GET / и собрать сообщения ASGI ответа."""
+    messages = []
+    requested = []
+    
+    async def receive():
+        if requested:
+            # Клиент не отключается: StreamingResponse ждет disconnect до конца ответа
+            await asyncio.Event().wait()
+        requested.append(True)
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        messages.append(message)
+    
+    scope = {
+        "type": "http", "method": "GET", "path": "/", "raw_path": b"/", "query_string": b"",
+        "headers": [(b"accept-encoding", accept_encoding.encode())], "http_version": "1.1",
+        "scheme": "http", "server": ("test", 80), "client": ("127.0.0.1", 1), "root_path": "",
+    }
+    await app(scope, receive, send)
+    return messages
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+async def test_streaming_chunks_are_flushed(encoding):
+    """Тест: каждый фрагмент потокового ответа можно распаковать сразу после получения."""
+    if encoding not in available_encoders():
+        pytest.skip(f"{encoding} is not installed")
+    chunks = [b'{"prices":[' + b'{"ticker":"BTC","price":"50000.00000000"},' * 200, b"{}]}"]
+    
+    async def stream(request):
+        async def body():
+            for chunk in chunks:
+                yield chunk
+        return StreamingResponse(body(), media_type="application/json")
+    
+    app = CompressionMiddleware(Starlette(routes=[Route("/", stream)]), minimum_size=100)
+    messages = await _collect(app, encoding)
+    
+    headers = dict(messages[0]["headers"])
+    assert headers[b"content-encoding"] == encoding.encode()
+    assert b"content-length" not in headers
+    assert b"accept-encoding" in headers[b"vary"].lower()
+    
+    decompress = _decompressor(encoding)
+    bodies = [m["body"] for m in messages[1:] if m["body"]]
+    assert decompress(bodies[0]) == chunks[0]
+    assert b"".join(decompress(body) for body in bodies[1:]) == chunks[1]
+    assert len(bodies[0]) < len(chunks[0]) / 10
+
+
+@pytest.mark.asyncio
+async def test_large_response_is_compressed(client, test_db):
+    """Тест: полная выгрузка сжимается, короткий ответ /last - нет."""
+    await PriceService(test_db).create_prices([
+        PriceCreate(ticker="BTC", price=Decimal("50000") + i, timestamp=1700000000 + i * 60) for i in range(200)
+    ])
+    
+    size_labels = {"method": "GET", "route": "/api/prices"}
+    size_before = REGISTRY.get_sample_value("http_response_size_bytes_sum", size_labels) or 0.0
+    response = await client.get("/api/prices?ticker=BTC", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    # Сжатие - внешний слой: метрика размера учитывает несжатое тело
+    assert REGISTRY.get_sample_value("http_response_size_bytes_sum", size_labels) - size_before == len(response.content)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.num_bytes_downloaded < len(response.content) / 5
+    assert response.json()["total"] == 200
+    
+    response = await client.get("/api/prices/last?ticker=BTC", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    
+    response = await client.get("/api/prices?ticker=BTC", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+
+def test_gzip_encoder_output_is_standard():
+    """Тест: вывод кодировщика gzip читается стандартной распаковкой."""
+    encoder = GzipEncoder(6)
+    data = encoder.compress(b"a" * 1000) + encoder.flush() + encoder.compress(b"b" * 10) + encoder.finish()
+    assert zlib.decompress(data, 16 + zlib.MAX_WBITS) == b"a" * 1000 + b"b" * 10
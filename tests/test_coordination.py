@@ -0,0 +1,218 @@
+"""Тесты для координации нескольких процессов получения цен."""
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy import select
+from app import coordination
+from app.coordination import HashRing, IngestionCoordinator, LeaderLease
+from app.models import Price
+from app.scheduler import ingest_slot
+from app.services.deribit_client import DeribitClient
+from app.services.price_service import PriceService
+
+SLOT = 1704067260
+TICKERS = [f"T{i}" for i in range(200)]
+
+
+class FakeRedis:
+    """Минимальный Redis в памяти: строки со сроком, скрипты аренды и sorted set."""
+    
+    def __init__(self):
+        self.now = 1000.0
+        self.values = {}
+        self.expires = {}
+        self.sets = {}
+        self.fail = False
+    
+    def _check(self):
+        if self.fail:
+            raise RedisConnectionError("connection refused")
+    
+    def _get(self, key):
+        if key in self.expires and self.expires[key] <= self.now:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return self.values.get(key)
+    
+    async def set(self, key, value, nx=False, px=None, ex=None):
+        self._check()
+        if nx and self._get(key) is not None:
+            return None
+        self.values[key] = value
+        if px is not None or ex is not None:
+            self.expires[key] = self.now + (px / 1000 if px is not None else ex)
+        return True
+    
+    async def eval(self, script, numkeys, key, node, *args):
+        self._check()
+        if self._get(key) != node:
+            return 0
+        if script == coordination.RENEW_SCRIPT:
+            self.expires[key] = self.now + int(args[0]) / 1000
+        else:
+            del self.values[key]
+        return 1
+    
+    async def time(self):
+        self._check()
+        return int(self.now), int(self.now % 1 * 1_000_000)
+    
+    async def zadd(self, key, mapping):
+        self.sets.setdefault(key, {}).update(mapping)
+    
+    async def zremrangebyscore(self, key, low, high):
+        self.sets[key] = {member: score for member, score in self.sets.get(key, {}).items() if score > high}
+    
+    async def zrange(self, key, start, end):
+        return [member.encode() for member in self.sets.get(key, {})]
+    
+    async def zrem(self, key, member):
+        self.sets.get(key, {}).pop(member, None)
+
+
+class Clock:
+    """Управляемые монотонные часы."""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_hash_ring_moves_only_new_node_share():
+    """Тест: тикеры делятся между узлами, а новый узел забирает только свою долю."""
+    ring = HashRing(["a", "b", "c"])
+    parts = ring.partition(TICKERS)
+    
+    assert sorted(sum(parts.values(), [])) == sorted(TICKERS)
+    assert all(len(keys) > 30 for keys in parts.values())
+    
+    grown = HashRing(["a", "b", "c", "d"])
+    moved = [ticker for ticker in TICKERS if ring.owner(ticker) != grown.owner(ticker)]
+    assert moved and all(grown.owner(ticker) == "d" for ticker in moved)
+    assert HashRing([]).owner("BTC") is None
+
+
+@pytest.mark.asyncio
+async def test_leader_lease_takeover_after_expiry():
+    """Тест: аренду держит один процесс, после истечения без продления ее забирает другой."""
+    redis = FakeRedis()
+    a = LeaderLease(redis, "a", ttl=10)
+    b = LeaderLease(redis, "b", ttl=10)
+    
+    assert await a.acquire() and not await b.acquire()
+    redis.now += 8
+    assert await a.acquire()  # продление
+    redis.now += 8
+    assert not await b.acquire()
+    
+    redis.now += 11
+    assert await b.acquire() and not await a.acquire()
+    assert not await a.release()
+    assert await b.release() and await a.acquire()
+
+
+@pytest.mark.asyncio
+async def test_sharded_coordinators_rebalance_on_membership_change():
+    """Тест: живые процессы делят тикеры без пересечений, тикеры выбывшего переходят к оставшимся."""
+    redis = FakeRedis()
+    clock = Clock()
+    nodes = {name: IngestionCoordinator(redis, "sharded", name, ttl=15, clock=clock) for name in ("a", "b", "c")}
+    for node in nodes.values():
+        await node.refresh()
+    for node in nodes.values():
+        await node.refresh()
+    
+    shares = {name: node.assigned(TICKERS) for name, node in nodes.items()}
+    assert sorted(sum(shares.values(), [])) == sorted(TICKERS)
+    assert all(shares.values())
+    
+    # c перестает продлевать запись о членстве
+    for _ in range(2):
+        redis.now += 8
+        clock.now += 5
+        await nodes["a"].refresh()
+        await nodes["b"].refresh()
+    assert nodes["a"].ring.nodes == nodes["b"].ring.nodes == ["a", "b"]
+    remaining = nodes["a"].assigned(TICKERS) + nodes["b"].assigned(TICKERS)
+    assert sorted(remaining) == sorted(TICKERS)
+    assert set(shares["a"]) <= set(nodes["a"].assigned(TICKERS))
+    
+    # Штатная остановка освобождает тикеры сразу
+    await nodes["b"].close()
+    await nodes["a"].refresh()
+    assert nodes["a"].assigned(TICKERS) == TICKERS
+
+
+@pytest.mark.asyncio
+async def test_coordinator_stops_writing_when_redis_is_lost():
+    """Тест: без обновления дольше срока аренды процесс не пишет тики, а claim разрешает запись."""
+    redis = FakeRedis()
+    clock = Clock()
+    leader = IngestionCoordinator(redis, "leader", "a", ttl=15, clock=clock)
+    standby = IngestionCoordinator(redis, "leader", "b", ttl=15, clock=clock)
+    assert await leader.refresh() and await standby.refresh()
+    assert leader.assigned(["BTC", "ETH"]) == ["BTC", "ETH"]
+    assert standby.assigned(["BTC", "ETH"]) == []
+    
+    redis.fail = True
+    clock.now += 10
+    assert not await leader.refresh()
+    assert leader.assigned(["BTC"]) == ["BTC"]
+    clock.now += 6
+    assert leader.assigned(["BTC"]) == []
+    assert await leader.claim("BTC", SLOT)
+    
+    assert IngestionCoordinator(None, "none").assigned(["BTC"]) == ["BTC"]
+    with pytest.raises(ValueError):
+        IngestionCoordinator(None, "round_robin")
+
+
+@pytest.mark.asyncio
+async def test_ingest_slot_skips_claimed_slot(fake_deribit, session_factory, test_db):
+    """Тест: слот, уже записанный другим процессом, не записывается повторно."""
+    redis = FakeRedis()
+    a = IngestionCoordinator(redis, "sharded", "a", ttl=15)
+    b = IngestionCoordinator(redis, "sharded", "b", ttl=15)
+    
+    async with DeribitClient(base_url=fake_deribit.base_url) as client:
+        assert await ingest_slot(client, session_factory, float(SLOT), ["BTC", "ETH"], a) == 2
+        assert await ingest_slot(client, session_factory, float(SLOT), ["BTC", "ETH"], b) == 0
+        assert await ingest_slot(client, session_factory, float(SLOT + 60), ["BTC"], b) == 1
+    
+    rows = (await test_db.execute(select(Price.ticker, Price.timestamp).order_by(Price.timestamp, Price.ticker))).all()
+    assert rows == [("BTC", SLOT), ("ETH", SLOT), ("BTC", SLOT + 60)]
+
+
+@pytest.mark.asyncio
+async def test_failed_fetch_or_write_leaves_slot_to_other_process(fake_deribit, session_factory, test_db, monkeypatch):
+    """Тест: слот занимается только после получения цены и освобождается при ошибке записи."""
+    redis = FakeRedis()
+    a = IngestionCoordinator(redis, "sharded", "a", ttl=15)
+    b = IngestionCoordinator(redis, "sharded", "b", ttl=15)
+    
+    async with DeribitClient(base_url=fake_deribit.base_url) as client:
+        quote = client.get_index_price_quote
+        
+        async def unavailable(ticker):
+            raise RuntimeError("Deribit unavailable")
+        
+        monkeypatch.setattr(client, "get_index_price_quote", unavailable)
+        assert await ingest_slot(client, session_factory, float(SLOT), ["BTC"], a) == 0
+        monkeypatch.setattr(client, "get_index_price_quote", quote)
+        
+        create_prices = PriceService.create_prices
+        
+        async def failing_write(self, prices):
+            raise RuntimeError("database unavailable")
+        
+        monkeypatch.setattr(PriceService, "create_prices", failing_write)
+        with pytest.raises(RuntimeError):
+            await ingest_slot(client, session_factory, float(SLOT), ["ETH"], a)
+        monkeypatch.setattr(PriceService, "create_prices", create_prices)
+        
+        assert not redis.values
+        assert await ingest_slot(client, session_factory, float(SLOT), ["BTC", "ETH"], b) == 2
+    
+    rows = (await test_db.execute(select(Price.ticker).where(Price.timestamp == SLOT).order_by(Price.ticker))).all()
+    assert rows == [("BTC",), ("ETH",)]
@@ -0,0 +1,199 @@
+"""Тесты для дневной статистики цен."""
+import json
+import time
+import pytest
+import numpy as np
+from decimal import Decimal
+from sqlalchemy import select
+from app.models import BACKFILL_SOURCE, DailyPriceStats
+from app.schemas import PriceCreate
+from app.services import daily_stats
+from app.services.daily_stats import DAY, CurrentDayStats, RunningStats, day_start
+from app.services.price_service import PriceService
+from app.services.recent_store import RecentPriceStore, price_payload
+
+START = 1704067200  # 01-01-2024 00:00 UTC
+
+
+def _price(i: int) -> Decimal:
+    """Детерминированная цена около 42000 с 8 знаками."""
+    return Decimal(42000 + (i * 7919) % 1000) + Decimal(i % 97).scaleb(-8)
+
+
+def _expected(values: list) -> tuple:
+    values = np.array([float(value) for value in values])
+    return len(values), values.mean(), values.std()
+
+
+@pytest.fixture
+async def prices(test_db):
+    """Минутные цены BTC за трое суток и одна цена ETH."""
+    saved = await PriceService(test_db).create_prices([
+        PriceCreate(ticker="BTC", price=_price(i), timestamp=START + i * 60)
+        for i in range(3 * 1440)
+    ] + [PriceCreate(ticker="ETH", price=Decimal("2300"), timestamp=START + 60)])
+    return [price for price in saved if price.ticker == "BTC"]
+
+
+def test_running_stats_merge_matches_single_pass():
+    """Тест: объединение частей ряда дает ту же статистику, что один проход."""
+    values = [_price(i) for i in range(1000)]
+    whole = RunningStats()
+    for i, value in enumerate(values):
+        whole.add(START + i, value)
+    
+    merged = RunningStats()
+    for part in (values[:1], values[1:300], [], values[300:]):
+        stats = RunningStats()
+        offset = values.index(part[0]) if part else 0
+        # Части добавляются в обратном порядке времени: first/last считаются по timestamp
+        for i, value in reversed(list(enumerate(part, start=offset))):
+            stats.add(START + i, str(value))
+        merged.merge(stats)
+    
+    count, mean, std = _expected(values)
+    for stats in (whole, merged):
+        assert stats.count == count
+        assert stats.mean == pytest.approx(mean, rel=1e-12)
+        assert stats.stddev == pytest.approx(std, rel=1e-9)
+        assert (stats.min, stats.max) == (min(values), max(values))
+        assert (stats.first, stats.first_timestamp) == (values[0], START)
+        assert (stats.last, stats.last_timestamp) == (values[-1], START + 999)
+    assert RunningStats().stddev is None
+
+
+def test_current_day_skips_duplicates_and_rolls_over():
+    """Тест: накопитель не учитывает уже загруженные записи и начинает новые сутки с первой цены."""
+    clock = [START + 3600]
+    current = CurrentDayStats(clock=lambda: clock[0])
+    rows = [(START - 60, 1, Decimal("1")), (START, 2, Decimal("10")), (START + 60, 3, Decimal("20"))]
+    current.load("BTC", rows, START - 3600)
+    assert current.get("BTC", START).count == 2
+    
+    current.add([
+        {"id": 3, "ticker": "BTC", "price": "20.00000000", "timestamp": START + 60},
+        {"id": 4, "ticker": "BTC", "price": "30.00000000", "timestamp": START + 120},
+        {"id": 5, "ticker": "ETH", "price": "5", "timestamp": START + 120},
+    ])
+    stats = current.get("BTC", START)
+    assert (stats.count, stats.mean, stats.max, stats.last) == (3, 20.0, Decimal("30"), Decimal("30"))
+    assert current.get("ETH", START) is None
+    # Сутки закончились, тиков новых суток еще не было
+    assert current.get("BTC", START + DAY).count == 0
+    
+    current.add([{"id": 6, "ticker": "BTC", "price": "40", "timestamp": START + DAY}])
+    assert current.get("BTC", START + DAY).first == Decimal("40")
+    assert current.get("BTC", START) is None
+    
+    # Окно загружено не с начала суток: сутки считаются по БД
+    current.load("BTC", [], START + 60)
+    assert current.get("BTC", START) is None
+
+
+def test_current_day_counts_out_of_order_notifications():
+    """Тест: уведомления с меньшим id после большего учитываются, повторы - нет."""
+    clock = [START + 3600]
+    current = CurrentDayStats(clock=lambda: clock[0])
+    current.load("BTC", [(START, 5, Decimal("10"), None, None, None, None, None)], START)
+    
+    def tick(id: int, price: str, source=None) -> dict:
+        return {"id": id, "ticker": "BTC", "price": price, "timestamp": START + id * 60, "source": source}
+    
+    # Транзакция с id 7 зафиксировалась раньше транзакции с id 6
+    current.add([tick(7, "30")])
+    current.add([tick(6, "20"), tick(5, "10"), tick(7, "30")])
+    current.add([tick(3, "40", BACKFILL_SOURCE)])
+    stats = current.get("BTC", START)
+    assert (stats.count, stats.mean, stats.max) == (4, 25.0, Decimal("40"))
+    assert (stats.first_timestamp, stats.last_timestamp) == (START, START + 420)
+
+
+@pytest.mark.asyncio
+async def test_backfill_rows_count_in_closed_and_current_days(test_db, session_factory):
+    """Тест: строки догрузки учитываются одинаково в сутках по БД и в накопителе."""
+    now = START + DAY + 3600
+    service = PriceService(test_db)
+    await service.create_prices([PriceCreate(ticker="BTC", price=Decimal("10"), timestamp=day) for day in (START, START + DAY)])
+    for day in (START, START + DAY):
+        await service.bulk_insert_prices("BTC", [(day + 60, Decimal("20")), (day + 120, Decimal("30"))])
+    
+    assert (await daily_stats.compute_day(test_db, "BTC", START)).count == 3
+    store = RecentPriceStore(DAY + 3600, 10000, clock=lambda: now, daily=CurrentDayStats(clock=lambda: now))
+    await store.seed(session_factory, ["BTC"])
+    stats = store.current_day("BTC", START + DAY)
+    assert (stats.count, stats.mean) == (3, 20.0)
+
+
+@pytest.mark.asyncio
+async def test_store_feeds_current_day_from_notifications(test_db, session_factory, prices):
+    """Тест: окно последних цен ведет накопитель текущих суток по загрузке и уведомлениям."""
+    now = START + 2 * DAY + 3600
+    store = RecentPriceStore(DAY + 3600, 10000, clock=lambda: now, daily=CurrentDayStats(clock=lambda: now))
+    await store.seed(session_factory, ["BTC"])
+    
+    saved = await PriceService(test_db).create_prices([PriceCreate(ticker="BTC", price=Decimal("1"), timestamp=now)])
+    payload = json.dumps({"prices": [price_payload(price) for price in saved]})
+    await store.handle(payload, session_factory)
+    await store.handle(payload, session_factory)
+    
+    today = START + 2 * DAY
+    values = [price.price for price in prices if price.timestamp >= today] + [Decimal("1")]
+    count, mean, std = _expected(values)
+    stats = store.current_day("BTC", today)
+    assert (stats.count, stats.min) == (count, Decimal("1"))
+    assert stats.mean == pytest.approx(mean) and stats.stddev == pytest.approx(std)
+    assert RecentPriceStore(DAY, 10000).current_day("BTC", today) is None
+
+
+@pytest.mark.asyncio
+async def test_summary_from_finalized_days(test_db, session_factory, prices):
+    """Тест: сводка объединяет сохраненные сутки, недавние без строки и текущие из накопителя."""
+    assert await daily_stats.refresh_days(session_factory, "BTC", START, START + 2 * DAY) == 2
+    rows = (await test_db.execute(select(DailyPriceStats).order_by(DailyPriceStats.day))).scalars().all()
+    assert [(row.ticker, row.day, row.ticks) for row in rows] == [("BTC", START, 1440), ("BTC", START + DAY, 1440)]
+    assert rows[0].first_price == _price(0) and rows[0].last_timestamp == START + 1439 * 60
+    
+    current = RunningStats()
+    current.add(START + 3 * DAY, "50000")
+    summary = await daily_stats.summarize(
+        test_db, "BTC", START - DAY, START + 10 * DAY, today=START + 3 * DAY, current=current
+    )
+    assert [(item.day, item.final) for item in summary.days] == [
+        (START, True), (START + DAY, True), (START + 2 * DAY, False), (START + 3 * DAY, False),
+    ]
+    # Сутки до START не сохранены и старше DAILY_STATS_LOOKBACK_DAYS
+    assert summary.days_missing == 1
+    
+    values = [price.price for price in prices] + [Decimal("50000")]
+    count, mean, std = _expected(values)
+    assert summary.total.count == count
+    assert summary.total.mean == pytest.approx(mean, rel=1e-12)
+    assert summary.total.stddev == pytest.approx(std, rel=1e-9)
+    assert (summary.total.first, summary.total.last, summary.total.max) == (_price(0), Decimal("50000"), Decimal("50000"))
+
+
+@pytest.mark.asyncio
+async def test_daily_stats_endpoint(client, test_db, session_factory):
+    """Тест: /stats/daily отдает сводку и статистику по суткам, включая текущие."""
+    today = day_start(time.time())
+    await PriceService(test_db).create_prices([
+        PriceCreate(ticker="ETH", price=Decimal(100 + i), timestamp=today - DAY + i * 3600)
+        for i in range(24)
+    ] + [PriceCreate(ticker="ETH", price=Decimal("90"), timestamp=today)])
+    await daily_stats.refresh_days(session_factory, "ETH", today - DAY, today + DAY)
+    
+    start_date = time.strftime("%d-%m-%Y", time.gmtime(today - DAY))
+    response = await client.get(f"/api/prices/stats/daily?ticker=ETH_USD&start_date={start_date}&include_days=true")
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["ticker"], data["start_day"], data["end_day"]) == ("ETH", today - DAY, today)
+    assert (data["days"], data["days_missing"], data["ticks"]) == (2, 0, 25)
+    assert (Decimal(data["min"]), Decimal(data["max"]), Decimal(data["last"])) == (90, 123, 90)
+    assert [(day["final"], day["ticks"]) for day in data["daily"]] == [(True, 24), (False, 1)]
+    assert data["daily"][0]["mean"] == pytest.approx(111.5)
+    
+    data = (await client.get(f"/api/prices/stats/daily?ticker=ETH&start_date={start_date}")).json()
+    assert data["daily"] is None and data["ticks"] == 25
+    
+    assert (await client.get(f"/api/prices/stats/daily?ticker=SOL&start_date={start_date}")).status_code == 400
+    assert (await client.get("/api/prices/stats/daily?ticker=ETH&start_date=2024-01-01")).status_code == 400
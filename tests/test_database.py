@@ -0,0 +1,131 @@
+"""Тесты для выбора реплики чтения."""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app import database
+from app.database import Replica, ReplicaRouter
+
+
+def _replica(name: str, url: str = "sqlite+aiosqlite:///:memory:") -> Replica:
+    """Реплика на SQLite для тестов."""
+    engine = create_async_engine(url)
+    return Replica(name=name, engine=engine, session_factory=async_sessionmaker(engine, class_=AsyncSession))
+
+
+class FakeClock:
+    """Управляемые часы."""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_router_round_robin_and_lag():
+    """Тест: реплики выбираются по кругу, отстающая пропускается до следующей проверки."""
+    lags = {"a": 0.0, "b": 0.0}
+    
+    async def probe(replica):
+        return lags[replica.name]
+    
+    clock = FakeClock()
+    router = ReplicaRouter([_replica("a"), _replica("b")], max_lag=10, check_interval=5, probe=probe, clock=clock)
+    
+    assert [(await router.choose()).name for _ in range(4)] == ["a", "b", "a", "b"]
+    
+    lags["a"] = 60.0
+    # Результат проверки еще действителен
+    assert (await router.choose()).name == "a"
+    clock.now = 6.0
+    assert [(await router.choose()).name for _ in range(3)] == ["b", "b", "b"]
+    
+    lags["b"] = 60.0
+    clock.now = 12.0
+    assert await router.choose() is None
+    
+    lags["a"] = 1.0
+    clock.now = 18.0
+    assert (await router.choose()).name == "a"
+
+
+@pytest.mark.asyncio
+async def test_router_probe_failure_and_mark_failed():
+    """Тест: недоступная реплика пропускается, mark_failed действует до следующей проверки."""
+    async def probe(replica):
+        if replica.name == "down":
+            raise OSError("connection refused")
+        return 0.0
+    
+    clock = FakeClock()
+    up = _replica("up")
+    router = ReplicaRouter([_replica("down"), up], check_interval=5, probe=probe, clock=clock)
+    
+    assert (await router.choose()).name == "up"
+    
+    router.mark_failed(up)
+    assert await router.choose() is None
+    clock.now = 10.0
+    assert (await router.choose()).name == "up"
+
+
+@pytest.mark.asyncio
+async def test_probe_replica_lag_non_postgres():
+    """Тест: для СУБД без репликации PostgreSQL отставание считается нулевым."""
+    assert await database.probe_replica_lag(_replica("sqlite")) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_get_read_db_falls_back_to_primary(session_factory, monkeypatch):
+    """Тест: при ошибке подключения к реплике сессия открывается на primary."""
+    broken = _replica("broken", "sqlite+aiosqlite:////nonexistent-dir/replica.db")
+    
+    async def probe(replica):
+        return 0.0
+    
+    router = ReplicaRouter([broken], probe=probe)
+    monkeypatch.setattr(database, "replica_router", router)
+    monkeypatch.setattr(database, "AsyncSessionLocal", session_factory)
+    
+    sessions = database.get_read_db()
+    session = await sessions.__anext__()
+    assert (await session.execute(text("SELECT count(*) FROM prices"))).scalar() == 0
+    await sessions.aclose()
+    
+    assert broken.healthy is False
+    assert await router.choose() is None
+
+
+@pytest.mark.asyncio
+async def test_warm_up_opens_connections_concurrently(tmp_path):
+    """Тест: прогрев удерживает соединения одновременно и выполняет запросы на каждом."""
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'warm.db'}", poolclass=AsyncAdaptedQueuePool, pool_size=3, max_overflow=0
+    )
+    factory = async_sessionmaker(engine, class_=AsyncSession)
+    seen = set()
+    
+    async def queries(session):
+        connection = await session.connection()
+        seen.add(id(connection.sync_connection.connection.dbapi_connection))
+        await session.execute(text("SELECT 1"))
+    
+    assert await database.warm_up(factory, 3, queries) == 3
+    assert len(seen) == 3
+    assert engine.pool.checkedin() == 3
+    assert await database.warm_up(factory, 0, queries) == 0
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_database_runs_hot_queries(session_factory, monkeypatch):
+    """Тест: прогрев при запуске выполняет горячие запросы и не падает при ошибке базы."""
+    from app import main
+    
+    monkeypatch.setattr(database, "AsyncSessionLocal", session_factory)
+    monkeypatch.setattr(database, "replica_router", ReplicaRouter([_replica("down", "sqlite+aiosqlite:////nonexistent-dir/r.db")]))
+    monkeypatch.setattr(main.settings, "db_warmup_connections", 1)
+    
+    await main.warm_up_database()
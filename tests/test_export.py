@@ -0,0 +1,155 @@
+"""Тесты для заданий выгрузки цен в файлы."""
+import csv
+import gzip
+import io
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy.exc import SQLAlchemyError
+from app.api import routes
+from app.models import ExportJob, Price
+from app.schemas import PriceCreate
+from app.services import export
+from app.services.export import Exporter
+from app.services.price_service import PriceService
+
+START = 1704067200  # 01-01-2024 00:00 UTC
+
+
+@pytest.fixture
+async def prices(test_db):
+    """Минутные цены BTC и ETH за два часа."""
+    await PriceService(test_db).create_prices([
+        PriceCreate(ticker=ticker, price=Decimal("100") + i, timestamp=START + i * 60)
+        for ticker in ("BTC", "ETH")
+        for i in range(120)
+    ])
+
+
+def _read_csv(path: str) -> list:
+    with gzip.open(path, "rt", newline="") as f:
+        return list(csv.reader(f))
+
+
+@pytest.mark.asyncio
+async def test_exporter_writes_chunks_and_progress(test_db, session_factory, prices, tmp_path):
+    """Тест: строки выгружаются пачками по порядку тикеров и времени, прогресс сохраняется в задании."""
+    job = export.new_job(["ETH", "BTC"], START + 600, START + 3599, "csv")
+    test_db.add(job)
+    await test_db.commit()
+    
+    done = await Exporter(session_factory, directory=str(tmp_path), chunk_rows=7).run(job.id)
+    
+    assert done.status == export.DONE
+    assert done.rows_total == done.rows_written == 100
+    rows = _read_csv(done.file_path)
+    assert rows[0] == export.COLUMNS
+    assert [row[0] for row in rows[1:]] == ["ETH"] * 50 + ["BTC"] * 50
+    assert [int(row[1]) for row in rows[1:51]] == [START + i * 60 for i in range(10, 60)]
+    assert Decimal(rows[1][2]) == Decimal("110")
+    assert done.file_size == (tmp_path / f"{job.id}.csv.gz").stat().st_size
+    assert not list(tmp_path.glob("*.part"))
+
+
+@pytest.mark.asyncio
+async def test_exporter_marks_unavailable_format_failed(test_db, session_factory, tmp_path):
+    """Тест: задание с недоступным форматом завершается статусом failed."""
+    job = export.new_job(["BTC"], None, None, "xlsx")
+    test_db.add(job)
+    await test_db.commit()
+    
+    done = await Exporter(session_factory, directory=str(tmp_path)).run(job.id)
+    
+    assert done.status == export.FAILED
+    assert "xlsx" in done.error
+
+
+@pytest.mark.asyncio
+async def test_exporter_marks_job_failed_after_db_error(test_db, session_factory, prices, tmp_path, monkeypatch):
+    """Тест: после ошибки БД во время выгрузки задание сохраняется в статусе failed."""
+    job = export.new_job(["BTC"], None, None, "csv")
+    test_db.add(job)
+    await test_db.commit()
+    
+    chunk = Exporter._chunk
+    calls = []
+    
+    async def failing_chunk(self, session, job, ticker, after):
+        calls.append(after)
+        if len(calls) == 2:
+            # Ошибка при flush переводит сессию в состояние, требующее отката
+            session.add(Price(ticker=None, price=Decimal("1"), timestamp=START))
+            await session.flush()
+        return await chunk(self, session, job, ticker, after)
+    
+    monkeypatch.setattr(Exporter, "_chunk", failing_chunk)
+    done = await Exporter(session_factory, directory=str(tmp_path), chunk_rows=50).run(job.id)
+    
+    assert done.status == export.FAILED
+    async with session_factory() as session:
+        saved = await session.get(ExportJob, job.id)
+        assert (saved.status, saved.rows_written) == (export.FAILED, 50)
+        assert saved.finished_at is not None
+    assert not list(tmp_path.glob("*.part"))
+    
+    async def broken_chunk(self, session, job, ticker, after):
+        raise SQLAlchemyError("connection lost")
+    
+    monkeypatch.setattr(Exporter, "_chunk", broken_chunk)
+    retry = export.new_job(["BTC"], None, None, "csv")
+    test_db.add(retry)
+    await test_db.commit()
+    done = await Exporter(session_factory, directory=str(tmp_path)).run(retry.id)
+    assert (done.status, done.error) == (export.FAILED, "connection lost")
+
+
+@pytest.mark.asyncio
+async def test_export_api_lifecycle(client, test_db, session_factory, prices, tmp_path, monkeypatch):
+    """Тест: POST ставит задание в очередь, GET отдает прогресс, файл скачивается целиком и по Range."""
+    queued = []
+    
+    class FakeTask:
+        @staticmethod
+        def delay(job_id):
+            queued.append(job_id)
+    
+    monkeypatch.setattr(routes, "export_prices", FakeTask)
+    
+    response = await client.post("/api/prices/exports", json={"tickers": ["BTC_USD"], "start_date": "01-01-2024"})
+    assert response.status_code == 202
+    job = response.json()
+    expected_start = int(datetime.strptime("01-01-2024", "%d-%m-%Y").timestamp())
+    assert (job["status"], job["tickers"], job["start_timestamp"]) == ("pending", ["BTC"], expected_start)
+    assert queued == [job["id"]]
+    
+    response = await client.get(f"/api/prices/exports/{job['id']}/download")
+    assert response.status_code == 409
+    
+    await Exporter(session_factory, directory=str(tmp_path)).run(job["id"])
+    test_db.expire_all()
+    status = (await client.get(f"/api/prices/exports/{job['id']}")).json()
+    assert (status["status"], status["progress"]) == ("done", 1.0)
+    assert status["rows_written"] == len([i for i in range(120) if START + i * 60 >= expected_start])
+    
+    full = await client.get(status["download_url"])
+    assert full.status_code == 200
+    assert full.headers["accept-ranges"] == "bytes"
+    assert "content-encoding" not in full.headers
+    assert len(full.content) == status["file_size"]
+    with gzip.open(io.BytesIO(full.content), "rt") as f:
+        assert len(f.read().splitlines()) == status["rows_written"] + 1
+    
+    part = await client.get(status["download_url"], headers={"Range": "bytes=10-"})
+    assert part.status_code == 206
+    assert part.headers["content-range"] == f"bytes 10-{status['file_size'] - 1}/{status['file_size']}"
+    assert part.content == full.content[10:]
+    
+    tail = await client.get(status["download_url"], headers={"Range": "bytes=-5"})
+    assert tail.content == full.content[-5:]
+    
+    outside = await client.get(status["download_url"], headers={"Range": f"bytes={status['file_size']}-"})
+    assert outside.status_code == 416
+    
+    assert (await client.post("/api/prices/exports", json={"tickers": ["SOL"]})).status_code == 400
+    assert (await client.post("/api/prices/exports", json={"tickers": ["BTC"], "format": "xlsx"})).status_code == 400
+    assert (await client.get("/api/prices/exports/missing")).status_code == 404
@@ -0,0 +1,132 @@
+"""Тесты для поиска и заполнения пропусков."""
+import pytest
+from decimal import Decimal
+from app.config import settings
+from app.schemas import PriceCreate
+from app.services.backfill import Backfiller
+from app.services.deribit_client import DeribitClient
+from app.services.gap_detector import GapDetector
+from app.services.price_service import PriceService
+from app.tasks import _repair_gaps
+
+START = 1704067200  # 01-01-2024 00:00 UTC
+
+
+async def _create_ticks(db, ticker, minutes, offset=7):
+    """Создать тики в указанных минутах от START."""
+    service = PriceService(db)
+    for minute in minutes:
+        await service.create_price(PriceCreate(
+            ticker=ticker, price=Decimal("100.5"), timestamp=START + minute * 60 + offset
+        ))
+
+
+@pytest.mark.asyncio
+async def test_scan_finds_gaps(test_db):
+    """Тест поиска пропусков по LEAD."""
+    await _create_ticks(test_db, "BTC", [0, 1, 2, 6, 7, 9])
+    await _create_ticks(test_db, "ETH", [0, 5])
+    
+    gaps = await GapDetector(test_db).scan("BTC")
+    
+    assert [(g.gap_start, g.gap_end, g.missing_minutes) for g in gaps] == [
+        (START + 2 * 60 + 7, START + 6 * 60 + 7, 3),
+        (START + 7 * 60 + 7, START + 9 * 60 + 7, 1),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_scan_is_incremental(test_db):
+    """Тест: повторный проход начинается с watermark и не дублирует пропуски."""
+    detector = GapDetector(test_db)
+    await _create_ticks(test_db, "BTC", [0, 3, 4])
+    
+    first = await detector.scan("BTC")
+    assert len(first) == 1
+    assert await detector.get_watermark("BTC") == START + 4 * 60 + 7
+    
+    # Пропуск сразу после последнего проверенного тика
+    await _create_ticks(test_db, "BTC", [8, 9])
+    second = await detector.scan("BTC")
+    
+    assert [(g.gap_start, g.missing_minutes) for g in second] == [(START + 4 * 60 + 7, 3)]
+    assert len(await detector.get_gaps("BTC")) == 2
+    assert await detector.scan("BTC") == []
+
+
+@pytest.mark.asyncio
+async def test_run_range_fills_gap(test_db, session_factory, fake_deribit):
+    """Тест заполнения пропуска через догрузку."""
+    await _create_ticks(test_db, "BTC", [0, 1, 5])
+    detector = GapDetector(test_db)
+    gap = (await detector.scan("BTC"))[0]
+    
+    async with DeribitClient(base_url=fake_deribit.base_url) as client:
+        result = await Backfiller(client, session_factory).run_range("BTC", gap.gap_start + 1, gap.gap_end)
+    
+    assert result.rows_written == gap.missing_minutes == 3
+    prices = await PriceService(test_db).get_prices_by_ticker("BTC")
+    assert sorted(p.timestamp // 60 - START // 60 for p in prices) == [0, 1, 2, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_get_price_gaps_endpoint(client, test_db):
+    """Тест endpoint со списком пропусков."""
+    await _create_ticks(test_db, "ETH", [0, 4, 5])
+    await GapDetector(test_db).scan("ETH")
+    
+    response = await client.get("/api/prices/gaps?ticker=ETH_USD")
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 1
+    assert data["missing_minutes"] == 3
+    assert data["scanned_until"] == START + 5 * 60 + 7
+
+
+@pytest.mark.asyncio
+async def test_repair_keeps_gap_open_when_nothing_written(test_db, session_factory, fake_deribit, monkeypatch):
+    """Тест: пропуск без записанных догрузкой строк остается открытым, попытка учитывается."""
+    await _create_ticks(test_db, "BTC", [0, 1, 5])
+    fetch_window = Backfiller._fetch_window
+    
+    async def no_data(self, ticker, window, result):
+        return []
+    
+    monkeypatch.setattr(Backfiller, "_fetch_window", no_data)
+    summary = await _repair_gaps(session_factory, fake_deribit.base_url)
+    assert summary["BTC"] == {"found": 1, "repaired": 0, "pending": 1}
+    
+    test_db.expire_all()
+    [gap] = await GapDetector(test_db).get_gaps("BTC")
+    assert (gap.repaired_at, gap.repair_attempts, gap.filled_minutes) == (None, 1, 0)
+    
+    monkeypatch.setattr(Backfiller, "_fetch_window", fetch_window)
+    summary = await _repair_gaps(session_factory, fake_deribit.base_url)
+    assert summary["BTC"] == {"found": 0, "repaired": 1, "pending": 0}
+    assert await GapDetector(test_db).get_gaps("BTC") == []
+
+
+def test_gap_step_follows_ingestion_settings(test_db, monkeypatch):
+    """Тест: штатный интервал и порог пропуска берутся из режима получения цен."""
+    assert (GapDetector(test_db).interval_seconds, GapDetector(test_db).threshold_seconds) == (60, 90)
+    
+    monkeypatch.setattr(settings, "ingestion_scheduler", "asyncio")
+    monkeypatch.setattr(settings, "scheduler_interval_seconds", 300)
+    detector = GapDetector(test_db)
+    assert (detector.interval_seconds, detector.threshold_seconds) == (300, 450)
+    
+    monkeypatch.setattr(settings, "ingestion_mode", "sampled")
+    assert GapDetector(test_db).interval_seconds == 60
+
+
+@pytest.mark.asyncio
+async def test_scan_counts_missing_intervals_at_configured_step(test_db, monkeypatch):
+    """Тест: число пропущенных интервалов считается по шагу ряда, а не по минуте."""
+    monkeypatch.setattr(settings, "ingestion_scheduler", "asyncio")
+    monkeypatch.setattr(settings, "scheduler_interval_seconds", 300)
+    await _create_ticks(test_db, "BTC", [0, 5, 10, 30])
+    
+    gaps = await GapDetector(test_db).scan("BTC")
+    
+    assert [(g.gap_start, g.missing_minutes) for g in gaps] == [(START + 10 * 60 + 7, 3)]
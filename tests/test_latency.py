@@ -0,0 +1,84 @@
+"""Тесты для трассировки задержки тиков."""
+import time
+import pytest
+from sqlalchemy import select
+from app.models import TickLatency
+from app.scheduler import ingest_slot
+from app.services.deribit_client import DeribitClient
+from app.services.latency import latency_summary, stage_durations
+
+SLOT = 1704067260
+
+
+def _row(ticker="BTC", timestamp=SLOT, sent=0, exchange_in=40_000, exchange_out=41_000, received=90_000, committed=100_000):
+    base = 1_700_000_000_000_000
+    return TickLatency(
+        price_id=1,
+        ticker=ticker,
+        timestamp=timestamp,
+        sent_at_us=base + sent,
+        exchange_in_us=None if exchange_in is None else base + exchange_in,
+        exchange_out_us=None if exchange_out is None else base + exchange_out,
+        received_at_us=base + received,
+        committed_at_us=base + committed,
+    )
+
+
+def test_stage_durations():
+    """Тест: этапы считаются по отметкам Deribit и локальным отметкам."""
+    assert stage_durations(_row()) == {
+        "request": 0.04,
+        "exchange": 0.001,
+        "response": 0.049,
+        "round_trip": 0.09,
+        "write": 0.01,
+        "staleness": 0.059,
+    }
+    # Без usIn/usOut остаются только этапы по локальным часам
+    durations = stage_durations(_row(exchange_in=None, exchange_out=None))
+    assert durations["round_trip"] == 0.09 and durations["write"] == 0.01
+    assert durations["request"] is durations["exchange"] is durations["staleness"] is None
+
+
+@pytest.mark.asyncio
+async def test_ingest_slot_records_latency(fake_deribit, session_factory, test_db):
+    """Тест: при записи тика сохраняются usIn/usOut ответа и локальные отметки времени."""
+    before = time.time()
+    async with DeribitClient(base_url=fake_deribit.base_url) as client:
+        quote = await client.get_index_price_quote("BTC")
+        await ingest_slot(client, session_factory, float(SLOT), ["BTC", "ETH"])
+    
+    assert quote.us_in is not None and before <= quote.sent_at <= quote.received_at
+    
+    rows = (await test_db.execute(select(TickLatency).order_by(TickLatency.ticker))).scalars().all()
+    assert [(row.ticker, row.timestamp) for row in rows] == [("BTC", SLOT), ("ETH", SLOT)]
+    for row in rows:
+        assert row.sent_at_us <= row.received_at_us <= row.committed_at_us
+        assert row.exchange_in_us is not None and row.exchange_out_us >= row.exchange_in_us
+    
+    summary = await latency_summary(test_db, "BTC", SLOT, SLOT)
+    assert summary["ticks"] == 1
+    stages = {stage["stage"]: stage for stage in summary["stages"]}
+    assert stages["round_trip"]["count"] == 1
+    assert stages["round_trip"]["p50_ms"] == stages["round_trip"]["max_ms"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_latency_endpoint_percentiles(client, test_db):
+    """Тест: endpoint отдает перцентили этапов за период."""
+    now = int(time.time())
+    test_db.add_all([_row(timestamp=now - 60 * i, committed=100_000 + 1000 * i) for i in range(100)])
+    test_db.add(_row(ticker="ETH", timestamp=now))
+    test_db.add(_row(timestamp=now - 2 * 86400))
+    await test_db.commit()
+    
+    response = await client.get("/api/prices/latency?ticker=BTC_USD&hours=24")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["ticker"] == "BTC" and data["ticks"] == 100
+    stages = {stage["stage"]: stage for stage in data["stages"]}
+    assert stages["exchange"]["p99_ms"] == 1.0
+    assert stages["write"]["p50_ms"] == pytest.approx(59.5)
+    assert stages["write"]["max_ms"] == 109.0
+    
+    assert (await client.get("/api/prices/latency?ticker=SOL")).status_code == 400
@@ -0,0 +1,46 @@
+"""Тесты для метрик Prometheus."""
+import pytest
+from app.services.deribit_client import DeribitClient
+
+
+def _sample(text: str, name: str, **labels) -> float:
+    """Найти значение метрики с указанными метками в текстовом формате."""
+    for line in text.splitlines():
+        if not line.startswith(name + "{"):
+            continue
+        if all(f'{key}="{value}"' in line for key, value in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_records_routes(client):
+    """Тест: запросы учитываются по шаблону маршрута и статусу."""
+    before = _sample((await client.get("/metrics")).text, "http_request_duration_seconds_count",
+                     route="/api/prices/last", status="404")
+    
+    await client.get("/api/prices/last?ticker=BTC")
+    response = await client.get("/metrics")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    after = _sample(response.text, "http_request_duration_seconds_count",
+                    route="/api/prices/last", status="404")
+    assert after == before + 1
+
+
+@pytest.mark.asyncio
+async def test_deribit_metrics(client, fake_deribit):
+    """Тест: задержка и коды ошибок запросов к Deribit попадают в метрики."""
+    fake_deribit.fail_next = 1
+    text = (await client.get("/metrics")).text
+    errors_before = _sample(text, "deribit_request_errors_total", method="public/get_index_price", code="http_500")
+    
+    async with DeribitClient(base_url=fake_deribit.base_url) as deribit:
+        await deribit.get_index_price("BTC")
+    
+    text = (await client.get("/metrics")).text
+    assert _sample(text, "deribit_request_errors_total",
+                   method="public/get_index_price", code="http_500") == errors_before + 1
+    assert _sample(text, "deribit_request_duration_seconds_count", method="public/get_index_price") >= 2
+    assert _sample(text, "deribit_resilience_events_total", event="retries") >= 1
@@ -0,0 +1,86 @@
+"""Тесты для профилирования запросов."""
+import pstats
+import pytest
+from app import profiling
+from app.config import settings
+
+
+@pytest.fixture
+def profiling_enabled(monkeypatch, tmp_path):
+    """Включить профилирование с тестовым токеном и временным каталогом."""
+    monkeypatch.setattr(settings, "profiling_token", "secret")
+    monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_profile_requires_token(client, profiling_enabled):
+    """Тест: без верного токена профилирование запрещено."""
+    response = await client.get("/api/prices?ticker=BTC&profile=text")
+    assert response.status_code == 403
+    
+    response = await client.get(
+        "/api/prices?ticker=BTC", headers={"X-Profile": "text", "X-Admin-Token": "wrong"}
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_profile_disabled_without_configured_token(client, monkeypatch):
+    """Тест: при пустом PROFILING_TOKEN профилирование отключено."""
+    monkeypatch.setattr(settings, "profiling_token", "")
+    
+    response = await client.get("/api/prices?ticker=BTC&profile=text", headers={"X-Admin-Token": ""})
+    
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_profile_text(client, profiling_enabled):
+    """Тест: текстовая сводка профиля вместо ответа и сохраненный файл pstats."""
+    response = await client.get(
+        "/api/prices?ticker=BTC", headers={"X-Profile": "text", "X-Admin-Token": "secret"}
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.headers["x-profiled-status"] == "200"
+    assert "function calls" in response.text
+    assert "get_prices_by_ticker" in response.text
+    saved = list(profiling_enabled.glob("*.prof"))
+    assert len(saved) == 1
+    assert response.headers["x-profile-file"] == str(saved[0])
+
+
+@pytest.mark.asyncio
+async def test_profile_pstats(client, profiling_enabled, tmp_path):
+    """Тест: профиль в формате pstats читается модулем pstats."""
+    response = await client.get(
+        "/api/prices/last?ticker=ETH&profile=pstats", headers={"X-Admin-Token": "secret"}
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["x-profiled-status"] == "404"
+    downloaded = tmp_path / "downloaded.prof"
+    downloaded.write_bytes(response.content)
+    assert pstats.Stats(str(downloaded)).total_calls > 0
+
+
+@pytest.mark.asyncio
+async def test_profile_invalid_format(client, profiling_enabled):
+    """Тест: неизвестный формат профиля."""
+    response = await client.get("/api/prices?ticker=BTC&profile=flamegraph", headers={"X-Admin-Token": "secret"})
+    
+    assert response.status_code == 400
+
+
+def test_profiled_is_exclusive():
+    """Тест: одновременно выполняется только одно профилирование."""
+    with profiling.profiled():
+        with pytest.raises(profiling.ProfilerBusyError):
+            with profiling.profiled():
+                pass
+    
+    with profiling.profiled() as profiler:
+        sum(range(10))
+    assert "function calls" in profiling.format_stats(profiler)
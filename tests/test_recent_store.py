@@ -0,0 +1,170 @@
+"""Тесты для окна последних цен в памяти."""
+import json
+import pytest
+import numpy as np
+from decimal import Decimal
+from datetime import datetime
+from app.schemas import PriceCreate, PriceResponse
+from app.services.price_service import PriceService
+from app.services.recent_store import (
+    COLUMNS,
+    TS,
+    PriceRing,
+    RecentPriceStore,
+    from_scaled,
+    make_row,
+    price_payload,
+    to_scaled,
+)
+
+NOW = 1700100000
+WINDOW = 25 * 3600
+
+
+def _rows(timestamps, first_id=1):
+    return np.array([make_row(first_id + i, "100.5", ts) for i, ts in enumerate(timestamps)], dtype=np.int64)
+
+
+def test_scaled_prices_roundtrip():
+    """Тест: цены хранятся с точностью колонки и восстанавливаются как из БД."""
+    assert to_scaled(Decimal("50000.5")) == 5000050000000
+    assert str(from_scaled(to_scaled("50000.5"))) == "50000.50000000"
+    assert str(from_scaled(to_scaled(0.123456789))) == "0.12345679"
+    assert from_scaled(to_scaled(None)) is None
+
+
+def test_ring_wraps_evicts_and_selects():
+    """Тест: кольцо растет до максимума, вытесняет старые строки и ищет диапазон через границу массива."""
+    ring = PriceRing(max_capacity=8, initial_capacity=4)
+    ring.covered_from = 0
+    ring.extend(_rows([60, 120, 180]))
+    assert ring.capacity == 4
+    
+    ring.extend(_rows([240, 300, 360, 420], first_id=4))
+    assert ring.capacity == 8 and ring.size == 7
+    
+    ring.extend(_rows([480, 540, 600], first_id=8))
+    assert ring.size == 8
+    assert ring.covered_from == 121
+    assert ring.rows()[:, TS].tolist() == [180, 240, 300, 360, 420, 480, 540, 600]
+    
+    assert ring.select(300, 540)[:, TS].tolist() == [300, 360, 420, 480, 540]
+    assert ring.select(None, 200)[:, TS].tolist() == [180]
+    assert ring.select(601, None).shape == (0, COLUMNS)
+    
+    ring.trim(400)
+    assert ring.rows()[:, TS].tolist() == [420, 480, 540, 600]
+    assert ring.covered_from == 400
+
+
+def test_ring_merges_late_and_duplicate_rows():
+    """Тест: запоздавшие строки вставляются по порядку, повторы по id отбрасываются."""
+    ring = PriceRing(max_capacity=100)
+    ring.extend(_rows([60, 180, 240]))
+    ring.extend(np.array([make_row(10, "1", 120), make_row(3, "100.5", 240)], dtype=np.int64))
+    
+    assert ring.rows()[:, TS].tolist() == [60, 120, 180, 240]
+    assert ring.last_timestamp == 240
+
+
+@pytest.fixture
+async def seeded(test_db, session_factory):
+    """Тестовая база с ценами за двое суток и окно, загруженное из нее."""
+    service = PriceService(test_db)
+    await service.create_prices([
+        PriceCreate(ticker="BTC", price=Decimal("50000") + i, timestamp=NOW - 2 * 86400 + i * 600)
+        for i in range(2 * 144)
+    ])
+    store = RecentPriceStore(WINDOW, capacity=10000, clock=lambda: NOW)
+    await store.seed(session_factory, ["BTC", "ETH"])
+    return store
+
+
+@pytest.mark.asyncio
+async def test_store_serves_recent_ranges_like_db(test_db, seeded):
+    """Тест: диапазон внутри окна отдается из памяти с тем же результатом, что из БД."""
+    start = datetime.fromtimestamp(NOW - 6 * 3600)
+    end = datetime.fromtimestamp(NOW - 3600)
+    db_service = PriceService(test_db, recent=RecentPriceStore(WINDOW, 10000))
+    memory_service = PriceService(test_db, recent=seeded)
+    
+    for limit in (None, 5):
+        expected = await db_service.get_prices_by_date_range("BTC", start, end, limit=limit)
+        served = seeded.query("BTC", int(start.timestamp()), int(end.timestamp()), limit)
+        assert served is not None
+        actual = await memory_service.get_prices_by_date_range("BTC", start, end, limit=limit)
+        assert [PriceResponse.model_validate(p) for p in actual] == [PriceResponse.model_validate(p) for p in expected]
+    
+    assert seeded.query("ETH", NOW - 3600, None) == []
+    # Начало диапазона раньше окна или не задано - запрос идет в БД
+    assert seeded.query("BTC", NOW - 2 * 86400, None) is None
+    assert seeded.query("BTC", None, NOW) is None
+    assert seeded.query("SOL", NOW - 3600, None) is None
+
+
+@pytest.mark.asyncio
+async def test_store_applies_notifications(test_db, session_factory, seeded):
+    """Тест: уведомления о записи добавляют цены, уведомление о догрузке перечитывает окно."""
+    saved = await PriceService(test_db).create_prices([
+        PriceCreate(ticker="BTC", price=Decimal("60000.25"), timestamp=NOW + 60),
+        PriceCreate(ticker="ETH", price=Decimal("3000"), timestamp=NOW + 60),
+    ])
+    await seeded.handle(json.dumps({"prices": [price_payload(price) for price in saved]}), session_factory)
+    
+    last = seeded.query("BTC", NOW, None)
+    assert [(p.id, p.price, p.timestamp) for p in last] == [(saved[0].id, Decimal("60000.25000000"), NOW + 60)]
+    assert [p.ticker for p in seeded.query("ETH", NOW, None)] == ["ETH"]
+    
+    await PriceService(test_db).bulk_insert_prices("BTC", [(NOW - 30, Decimal("1"))])
+    assert len(seeded.query("BTC", NOW - 60, None)) == 1
+    await seeded.handle(json.dumps({"reload": {"ticker": "BTC", "start": NOW - 60, "end": NOW}}), session_factory)
+    assert [p.timestamp for p in seeded.query("BTC", NOW - 60, None)] == [NOW + 60, NOW - 30]
+
+
+@pytest.mark.asyncio
+async def test_store_falls_back_to_db_when_stale(test_db, session_factory, monkeypatch):
+    """Тест: окно без уведомлений дольше max_staleness не используется, уведомление после сбоя публикации перечитывает окна."""
+    from redis.exceptions import ConnectionError as RedisConnectionError
+    from app.services import recent_store
+    
+    clock = [NOW]
+    store = RecentPriceStore(WINDOW, capacity=1000, max_staleness=180, clock=lambda: clock[0])
+    await store.seed(session_factory, ["BTC"])
+    assert store.query("BTC", NOW - 3600, None) == []
+    
+    clock[0] = NOW + 181
+    assert store.query("BTC", NOW - 3600, None) is None
+    
+    published = []
+    
+    class FakeRedis:
+        """Клиент Redis, недоступный при down = True."""
+        down = True
+        
+        async def __aenter__(self):
+            if self.down:
+                raise RedisConnectionError("Redis недоступен")
+            return self
+        
+        async def __aexit__(self, *args):
+            pass
+        
+        async def publish(self, channel, data):
+            published.append(json.loads(data))
+    
+    monkeypatch.setattr(recent_store, "create_redis", FakeRedis)
+    monkeypatch.setattr(recent_store, "_publish_failed", False)
+    service = PriceService(test_db)
+    await recent_store.publish_prices(await service.create_prices([
+        PriceCreate(ticker="BTC", price=Decimal("1"), timestamp=NOW + 120),
+    ]))
+    assert published == []
+    
+    FakeRedis.down = False
+    await recent_store.publish_prices(await service.create_prices([
+        PriceCreate(ticker="BTC", price=Decimal("2"), timestamp=NOW + 180),
+    ]))
+    assert published[0]["resync"] is True
+    
+    await store.handle(json.dumps(published[0]), session_factory)
+    assert [p.timestamp for p in store.query("BTC", NOW, None)] == [NOW + 180, NOW + 120]
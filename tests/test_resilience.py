@@ -0,0 +1,150 @@
+"""Тесты для слоя отказоустойчивости клиента Deribit."""
+import asyncio
+import random
+import pytest
+from decimal import Decimal
+from app.services.deribit_client import (
+    DeribitClient,
+    DeribitCircuitOpenError,
+    DeribitTimeoutError,
+    DeribitTransientError,
+)
+from app.services.resilience import (
+    CircuitBreaker,
+    LatencyTracker,
+    ResilienceState,
+    ResilienceStats,
+    RetryPolicy,
+)
+
+
+def _state(failure_threshold=5, reset_timeout=30.0):
+    """Создать изолированное состояние отказоустойчивости."""
+    return ResilienceState(
+        breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=reset_timeout),
+        latency=LatencyTracker(),
+        stats=ResilienceStats(),
+    )
+
+
+def _policy(max_attempts=3, budget=5.0):
+    """Политика повторов с короткими задержками."""
+    return RetryPolicy(max_attempts=max_attempts, base_delay=0.01, max_delay=0.02, budget=budget,
+                       rng=random.Random(1))
+
+
+def test_circuit_breaker_transitions():
+    """Тест переходов circuit breaker: closed -> open -> half_open -> closed."""
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    
+    assert breaker.allow()
+    assert not breaker.record_failure()
+    assert breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    
+    now[0] = 11
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Пока пробный вызов не завершен, остальные отклоняются
+    assert not breaker.allow()
+    
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_retry_backoff_bounds():
+    """Тест границ задержки с jitter."""
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.5, rng=random.Random(7))
+    
+    for attempt in range(6):
+        delay = policy.backoff(attempt)
+        assert 0 <= delay <= min(0.5, 0.1 * 2 ** attempt)
+
+
+def test_latency_percentile():
+    """Тест оценки перцентиля задержки."""
+    tracker = LatencyTracker(size=100)
+    for i in range(1, 101):
+        tracker.record(i / 1000)
+    
+    assert tracker.percentile(95) == pytest.approx(0.095, abs=0.001)
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors(fake_deribit):
+    """Тест повторов после HTTP 500."""
+    fake_deribit.fail_next = 2
+    state = _state()
+    
+    async with DeribitClient(base_url=fake_deribit.base_url, retry_policy=_policy(), resilience=state) as client:
+        price = await client.get_index_price("BTC")
+    
+    assert isinstance(price, Decimal)
+    assert state.stats.retries == 2
+    assert state.stats.successes == 1
+    assert state.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_and_fails_fast(fake_deribit):
+    """Тест: после серии ошибок запросы отклоняются без обращения к серверу."""
+    fake_deribit.error_rate = 1.0
+    state = _state(failure_threshold=3)
+    
+    async with DeribitClient(base_url=fake_deribit.base_url, retry_policy=_policy(), resilience=state) as client:
+        with pytest.raises(DeribitTransientError):
+            await client.get_index_price("BTC")
+        requests_before = fake_deribit.requests + fake_deribit.errors
+        
+        with pytest.raises(DeribitCircuitOpenError):
+            await client.get_index_price("BTC")
+    
+    assert fake_deribit.requests + fake_deribit.errors == requests_before
+    assert state.stats.circuit_opened == 1
+    assert state.stats.circuit_rejections == 1
+
+
+@pytest.mark.asyncio
+async def test_request_timeout(fake_deribit):
+    """Тест таймаута попытки и бюджета времени."""
+    fake_deribit.latency = 0.2
+    state = _state()
+    
+    async with DeribitClient(
+        base_url=fake_deribit.base_url,
+        request_timeout=0.05,
+        retry_policy=_policy(max_attempts=2),
+        resilience=state,
+    ) as client:
+        with pytest.raises(DeribitTimeoutError):
+            await client.get_index_price("ETH")
+    
+    assert state.stats.timeouts == 2
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins(fake_deribit):
+    """Тест: медленный запрос дублируется после p95, выигрывает дубль."""
+    delays = iter([0.5])
+    fake_deribit.latency = lambda: next(delays, 0.0)
+    state = _state()
+    for _ in range(30):
+        state.latency.record(0.01)
+    
+    async with DeribitClient(
+        base_url=fake_deribit.base_url,
+        request_timeout=1.0,
+        retry_policy=_policy(),
+        resilience=state,
+        hedge=True,
+    ) as client:
+        price = await client.get_index_price("BTC")
+        # Проигравший запрос отменен и завершен до возврата ответа
+        assert not [task for task in asyncio.all_tasks() if "_timed_call" in task.get_coro().__qualname__]
+    
+    assert isinstance(price, Decimal)
+    assert state.stats.hedges_launched == 1
+    assert state.stats.hedges_won == 1
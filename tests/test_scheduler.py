@@ -0,0 +1,77 @@
+"""Тесты для asyncio планировщика получения цен."""
+import time
+import asyncio
+import pytest
+from app.scheduler import AlignedScheduler, ingest_slot
+from app.services.deribit_client import DeribitClient
+from app.services.price_service import PriceService
+
+
+def test_next_slot_is_aligned():
+    """Тест выравнивания слота по границе интервала."""
+    scheduler = AlignedScheduler(60, None)
+    
+    assert scheduler.next_slot(1704067205.3) == 1704067260
+    assert scheduler.next_slot(1704067260.0) == 1704067320
+
+
+def test_interval_must_be_positive():
+    """Тест валидации интервала."""
+    with pytest.raises(ValueError):
+        AlignedScheduler(0, None)
+
+
+@pytest.mark.asyncio
+async def test_fires_on_boundaries():
+    """Тест: слоты идут ровно через интервал, без накопления дрейфа."""
+    interval = 0.05
+    slots = []
+    stop = asyncio.Event()
+    
+    async def callback(slot):
+        slots.append((slot, time.time()))
+        if len(slots) == 5:
+            stop.set()
+    
+    scheduler = AlignedScheduler(interval, callback)
+    await asyncio.wait_for(scheduler.run(stop), timeout=5)
+    
+    assert len(slots) == 5
+    for slot, fired_at in slots:
+        assert abs(slot / interval - round(slot / interval)) < 1e-3
+        assert fired_at >= slot
+    assert scheduler.stats.ticks == 5
+    assert scheduler.stats.max_lag < interval
+
+
+@pytest.mark.asyncio
+async def test_overrun_is_skipped():
+    """Тест: при долгой обработке слоты пропускаются, а не накапливаются."""
+    interval = 0.05
+    calls = []
+    stop = asyncio.Event()
+    
+    async def slow_callback(slot):
+        calls.append(slot)
+        await asyncio.sleep(interval * 2.5)
+        if len(calls) == 2:
+            stop.set()
+    
+    scheduler = AlignedScheduler(interval, slow_callback)
+    await asyncio.wait_for(scheduler.run(stop), timeout=5)
+    
+    assert len(calls) == 2
+    assert scheduler.stats.overruns >= 2
+    assert round((calls[1] - calls[0]) / interval) >= 3
+
+
+@pytest.mark.asyncio
+async def test_ingest_slot_stamps_slot_time(fake_deribit, session_factory, test_db):
+    """Тест: записи получают время слота, а не время запроса."""
+    async with DeribitClient(base_url=fake_deribit.base_url) as client:
+        await ingest_slot(client, session_factory, 1704067260.0, ["BTC", "ETH"])
+    
+    service = PriceService(test_db)
+    btc = await service.get_last_price("BTC")
+    eth = await service.get_last_price("ETH")
+    assert btc.timestamp == eth.timestamp == 1704067260
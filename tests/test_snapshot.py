@@ -0,0 +1,102 @@
+"""Тесты для бинарных снимков таблицы prices."""
+import gzip
+import struct
+import pytest
+from decimal import Decimal
+from sqlalchemy import delete, select
+from app.models import BACKFILL_SOURCE, Price
+from app.services import snapshot
+from app.services.snapshot import SnapshotScope, decode_numeric, encode_numeric
+
+START = 1704067200  # 01-01-2024 00:00 UTC
+
+
+@pytest.fixture
+async def prices(test_db):
+    """Минутные цены BTC и ETH за час с OHLC и догруженными строками."""
+    test_db.add_all([
+        Price(
+            ticker=ticker,
+            price=Decimal("42000.12345678") + i,
+            timestamp=START + i * 60,
+            open=Decimal("41999.5") if i % 2 else None,
+            high=Decimal("42001") if i % 2 else None,
+            low=Decimal("-0.00000001") if i % 2 else None,
+            samples=12 if i % 2 else None,
+            source=BACKFILL_SOURCE if i % 3 == 0 else None,
+        )
+        for ticker in ("BTC", "ETH")
+        for i in range(60)
+    ])
+    await test_db.commit()
+
+
+async def _rows(test_db) -> list:
+    test_db.expire_all()
+    result = await test_db.execute(
+        select(*[getattr(Price, name) for name in snapshot.COLUMN_NAMES]).order_by(Price.ticker, Price.timestamp)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+def test_numeric_binary_format():
+    """Тест: numeric кодируется цифрами по основанию 10000, как в PostgreSQL."""
+    assert encode_numeric(Decimal("12345.678")) == struct.pack(">hhHH3H", 3, 1, 0, 3, 1, 2345, 6780)
+    assert encode_numeric(Decimal("0.00050000")) == struct.pack(">hhHH1H", 1, -1, 0, 8, 5)
+    assert encode_numeric(Decimal("0")) == struct.pack(">hhHH", 0, 0, 0, 0)
+    for value in ("0", "-42.5", "0.00000001", "100.00000000", "99999999999.12345678", "-10000", "1E+8"):
+        decoded = decode_numeric(encode_numeric(Decimal(value)))
+        assert decoded == Decimal(value)
+        assert decoded.as_tuple().exponent == min(Decimal(value).as_tuple().exponent, 0)
+
+
+@pytest.mark.asyncio
+async def test_full_snapshot_round_trip(test_db, prices, tmp_path):
+    """Тест: полный снимок восстанавливает таблицу целиком вместе с id."""
+    path = str(tmp_path / "prices.snapshot.gz")
+    original = await _rows(test_db)
+    
+    assert await snapshot.dump(test_db.bind, path, chunk_rows=7) == 120
+    
+    await test_db.execute(delete(Price).where(Price.ticker == "ETH"))
+    test_db.add(Price(ticker="BTC", price=Decimal("1"), timestamp=START + 86400))
+    await test_db.commit()
+    
+    assert await snapshot.restore(test_db.bind, path, chunk_rows=50) == 120
+    assert await _rows(test_db) == original
+
+
+@pytest.mark.asyncio
+async def test_partial_snapshot_replaces_only_its_scope(test_db, prices, tmp_path):
+    """Тест: снимок тикера за диапазон заменяет только строки этой области."""
+    path = str(tmp_path / "btc.snapshot.gz")
+    scope = SnapshotScope(tickers=["BTC"], start_timestamp=START + 600, end_timestamp=START + 1200)
+    assert await snapshot.dump(test_db.bind, path, scope) == 10
+    
+    await test_db.execute(delete(Price).where(Price.ticker == "BTC", Price.timestamp < START + 900))
+    test_db.add(Price(ticker="BTC", price=Decimal("1"), timestamp=START + 1000))
+    await test_db.commit()
+    
+    assert await snapshot.restore(test_db.bind, path) == 10
+    rows = await _rows(test_db)
+    btc = [row for row in rows if row[1] == "BTC"]
+    # Строки до 600 удалены и не входят в снимок, добавленная строка в области заменена снимком
+    assert [row[3] for row in btc] == [START + i * 60 for i in range(10, 60)]
+    assert btc[0][2] == Decimal("42010.12345678")
+    assert len([row for row in rows if row[1] == "ETH"]) == 60
+    
+    with gzip.open(path, "rb") as stream:
+        header = snapshot.read_header(stream)
+        assert stream.read(len(snapshot.COPY_SIGNATURE)) == snapshot.COPY_SIGNATURE
+    assert (header["tickers"], header["start_timestamp"], header["dialect"]) == (["BTC"], START + 600, "sqlite")
+
+
+@pytest.mark.asyncio
+async def test_restore_rejects_foreign_file(test_db, tmp_path):
+    """Тест: файл без заголовка снимка не восстанавливается."""
+    path = tmp_path / "other.gz"
+    with gzip.open(path, "wb") as f:
+        f.write(b"ticker,timestamp\n")
+    
+    with pytest.raises(ValueError):
+        await snapshot.restore(test_db.bind, str(path))
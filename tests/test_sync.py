@@ -0,0 +1,123 @@
+"""Тесты для инкрементальной синхронизации /api/prices/sync."""
+import time
+import asyncio
+import pytest
+from decimal import Decimal
+from sqlalchemy import update
+from app.config import settings
+from app.models import Price
+from app.schemas import PriceCreate
+from app.services.price_service import PriceService
+from app.services.recent_store import recent_prices
+
+START = 1704067200
+
+
+@pytest.fixture(autouse=True)
+def no_settle(monkeypatch):
+    """Строки отдаются сразу после вставки, если тест не задает окно явно."""
+    monkeypatch.setattr(settings, "sync_settle_seconds", 0)
+
+
+@pytest.fixture
+async def prices(test_db):
+    """Чередующиеся минутные цены BTC и ETH."""
+    return await PriceService(test_db).create_prices([
+        PriceCreate(ticker="BTC" if i % 2 else "ETH", price=Decimal("100") + i, timestamp=START + i * 60)
+        for i in range(25)
+    ])
+
+
+@pytest.mark.asyncio
+async def test_sync_pages_by_watermark(client, prices):
+    """Тест: записи отдаются пачками по возрастанию id, водяной знак продолжает с места остановки."""
+    received = []
+    since_id = 0
+    while True:
+        response = await client.get(f"/api/prices/sync?since_id={since_id}&limit=10")
+        assert response.status_code == 200
+        data = response.json()
+        received.extend(price["id"] for price in data["prices"])
+        since_id = data["next_since_id"]
+        if not data["has_more"]:
+            break
+    
+    assert received == sorted(price.id for price in prices)
+    
+    data = (await client.get(f"/api/prices/sync?since_id={since_id}")).json()
+    assert (data["prices"], data["next_since_id"], data["has_more"]) == ([], since_id, False)
+    
+    data = (await client.get(f"/api/prices/sync?ticker=BTC_USD&since_timestamp={START + 600}")).json()
+    assert [price["timestamp"] for price in data["prices"]] == [START + i * 60 for i in range(11, 25, 2)]
+    
+    assert (await client.get("/api/prices/sync?ticker=SOL")).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_sync_long_poll_returns_on_write(client, test_db, prices, monkeypatch):
+    """Тест: long-poll отвечает сразу после уведомления о записи, не дожидаясь опроса БД."""
+    monkeypatch.setattr(settings, "sync_poll_interval_seconds", 10.0)
+    since_id = prices[-1].id
+    
+    started = time.monotonic()
+    request = asyncio.create_task(client.get(f"/api/prices/sync?since_id={since_id}&wait=20"))
+    await asyncio.sleep(0.1)
+    assert not request.done()
+    
+    [price] = await PriceService(test_db).create_prices([
+        PriceCreate(ticker="BTC", price=Decimal("200"), timestamp=START + 3600)
+    ])
+    recent_prices.notify_written()
+    
+    data = (await asyncio.wait_for(request, timeout=5)).json()
+    assert time.monotonic() - started < 5
+    assert [row["id"] for row in data["prices"]] == [price.id]
+    assert data["next_since_id"] == price.id
+
+
+@pytest.mark.asyncio
+async def test_sync_long_poll_times_out_empty(client, prices, monkeypatch):
+    """Тест: без новых записей long-poll возвращает пустую пачку после wait, проверяя БД по интервалу."""
+    monkeypatch.setattr(settings, "sync_poll_interval_seconds", 0.05)
+    since_id = prices[-1].id
+    
+    started = time.monotonic()
+    data = (await client.get(f"/api/prices/sync?since_id={since_id}&wait=0.3")).json()
+    
+    assert time.monotonic() - started >= 0.3
+    assert (data["prices"], data["next_since_id"]) == ([], since_id)
+
+
+@pytest.mark.asyncio
+async def test_sync_waits_for_lower_id_committed_later(client, test_db, prices, monkeypatch):
+    """Тест: строка с меньшим id, зафиксированная после большей, не теряется за водяным знаком."""
+    monkeypatch.setattr(settings, "sync_settle_seconds", 5)
+    since_id = prices[-1].id
+    now = int(time.time())
+    await test_db.execute(update(Price).values(inserted_at=now - 60))
+    # Транзакция A получила id since_id + 1 раньше, но фиксируется после транзакции B
+    test_db.add(Price(id=since_id + 2, ticker="BTC", price=Decimal("300"), timestamp=START + 7200, inserted_at=now))
+    await test_db.commit()
+    
+    data = (await client.get(f"/api/prices/sync?since_id={since_id}")).json()
+    assert (data["prices"], data["next_since_id"]) == ([], since_id)
+    
+    test_db.add(Price(id=since_id + 1, ticker="ETH", price=Decimal("20"), timestamp=START + 7200, inserted_at=now - 1))
+    await test_db.commit()
+    data = (await client.get(f"/api/prices/sync?since_id={since_id}")).json()
+    assert data["prices"] == []
+    
+    # Прошло окно SYNC_SETTLE_SECONDS
+    await test_db.execute(update(Price).where(Price.id > since_id).values(inserted_at=now - 10))
+    await test_db.commit()
+    data = (await client.get(f"/api/prices/sync?since_id={since_id}")).json()
+    assert [row["id"] for row in data["prices"]] == [since_id + 1, since_id + 2]
+    assert data["next_since_id"] == since_id + 2
+    
+    # Старые строки не задерживают выдачу, пока новая строка не устоялась
+    [price] = await PriceService(test_db).create_prices([
+        PriceCreate(ticker="BTC", price=Decimal("301"), timestamp=START + 7260)
+    ])
+    assert price.inserted_at >= now
+    data = (await client.get(f"/api/prices/sync?since_id={since_id}")).json()
+    assert [row["id"] for row in data["prices"]] == [since_id + 1, since_id + 2]
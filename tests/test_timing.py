@@ -0,0 +1,85 @@
+"""Тесты для лога медленных запросов и заголовка Server-Timing."""
+import logging
+import pytest
+from decimal import Decimal
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.config import settings
+from app.services.price_service import PriceService
+from app.schemas import PriceCreate
+
+
+def _phases(header: str) -> dict:
+    """Разобрать заголовок Server-Timing в словарь фаза -> миллисекунды."""
+    phases = {}
+    for item in header.split(","):
+        name, duration = item.strip().split(";dur=")
+        phases[name] = float(duration)
+    return phases
+
+
+@pytest.mark.asyncio
+async def test_server_timing_phases(client, test_db):
+    """Тест: ответ маршрута цен содержит фазы db, hydrate и serialize."""
+    service = PriceService(test_db)
+    await service.create_prices([
+        PriceCreate(ticker="BTC", price=Decimal("50000.5"), timestamp=1700000000 + i * 60)
+        for i in range(50)
+    ])
+    
+    response = await client.get("/api/prices/filter?ticker=BTC")
+    
+    assert response.status_code == 200
+    phases = _phases(response.headers["server-timing"])
+    assert {"db", "hydrate", "serialize", "total"} <= set(phases)
+    assert phases["db"] > 0
+    assert phases["db"] + phases["hydrate"] + phases["serialize"] <= phases["total"]
+
+
+@pytest.mark.asyncio
+async def test_server_timing_without_route_phases(client):
+    """Тест: для маршрутов вне роутера цен отдаются только db и total."""
+    response = await client.get("/")
+    
+    assert set(_phases(response.headers["server-timing"])) == {"db", "total"}
+
+
+@pytest.mark.asyncio
+async def test_slow_query_logged(test_db, monkeypatch, caplog):
+    """Тест: запрос дольше порога пишется в лог вместе с параметрами."""
+    monkeypatch.setattr(settings, "slow_query_threshold_ms", 1e-6)
+    
+    with caplog.at_level(logging.WARNING, logger="app.database"):
+        await PriceService(test_db).get_last_price("ETH")
+    
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("Медленный запрос" in message and "'ETH'" in message for message in messages)
+
+
+@pytest.mark.asyncio
+async def test_slow_query_log_disabled(test_db, monkeypatch, caplog):
+    """Тест: нулевой порог отключает лог медленных запросов."""
+    monkeypatch.setattr(settings, "slow_query_threshold_ms", 0)
+    
+    with caplog.at_level(logging.WARNING, logger="app.database"):
+        await PriceService(test_db).get_last_price("ETH")
+    
+    assert not caplog.records
+
+
+@pytest.mark.asyncio
+async def test_failed_query_leaves_no_timing_state(test_db, monkeypatch, caplog):
+    """Тест: запрос с ошибкой не оставляет отметок на соединении, следующий запрос замеряется."""
+    monkeypatch.setattr(settings, "slow_query_threshold_ms", 1e-6)
+    
+    for _ in range(3):
+        with pytest.raises(OperationalError):
+            await test_db.execute(text("SELECT * FROM missing_table"))
+        await test_db.rollback()
+    
+    conn = await test_db.connection()
+    raw = await conn.get_raw_connection()
+    assert "query_started" not in raw.info
+    with caplog.at_level(logging.WARNING, logger="app.database"):
+        await PriceService(test_db).get_last_price("ETH")
+    assert any("Медленный запрос" in record.getMessage() for record in caplog.records)
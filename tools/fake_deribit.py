@@ -0,0 +1,206 @@
+"""Локальный фейковый сервер Deribit API для тестов и нагрузочных прогонов.
+
+Запуск: python -m tools.fake_deribit --port 8080
+Клиенту нужно передать base_url=http://localhost:8080/api/v2
+"""
+import math
+import time
+import random
+import asyncio
+import argparse
+from typing import Callable, Optional, Union
+from aiohttp import web
+
+
+def synthetic_price(currency: str, timestamp: float) -> float:
+    """
+    Детерминированная синтетическая цена валюты в момент времени.
+    
+    Args:
+        currency: Валюта (BTC, ETH, ...)
+        timestamp: UNIX timestamp в секундах
+    
+    Returns:
+        Цена, округленная до 2 знаков
+    """
+    base = {"BTC": 40000.0, "ETH": 2000.0}.get(currency.upper(), 100.0)
+    wave = math.sin(timestamp / 3600.0) * 0.02 + math.sin(timestamp / 97.0) * 0.001
+    return round(base * (1 + wave), 2)
+
+
+def latency_distribution(spec: str, seed: Optional[int] = None) -> Union[float, Callable[[], float]]:
+    """
+    Разобрать описание распределения задержки ответа.
+    
+    Форматы (секунды):
+        "0.05"                  - фиксированная задержка
+        "uniform:0.01,0.1"      - равномерная на отрезке
+        "lognormal:0.05,0.5"    - логнормальная с медианой 0.05 и sigma 0.5 (длинный хвост)
+        "exp:0.05"              - экспоненциальная со средним 0.05
+    
+    Args:
+        spec: Описание распределения
+        seed: Seed генератора
+    
+    Returns:
+        Фиксированная задержка или функция, возвращающая очередную задержку
+    """
+    kind, _, params = spec.partition(":")
+    if not params:
+        return float(kind)
+    
+    rng = random.Random(seed)
+    values = [float(value) for value in params.split(",")]
+    if kind == "uniform":
+        low, high = values
+        return lambda: rng.uniform(low, high)
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: rng.lognormvariate(math.log(median), sigma)
+    if kind == "exp":
+        mean, = values
+        return lambda: rng.expovariate(1 / mean)
+    raise ValueError(f"Unknown latency distribution: {kind}")
+
+
+class FakeDeribit:
+    """Фейковый Deribit: get_index_price и get_tradingview_chart_data."""
+    
+    def __init__(
+        self,
+        rate_limit_every: int = 0,
+        max_candles: int = 5000,
+        latency: Union[float, Callable[[], float]] = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        """
+        Инициализация сервера.
+        
+        Args:
+            rate_limit_every: Отвечать ошибкой too_many_requests на каждый N-й запрос (0 - никогда)
+            max_candles: Максимальное число свечей в одном ответе, как у Deribit
+            latency: Задержка ответа в секундах или функция, возвращающая задержку
+            error_rate: Доля запросов, на которые отвечать HTTP 500
+            seed: Seed генератора случайных ошибок
+        """
+        self.rate_limit_every = rate_limit_every
+        self.max_candles = max_candles
+        self.latency = latency
+        self.error_rate = error_rate
+        # Число следующих запросов, на которые нужно ответить HTTP 500
+        self.fail_next = 0
+        self._rng = random.Random(seed)
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.chart_requests = []
+    
+    def _rate_limited(self) -> bool:
+        """Проверить, нужно ли ответить ошибкой лимита на текущий запрос."""
+        self.requests += 1
+        if self.rate_limit_every and self.requests % self.rate_limit_every == 0:
+            self.rate_limited += 1
+            return True
+        return False
+    
+    async def _inject_faults(self) -> Optional[web.Response]:
+        """Выдержать задержку и при необходимости вернуть ответ с ошибкой."""
+        delay = self.latency() if callable(self.latency) else self.latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.fail_next > 0 or (self.error_rate and self._rng.random() < self.error_rate):
+            self.fail_next = max(self.fail_next - 1, 0)
+            self.errors += 1
+            return web.Response(status=500, text="Internal Server Error")
+        if self._rate_limited():
+            return self._error(10028, "too_many_requests")
+        return None
+    
+    @staticmethod
+    def _error(code: int, message: str) -> web.Response:
+        """Ответ в формате ошибки JSON-RPC."""
+        return web.json_response({"jsonrpc": "2.0", "error": {"code": code, "message": message}})
+    
+    async def get_index_price(self, request: web.Request) -> web.Response:
+        """Обработчик public/get_index_price."""
+        fault = await self._inject_faults()
+        if fault is not None:
+            return fault
+        index_name = request.query.get("index_name", "")
+        if not index_name.endswith("_usd"):
+            return self._error(10001, "Invalid index name")
+        now_us = int(time.time() * 1_000_000)
+        currency = index_name[:-len("_usd")]
+        return web.json_response({
+            "jsonrpc": "2.0",
+            "result": {
+                "index_price": synthetic_price(currency, now_us / 1_000_000),
+                "estimated_delivery_price": synthetic_price(currency, now_us / 1_000_000),
+            },
+            "usIn": now_us,
+            "usOut": now_us,
+            "usDiff": 0,
+            "testnet": True,
+        })
+    
+    async def get_chart_data(self, request: web.Request) -> web.Response:
+        """Обработчик public/get_tradingview_chart_data с минутными свечами."""
+        fault = await self._inject_faults()
+        if fault is not None:
+            return fault
+        try:
+            instrument = request.query["instrument_name"]
+            start_ms = int(request.query["start_timestamp"])
+            end_ms = int(request.query["end_timestamp"])
+        except (KeyError, ValueError):
+            return self._error(-32602, "Invalid params")
+        self.chart_requests.append((instrument, start_ms // 1000, end_ms // 1000))
+        
+        currency = instrument.split("-")[0].split("_")[0]
+        first = -(-start_ms // 60000) * 60
+        ticks = list(range(first, end_ms // 1000 + 1, 60))[:self.max_candles]
+        if not ticks:
+            return web.json_response({"jsonrpc": "2.0", "result": {"status": "no_data"}})
+        closes = [synthetic_price(currency, ts) for ts in ticks]
+        return web.json_response({
+            "jsonrpc": "2.0",
+            "result": {
+                "status": "ok",
+                "ticks": [ts * 1000 for ts in ticks],
+                "open": closes,
+                "high": closes,
+                "low": closes,
+                "close": closes,
+                "volume": [0.0] * len(ticks),
+                "cost": [0.0] * len(ticks),
+            },
+        })
+    
+    def make_app(self) -> web.Application:
+        """Создать aiohttp приложение с маршрутами /api/v2/public/*."""
+        app = web.Application()
+        app.router.add_get("/api/v2/public/get_index_price", self.get_index_price)
+        app.router.add_get("/api/v2/public/get_tradingview_chart_data", self.get_chart_data)
+        return app
+
+
+def main():
+    """Запустить фейковый сервер из командной строки."""
+    parser = argparse.ArgumentParser(description="Фейковый сервер Deribit API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--latency", default="0", help="Задержка ответа: 0.05, uniform:a,b, lognormal:median,sigma, exp:mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов HTTP 500")
+    args = parser.parse_args()
+    fake = FakeDeribit(
+        rate_limit_every=args.rate_limit_every,
+        latency=latency_distribution(args.latency),
+        error_rate=args.error_rate,
+    )
+    web.run_app(fake.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()